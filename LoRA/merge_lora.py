@@ -0,0 +1,73 @@
+"""
+Merge a LoRA adapter trained with train_lora.py into its base model and save
+a standalone checkpoint, so inference runs plain Linear layers with no PEFT
+wrapper or extra adapter matmuls.
+
+    python3 merge_lora.py --adapter gemma4b-lora-output --output gemma4b-lora-merged
+
+Pass the output folder as `--lora` to the reviewer; it is detected by the
+merged_lora.json metadata written next to the weights.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+from peft import PeftConfig, PeftModel
+
+# The reviewer recognises merged checkpoints by the metadata written here
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ast_reviewer.agents.variants import MERGED_METADATA_FILE, adapter_fingerprint
+
+
+def merge_adapter(adapter_path, output_dir, base_model_id=None, dtype="bfloat16"):
+    peft_config = PeftConfig.from_pretrained(adapter_path)
+    base_model_id = base_model_id or peft_config.base_model_name_or_path
+
+    print(f"Loading base model: {base_model_id}")
+    tokenizer = AutoTokenizer.from_pretrained(base_model_id)
+    # Merge on CPU in full precision, then cast, so rounding happens once
+    model = AutoModelForCausalLM.from_pretrained(base_model_id, torch_dtype=torch.float32)
+
+    print(f"Merging adapter: {adapter_path}")
+    model = PeftModel.from_pretrained(model, adapter_path).merge_and_unload()
+    model = model.to(getattr(torch, dtype))
+
+    print(f"Saving merged checkpoint to: {output_dir}")
+    model.save_pretrained(output_dir, safe_serialization=True)
+    tokenizer.save_pretrained(output_dir)
+
+    metadata = {
+        "base_model": base_model_id,
+        "adapter": os.path.abspath(adapter_path),
+        "adapter_sha256": adapter_fingerprint(adapter_path),
+        "lora_rank": peft_config.r,
+        "lora_alpha": peft_config.lora_alpha,
+        "target_modules": sorted(peft_config.target_modules),
+        "dtype": dtype,
+        "merged_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    with open(os.path.join(output_dir, MERGED_METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge a LoRA adapter into its base model.")
+    parser.add_argument("--adapter", required=True, help="Adapter folder saved by train_lora.py.")
+    parser.add_argument("--output", required=True, help="Folder for the merged checkpoint.")
+    parser.add_argument("--model_id", default=None, help="Base model (default: the one recorded in the adapter config).")
+    parser.add_argument("--dtype", choices=["bfloat16", "float16", "float32"], default="bfloat16", help="Dtype of the saved weights.")
+    args = parser.parse_args()
+
+    metadata = merge_adapter(args.adapter, args.output, args.model_id, args.dtype)
+    print(json.dumps(metadata, indent=2))
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 import os
+import sys
 import json
+import argparse
 from pathlib import Path
 
+# 复用仓库根目录下的流式数据集读取
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dataset_stream import iter_samples
+
 # ===== 修改这两项 =====
 ORIGIN_ROOT = "origin_dataset"
 TARGET_ROOT = "sft_dataset"
@@ -9,31 +15,33 @@ SUBFOLDER = "Python-22k/Python-22k"
 INPUT_FILE = "train.json"
 # =====================
 
+parser = argparse.ArgumentParser(description="Convert a review dataset into SFT instruction/output JSONL.")
+parser.add_argument("--input", default=os.path.join(ORIGIN_ROOT, SUBFOLDER, INPUT_FILE),
+                    help="Source dataset: a JSON array of samples or JSON Lines.")
+parser.add_argument("--output", default=os.path.join(TARGET_ROOT, SUBFOLDER, "train.jsonl"),
+                    help="Where to write the SFT JSONL.")
+parser.add_argument("--start", type=int, default=0, help="Index of the first sample to convert.")
+parser.add_argument("--limit", type=int, default=None, help="Convert at most this many samples.")
+args = parser.parse_args()
+
 # 构造输入输出路径
-input_path = os.path.join(ORIGIN_ROOT, SUBFOLDER, INPUT_FILE)
+input_path = args.input
 
 # 输出文件夹：保持原有目录结构
-output_folder = os.path.join(TARGET_ROOT, SUBFOLDER)
-os.makedirs(output_folder, exist_ok=True)
-
-output_path = os.path.join(output_folder, "train.jsonl")
+output_path = args.output
+os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
 
 print(f"Loading {input_path}")
 
-# 读取原始 JSON
-with open(input_path, "r") as f:
-    data = json.load(f)
-
-print(f"Loaded {len(data)} samples.")
-
-# 创建 JSONL 输出
+# 逐条流式读取原始 JSON，不把整个数据集载入内存
+count = 0
 with open(output_path, "w") as fout:
-    for item in data:
+    for item in iter_samples(input_path, args.start, args.limit):
         # Kaggle 格式字段
         old_comment = item.get("old_comment_raw", "")
         new_comment = item.get("new_comment_raw", "")
         old_code = item.get("old_code_raw", "")
-        
+
         # 构造指令
         instruction = (
             "Here is a code snippet and its original comment.\n\n"
@@ -54,5 +62,7 @@ with open(output_path, "w") as fout:
                 ensure_ascii=False
             ) + "\n"
         )
+        count += 1
 
+print(f"Converted {count} samples.")
 print(f"Saved processed SFT data → {output_path}")
@@ -0,0 +1,259 @@
+import http.client
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_MAX_NEW_TOKENS = 512
+# Structured answers: a JSON array of {line, severity, message} review records
+REVIEW_SEVERITIES = ("low", "medium", "high")
+REVIEW_RECORDS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "line": {"type": "integer"},
+            "severity": {"type": "string", "enum": list(REVIEW_SEVERITIES)},
+            "message": {"type": "string"},
+        },
+        "required": ["line", "severity", "message"],
+        "additionalProperties": False,
+    },
+}
+
+
+def cut_at_stop(text: str, stop: Optional[List[str]]) -> str:
+    """`text` up to its earliest `stop` string, which is dropped as inference servers do."""
+    ends = [text.find(s) for s in stop or [] if s and s in text]
+    return text[:min(ends)] if ends else text
+
+
+class InferenceBackend:
+    """
+    Turns raw-text prompts into completions (prompt excluded). Greedy decoding throughout.
+    With `structured=True` the completion is constrained to REVIEW_RECORDS_SCHEMA.
+    """
+
+    name = "backend"
+
+    def generate(self, prompt: str, max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+                 stop: Optional[List[str]] = None, structured: bool = False, **options) -> str:
+        return self.generate_many([prompt], max_new_tokens, stop, structured, **options)[0]
+
+    def generate_many(self, prompts: List[str], max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+                      stop: Optional[List[str]] = None, structured: bool = False, **options) -> List[str]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PipelineBackend(InferenceBackend):
+    """
+    In-process transformers text-generation pipeline. Prompts are generated as
+    one padded batch; `stop` strings end each row as soon as it produces one
+    and, as with the remote backends, are cut from the returned text,
+    `structured` masks logits to the review-record grammar and ends each row
+    when its array closes, and other options (assistant_model,
+    prompt_lookup_num_tokens) go to generate.
+    """
+
+    name = "hf"
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.model = pipe.model.name_or_path
+
+    def generate_many(self, prompts, max_new_tokens=DEFAULT_MAX_NEW_TOKENS, stop=None, structured=False, **options):
+        if not prompts:
+            return []
+        # Prompts are left-padded to the longest one. Stopping criteria cannot infer this on
+        # their first call when assisted decoding appends a whole block of tokens per step.
+        prompt_length = max(len(self.pipe.tokenizer(prompt)["input_ids"]) for prompt in prompts)
+        if structured:
+            from ast_reviewer.agents.decoding import review_json_constraints
+
+            options.update(review_json_constraints(self.pipe.tokenizer, prompt_length))
+        elif stop:
+            from transformers import StoppingCriteriaList
+            from ast_reviewer.agents.decoding import SentinelStoppingCriteria
+
+            options["stopping_criteria"] = StoppingCriteriaList(
+                [SentinelStoppingCriteria(self.pipe.tokenizer, s, prompt_length) for s in stop]
+            )
+        if len(prompts) == 1:
+            outputs = [self.pipe(prompts[0], do_sample=False, max_new_tokens=max_new_tokens, **options)]
+        else:
+            outputs = self.pipe(prompts, do_sample=False, max_new_tokens=max_new_tokens, batch_size=len(prompts), **options)
+        # Strip prompt from output; speculative steps may also have run past the stop string
+        return [
+            cut_at_stop(output[0]["generated_text"][len(prompt):], None if structured else stop).strip()
+            for prompt, output in zip(prompts, outputs)
+        ]
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections to one server, shared by all threads.
+    At most `size` requests are in flight; idle connections are reused, and a
+    reused connection the server has meanwhile closed is replaced transparently.
+    """
+
+    def __init__(self, base_url: str, size: int = 8, timeout: Optional[float] = None):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Expected an http(s) URL, got {base_url!r}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.size = size
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        with self._lock:
+            self.opened += 1
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, payload: Optional[Dict] = None,
+                headers: Optional[Dict[str, str]] = None) -> Dict:
+        body = json.dumps(payload).encode("utf8") if payload is not None else None
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        with self._slots:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._connect(), False
+            while True:
+                try:
+                    conn.request(method, self.base_path + path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                    break
+                except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionError):
+                    conn.close()
+                    if not reused:
+                        raise
+                    # Idle keep-alive connection closed by the server; retry once on a fresh one
+                    conn, reused = self._connect(), False
+                except Exception:
+                    conn.close()
+                    raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path} returned {response.status}: {data[:200].decode('utf8', 'replace')}")
+        return json.loads(data)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HTTPBackend(InferenceBackend):
+    """
+    Completions from an inference server over pooled keep-alive connections.
+    generate_many sends its prompts concurrently (up to `max_connections`), so
+    a batching server (vLLM, TGI, llama.cpp, Ollama) can batch them on its side.
+    """
+
+    default_url = ""
+
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None,
+                 max_connections: int = 8, timeout: Optional[float] = 300.0):
+        self.base_url = base_url or self.default_url
+        self.model = model
+        self.pool = ConnectionPool(self.base_url, size=max_connections, timeout=timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix=f"{self.name}-backend")
+
+    def generate_many(self, prompts, max_new_tokens=DEFAULT_MAX_NEW_TOKENS, stop=None, structured=False, **options):
+        if options:
+            raise ValueError(f"{self.name} backend does not support {', '.join(options)}")
+        if len(prompts) <= 1:
+            return [self._complete(prompt, max_new_tokens, stop, structured) for prompt in prompts]
+        return list(self._executor.map(lambda prompt: self._complete(prompt, max_new_tokens, stop, structured), prompts))
+
+    def _complete(self, prompt: str, max_new_tokens: int, stop: Optional[List[str]], structured: bool) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.pool.close()
+
+
+class OpenAIBackend(HTTPBackend):
+    """
+    OpenAI-compatible /v1/completions endpoint (vLLM, TGI, llama.cpp server, ...).
+    Uses the text completions API so prompts are sent exactly as built, without
+    a chat template. OPENAI_API_KEY, if set, is sent as the bearer token.
+    Note that servers drop a matched `stop` string from the returned text.
+    Structured answers use the server's JSON-schema constrained decoding (response_format).
+    """
+
+    name = "openai"
+    default_url = "http://127.0.0.1:8000/v1"
+
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None, **options):
+        from ast_reviewer.agents.variants import BASE_MODEL_ID
+
+        super().__init__(base_url, model or BASE_MODEL_ID, **options)
+        api_key = os.environ.get("OPENAI_API_KEY")
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    def _complete(self, prompt, max_new_tokens, stop, structured):
+        payload: Dict[str, Any] = {"model": self.model, "prompt": prompt, "max_tokens": max_new_tokens, "temperature": 0}
+        if stop:
+            payload["stop"] = stop
+        if structured:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "review_records", "schema": REVIEW_RECORDS_SCHEMA, "strict": True},
+            }
+        response = self.pool.request("POST", "/completions", payload, self.headers)
+        return response["choices"][0]["text"].strip()
+
+
+class OllamaBackend(HTTPBackend):
+    """Ollama /api/generate in raw mode (no prompt template), non-streaming; structured answers via `format`."""
+
+    name = "ollama"
+    default_url = "http://127.0.0.1:11434"
+
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None, **options):
+        super().__init__(base_url, model or "gemma3:4b", **options)
+
+    def _complete(self, prompt, max_new_tokens, stop, structured):
+        generation: Dict[str, Any] = {"temperature": 0, "num_predict": max_new_tokens}
+        if stop:
+            generation["stop"] = stop
+        payload = {"model": self.model, "prompt": prompt, "raw": True, "stream": False, "options": generation}
+        if structured:
+            payload["format"] = REVIEW_RECORDS_SCHEMA
+        return self.pool.request("POST", "/api/generate", payload)["response"].strip()
+
+
+REMOTE_BACKENDS = {"openai": OpenAIBackend, "ollama": OllamaBackend}
+
+
+def get_backend(spec: str, model: Optional[str] = None, **options) -> HTTPBackend:
+    """
+    Builds a remote backend from "<kind>[:<base url>]", e.g. "openai:http://gpu-box:8000/v1"
+    or "ollama" (default local URL). The in-process "hf" backend is built by BaseExpert.
+    """
+    kind, _, base_url = spec.partition(":")
+    if kind not in REMOTE_BACKENDS:
+        raise ValueError(f"Unknown backend {spec!r}, expected hf, {', '.join(k + '[:URL]' for k in REMOTE_BACKENDS)}")
+    return REMOTE_BACKENDS[kind](base_url or None, model, **options)
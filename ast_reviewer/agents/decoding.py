@@ -0,0 +1,291 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList, StoppingCriteria, StoppingCriteriaList
+
+from ast_reviewer.agents.backends import REVIEW_SEVERITIES
+
+
+class SentinelStoppingCriteria(StoppingCriteria):
+    """
+    Stops a sequence as soon as its generated text contains `sentinel`
+    (e.g. "No issues found."), instead of running to max_new_tokens.
+    Works per row, so batched generation only stops the rows that are done.
+    """
+
+    def __init__(self, tokenizer, sentinel: str, prompt_length: Optional[int] = None):
+        self.tokenizer = tokenizer
+        self.sentinel = sentinel
+        # Set on the first call when not known: by then exactly one token has been generated,
+        # which does not hold for assisted decoding, so pass it whenever it is known
+        self.prompt_length = prompt_length
+        # Only tokens added since the last call can complete the sentinel, plus the window
+        # before them; a few extra tokens cover odd tokenizations
+        self.window = len(tokenizer.encode(sentinel, add_special_tokens=False)) + 4
+        self._checked: Optional[int] = None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1] - 1
+        checked = self._checked if self._checked is not None else self.prompt_length
+        start = max(self.prompt_length, checked - self.window)
+        self._checked = input_ids.shape[1]
+        tails = self.tokenizer.batch_decode(input_ids[:, start:], skip_special_tokens=True)
+        return torch.tensor([self.sentinel in tail for tail in tails], dtype=torch.bool, device=input_ids.device)
+
+
+def stop_on_sentinel(tokenizer, sentinel: str) -> StoppingCriteriaList:
+    return StoppingCriteriaList([SentinelStoppingCriteria(tokenizer, sentinel)])
+
+
+def sentinel_token_variants(tokenizer, sentinel: str) -> List[List[int]]:
+    """Token sequences the model may use to start its answer with `sentinel`."""
+    variants = []
+    for text in (sentinel, " " + sentinel, "\n" + sentinel):
+        ids = tokenizer.encode(text, add_special_tokens=False)
+        if ids and ids not in variants:
+            variants.append(ids)
+    return variants
+
+
+@torch.no_grad()
+def greedy_starts_with(model, tokenizer, prompt: str, sentinel: str) -> bool:
+    """
+    Returns True if greedy decoding of `prompt` would begin with `sentinel`.
+
+    First-token probe: one forward pass over the prompt gives the greedy first
+    token; if it cannot start the sentinel the answer is an issue list. Otherwise
+    the remaining sentinel tokens are teacher-forced through the KV cache in a
+    second pass and checked against the argmax at each position, which is exact
+    for greedy decoding and costs about one prefill instead of a full generation.
+    """
+    device = model.device if hasattr(model, "device") else None
+    input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"].to(device)
+    out = model(input_ids=input_ids, use_cache=True)
+    first = int(out.logits[0, -1].argmax())
+
+    candidates = [ids for ids in sentinel_token_variants(tokenizer, sentinel) if ids[0] == first]
+    if not candidates:
+        return False
+    ids = candidates[0]
+    if len(ids) == 1:
+        return True
+
+    forced = torch.tensor([ids[:-1]], device=input_ids.device)
+    follow = model(input_ids=forced, past_key_values=out.past_key_values, use_cache=True)
+    predicted = follow.logits[0].argmax(dim=-1).tolist()
+    return predicted == ids[1:]
+
+
+@torch.no_grad()
+def generate_shared_prefix(model, tokenizer, prefix: str, suffixes: List[str], **generate_kwargs) -> List[str]:
+    """
+    Greedy answers for the prompts `prefix + suffix`, one per suffix, with the
+    shared prefix run through the model only once.
+
+    The prefix KV cache is repeated across the batch and each row continues
+    with its own suffix. Shorter suffixes are padded *between* prefix and
+    suffix (masked out), so every row sees prefix and suffix at contiguous
+    positions and decodes exactly as if it had been prompted on its own.
+    """
+    device = model.device
+    prefix_ids = tokenizer(prefix, return_tensors="pt")["input_ids"].to(device)
+    suffix_ids = [tokenizer(suffix, add_special_tokens=False)["input_ids"] for suffix in suffixes]
+    width = max(len(ids) for ids in suffix_ids)
+    n = len(suffixes)
+
+    cache = model(input_ids=prefix_ids, use_cache=True).past_key_values
+    if n > 1:
+        cache.batch_repeat_interleave(n)
+
+    padded = [[tokenizer.pad_token_id] * (width - len(ids)) + ids for ids in suffix_ids]
+    suffix_mask = [[0] * (width - len(ids)) + [1] * len(ids) for ids in suffix_ids]
+    input_ids = torch.cat([prefix_ids.repeat(n, 1), torch.tensor(padded, device=device)], dim=1)
+    attention_mask = torch.cat(
+        [torch.ones_like(prefix_ids).repeat(n, 1), torch.tensor(suffix_mask, device=device)], dim=1
+    )
+
+    output = model.generate(
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        past_key_values=cache,
+        do_sample=False,
+        pad_token_id=tokenizer.pad_token_id,
+        **generate_kwargs,
+    )
+    return [
+        tokenizer.decode(row[input_ids.shape[1]:], skip_special_tokens=True).strip()
+        for row in output
+    ]
+
+
+# Review-record grammar, fixed key order and spacing so only values are model choices:
+#   [{"line": 12, "severity": "high", "message": "..."}, ...]   or   []
+RECORD_START = '{"line": '
+OPEN_EXITS = ["[" + RECORD_START, "[]"]
+SEVERITY_EXITS = [f', "severity": "{severity}", "message": "' for severity in REVIEW_SEVERITIES]
+RECORD_EXITS = ['"}, ' + RECORD_START, '"}]']
+DONE = "done"
+MAX_LINE_DIGITS = 6
+
+
+def _consume(text: str, i: int, literals: List[str]) -> Tuple[int, Optional[str], List[str]]:
+    """
+    Matches one of `literals` at text[i:]: returns (end, literal, []) on a full
+    match, or (i, None, remainders) when the text ends partway into them.
+    """
+    rest = text[i:]
+    for literal in literals:
+        if rest.startswith(literal):
+            return i + len(literal), literal, []
+    remainders = [literal[len(rest):] for literal in literals if literal.startswith(rest)]
+    if not remainders:
+        raise ValueError(f"Text leaves the review-record grammar at {rest[:20]!r}")
+    return i, None, remainders
+
+
+def json_records_state(text: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Where `text` stands in the review-record grammar. Returns (free, exits):
+    `free` is "line", "digits" or "string" while a value is being written (None
+    between values, DONE once the array is closed) and `exits` are the literal
+    continuations that may come next.
+    """
+    i, literal, remainders = _consume(text, 0, OPEN_EXITS)
+    if remainders:
+        return None, remainders
+    if literal == "[]":
+        return DONE, []
+    while True:
+        j = i
+        while j < len(text) and text[j].isdigit():
+            j += 1
+        if j == len(text):
+            if j == i:
+                return "line", []
+            # JSON integers have no leading zeros
+            more = text[i] != "0" and j - i < MAX_LINE_DIGITS
+            return "digits" if more else None, SEVERITY_EXITS
+        i, _, remainders = _consume(text, j, SEVERITY_EXITS)
+        if remainders:
+            return None, remainders
+        j = text.find('"', i)
+        if j == -1:
+            return "string", RECORD_EXITS
+        i, literal, remainders = _consume(text, j, RECORD_EXITS)
+        if remainders:
+            return None, remainders
+        if literal.endswith("]"):
+            return DONE, []
+
+
+class TokenIndex:
+    """Per-tokenizer lookup of each token's text and of the tokens allowed in free JSON values."""
+
+    def __init__(self, tokenizer):
+        # Decoding after an anchor token keeps leading spaces that a lone decode would strip
+        anchor = tokenizer.encode("a", add_special_tokens=False)[-1]
+        offset = len(tokenizer.decode([anchor]))
+        special = set(tokenizer.all_special_ids)
+        ids = range(len(tokenizer))
+        decoded = tokenizer.batch_decode([[anchor, i] for i in ids])
+        self.texts = ["" if i in special else text[offset:] for i, text in zip(ids, decoded)]
+
+        self.by_text: Dict[str, List[int]] = {}
+        line, digits, content = [], [], []
+        for i, text in enumerate(self.texts):
+            if not text:
+                continue
+            self.by_text.setdefault(text, []).append(i)
+            if text.isascii() and text.isdigit():
+                digits.append(i)
+                if not text.startswith("0") and len(text) <= MAX_LINE_DIGITS:
+                    line.append(i)
+            # Message strings stay on one line and need no escaping
+            if text.isprintable() and '"' not in text and "\\" not in text and "�" not in text:
+                content.append(i)
+        self.free = {"line": line, "digits": digits, "string": content}
+        # The grammar has few distinct states, so masks are built once per state
+        self._allowed: Dict[Tuple[Optional[str], Tuple[str, ...]], torch.LongTensor] = {}
+
+    def text(self, ids: List[int]) -> str:
+        return "".join(self.texts[i] for i in ids)
+
+    def allowed(self, free: Optional[str], exits: List[str]) -> torch.LongTensor:
+        """Token ids that keep the text inside the grammar: free-value tokens or prefixes of an exit."""
+        key = (free, tuple(exits))
+        if key not in self._allowed:
+            allowed = list(self.free[free]) if free else []
+            prefixes = {literal[:n] for literal in exits for n in range(1, len(literal) + 1)}
+            for prefix in prefixes:
+                allowed.extend(self.by_text.get(prefix, ()))
+            self._allowed[key] = torch.tensor(sorted(set(allowed)), dtype=torch.long)
+        return self._allowed[key]
+
+
+_TOKEN_INDEXES: Dict[int, Tuple[Any, TokenIndex]] = {}
+
+
+def token_index(tokenizer) -> TokenIndex:
+    # Keyed by id() but holding the tokenizer, so the key cannot be reused while cached
+    if id(tokenizer) not in _TOKEN_INDEXES:
+        _TOKEN_INDEXES[id(tokenizer)] = (tokenizer, TokenIndex(tokenizer))
+    return _TOKEN_INDEXES[id(tokenizer)][1]
+
+
+class JsonRecordsLogitsProcessor(LogitsProcessor):
+    """
+    Masks every token that would leave the review-record grammar, so each row
+    decodes into a valid JSON array of {line, severity, message} records.
+    Structural text is forced; the model only picks line digits, a severity,
+    message text and whether another record follows.
+    """
+
+    def __init__(self, tokenizer, prompt_length: Optional[int] = None):
+        self.index = token_index(tokenizer)
+        self.eos_token_id = tokenizer.eos_token_id
+        # Set on the first call: the processor sees the prompt before any token is generated
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1]
+        mask = torch.full_like(scores, float("-inf"))
+        for row, ids in enumerate(input_ids[:, self.prompt_length:].tolist()):
+            try:
+                free, exits = json_records_state(self.index.text(ids))
+            except ValueError:
+                free, exits = DONE, []
+            allowed = self.index.allowed(free, exits) if free != DONE else None
+            if allowed is None or not len(allowed):
+                mask[row, self.eos_token_id] = 0
+            else:
+                mask[row, allowed.to(scores.device)] = 0
+        return scores + mask
+
+
+class JsonArrayStoppingCriteria(StoppingCriteria):
+    """Stops each row as soon as its review-record array is closed."""
+
+    def __init__(self, tokenizer, prompt_length: Optional[int] = None):
+        self.index = token_index(tokenizer)
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1] - 1
+        done = []
+        for ids in input_ids[:, self.prompt_length:].tolist():
+            try:
+                done.append(json_records_state(self.index.text(ids))[0] == DONE)
+            except ValueError:
+                done.append(True)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+def review_json_constraints(tokenizer, prompt_length: Optional[int] = None) -> Dict[str, Any]:
+    """generate() kwargs that constrain decoding to the review-record grammar (fresh state per call)."""
+    return {
+        "logits_processor": LogitsProcessorList([JsonRecordsLogitsProcessor(tokenizer, prompt_length)]),
+        "stopping_criteria": StoppingCriteriaList([JsonArrayStoppingCriteria(tokenizer, prompt_length)]),
+    }
@@ -0,0 +1,103 @@
+import copy
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+
+class ContinuousBatchingEngine:
+    """
+    In-process generation engine shared by every expert on the same model.
+
+    Requests from any thread are added to one decode loop (transformers'
+    continuous-batching manager over a paged KV cache). A request joins at the
+    next step and leaves as soon as it hits EOS or its token limit, freeing its
+    cache blocks, so a short "No issues found." never waits for a long answer.
+
+    `batching_options` are passed to transformers' ContinuousBatchingConfig
+    (e.g. max_requests_per_batch, max_memory_percent, page_size).
+    """
+
+    def __init__(self, model, tokenizer, max_new_tokens: int = 512, **batching_options):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_new_tokens = max_new_tokens
+        self.batching_options = batching_options
+
+        self.generation_config = copy.deepcopy(model.generation_config)
+        self.generation_config.do_sample = False
+        self.generation_config.max_new_tokens = max_new_tokens
+        if self.generation_config.pad_token_id is None:
+            self.generation_config.pad_token_id = tokenizer.pad_token_id
+
+        self._manager = None
+        self._collector: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._request_ids = itertools.count()
+
+    @property
+    def running(self) -> bool:
+        return self._manager is not None
+
+    def start(self):
+        with self._lock:
+            if self._manager is not None:
+                return
+            from transformers import ContinuousBatchingConfig
+
+            manager = self.model.init_continuous_batching(
+                generation_config=self.generation_config,
+                continuous_batching_config=ContinuousBatchingConfig(**self.batching_options),
+            )
+            manager.start()
+            self._manager = manager
+            self._collector = threading.Thread(target=self._collect, name="generation-collector", daemon=True)
+            self._collector.start()
+
+    def stop(self):
+        with self._lock:
+            manager, self._manager = self._manager, None
+        if manager is None:
+            return
+        manager.stop(block=True)
+        self._collector.join(timeout=5)
+        with self._lock:
+            futures, self._futures = self._futures, {}
+        for future in futures.values():
+            future.set_exception(RuntimeError("Generation engine stopped"))
+
+    def submit(self, prompt: str, max_new_tokens: Optional[int] = None) -> Future:
+        """Queues a prompt; the future resolves to the generated text (prompt excluded)."""
+        self.start()
+        input_ids = self.tokenizer(prompt)["input_ids"]
+        request_id = f"req-{next(self._request_ids)}"
+        future: Future = Future()
+        # Read the manager under the lock: a concurrent stop() may have cleared it since start()
+        with self._lock:
+            manager = self._manager
+            if manager is None:
+                raise RuntimeError("Generation engine stopped")
+            self._futures[request_id] = future
+        manager.add_request(input_ids, request_id=request_id, max_new_tokens=max_new_tokens or self.max_new_tokens)
+        return future
+
+    def generate(self, prompts: List[str], max_new_tokens: Optional[int] = None) -> List[str]:
+        futures = [self.submit(prompt, max_new_tokens) for prompt in prompts]
+        return [future.result() for future in futures]
+
+    def _collect(self):
+        while True:
+            manager = self._manager
+            if manager is None:
+                break
+            result = manager.get_result(timeout=0.1)
+            if result is None or not result.is_finished():
+                continue
+            future = self._futures.pop(result.request_id, None)
+            if future is None:
+                continue
+            if result.error:
+                future.set_exception(RuntimeError(result.error))
+            else:
+                future.set_result(self.tokenizer.decode(result.generated_tokens, skip_special_tokens=True).strip())
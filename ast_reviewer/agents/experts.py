@@ -1,52 +1,181 @@
-from typing import List, Dict, Any
-#from langchain_ollama.llms import OllamaLLM
-#from langchain_core.prompts import ChatPromptTemplate
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-from peft import PeftModel
+import json
+import re
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Tuple
+from ast_reviewer.retrieval.cast.config import CASTConfig
+from ast_reviewer.retrieval.context_packer import ContextPacker, format_context_chunk
+from ast_reviewer.agents.backends import InferenceBackend, PipelineBackend, cut_at_stop, get_backend
+from ast_reviewer.agents.engine import ContinuousBatchingEngine
+from ast_reviewer.agents.variants import BASE_MODEL_ID, is_merged_checkpoint, model_variant, served_variant
+
+# Reply the experts are told to give for clean code; decoding stops as soon as it appears
+NO_ISSUES = "No issues found."
+MAX_NEW_TOKENS = 512
+# Weight-only quantization of the backbone for CPU workers; PEFT can put LoRA on top of both
+QUANTIZATION_MODES = ("int8", "int4")
+# A panel section header: "### BugExpert", "## **BugExpert**:" or "**BugExpert**"
+SECTION_HEADER = re.compile(r"\s*(?:#{2,}\s*\**|\*\*)\s*(\w+)")
+
+
+def quantization_config(mode: str):
+    """
+    transformers quantization config for `mode`:
+      int8: torchao int8 weight-only (int8 weight matmul kernels, ~4x smaller than fp32)
+      int4: bitsandbytes NF4 with bf16 compute (~8x smaller, no calibration data needed)
+    """
+    if mode == "int8":
+        from torchao.quantization import Int8WeightOnlyConfig
+        from transformers import TorchAoConfig
+
+        return TorchAoConfig(Int8WeightOnlyConfig())
+    if mode == "int4":
+        import torch
+        from transformers import BitsAndBytesConfig
+
+        return BitsAndBytesConfig(load_in_4bit=True, bnb_4bit_quant_type="nf4", bnb_4bit_compute_dtype=torch.bfloat16)
+    raise ValueError(f"Unknown quantization {mode!r}, expected one of {', '.join(QUANTIZATION_MODES)}")
+
 
 class BaseExpert:
     _PIPELINE_CACHE: Dict[str, Any] = {}
+    _ENGINE_CACHE: Dict[str, ContinuousBatchingEngine] = {}
+    _DRAFT_CACHE: Dict[str, Any] = {}
+    _BACKEND_CACHE: Dict[str, InferenceBackend] = {}
+    _TOKENIZER_CACHE: Dict[str, Any] = {}
 
-    def __init__(self, name: str, role_description: str, lora_path: str = None):
+    def __init__(
+        self,
+        name: str,
+        role_description: str,
+        lora_path: str = None,
+        token_limit: Optional[int] = None,
+        continuous_batching: bool = False,
+        early_stop: bool = True,
+        no_issues_probe: bool = False,
+        draft_model: Optional[str] = None,
+        prompt_lookup_tokens: Optional[int] = None,
+        quantization: Optional[str] = None,
+        backend: str = "hf",
+        backend_model: Optional[str] = None,
+        structured: bool = False,
+    ):
         self.name = name
         self.role_description = role_description
-        cache_key = lora_path or "__base__"
-
-        if cache_key in BaseExpert._PIPELINE_CACHE:
-            print(f"[{self.name}] Reusing cached model for key: {cache_key}")
-            self.pipe = BaseExpert._PIPELINE_CACHE[cache_key]
+        # early_stop: end generation once NO_ISSUES is produced instead of running to max_new_tokens.
+        # no_issues_probe: check with ~one prefill whether greedy decoding would answer NO_ISSUES,
+        # and skip generation entirely when it would.
+        self.early_stop = early_stop
+        self.no_issues_probe = no_issues_probe
+        # structured: answer with a JSON array of {line, severity, message} records, decoded under a
+        # grammar constraint that ends generation when the array closes (replaces the NO_ISSUES fast paths).
+        self.structured = structured
+        if structured and (continuous_batching or no_issues_probe):
+            raise ValueError("structured output cannot be combined with continuous_batching or no_issues_probe")
+        # The engine decodes every request to EOS or max_new_tokens: early_stop has no effect on its
+        # path and the probe would be skipped silently
+        if continuous_batching and no_issues_probe:
+            raise ValueError("no_issues_probe cannot be combined with continuous_batching")
+        # Speculative decoding, both exact under greedy decoding:
+        # draft_model: small model sharing the tokenizer that proposes tokens for the expert to verify.
+        # prompt_lookup_tokens: propose up to this many tokens by matching n-grams in the prompt
+        # (answers mostly quote identifiers from the reviewed code).
+        self.draft_model = draft_model
+        self.prompt_lookup_tokens = prompt_lookup_tokens
+        # Upper bound on prompt tokens; retrieved context is packed into what the code leaves free
+        self.token_limit = token_limit if token_limit is not None else CASTConfig().safe_token_limit
+        if quantization is not None and quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {', '.join(QUANTIZATION_MODES)}")
+        self.quantization = quantization
+        # backend: "hf" generates in this process; "openai[:URL]" / "ollama[:URL]" send prompts to an
+        # inference server (backend_model names the served model), see ast_reviewer.agents.backends.
+        self.backend_spec = backend
+        if backend != "hf":
+            # Decoding runs on an inference server; only the tokenizer is loaded here (for prompt budgets)
+            local_only = {
+                "lora_path": lora_path,
+                "quantization": quantization,
+                "continuous_batching": continuous_batching,
+                "no_issues_probe": no_issues_probe,
+                "draft_model": draft_model,
+                "prompt_lookup_tokens": prompt_lookup_tokens,
+            }
+            used = [option for option, value in local_only.items() if value]
+            if used:
+                raise ValueError(f"{', '.join(used)} need the in-process hf backend; configure them on the inference server")
+            key = f"{backend}|{backend_model}"
+            if key not in BaseExpert._BACKEND_CACHE:
+                BaseExpert._BACKEND_CACHE[key] = get_backend(backend, backend_model)
+            self.backend = BaseExpert._BACKEND_CACHE[key]
+            self.pipe = None
+            self.engine = None
+            self.tokenizer = self._load_tokenizer(BASE_MODEL_ID)
+            self.variant = served_variant(self.backend.name, self.backend.model)
         else:
-            base_model_id = "google/gemma-3-4b-it"
-            print(f"[{self.name}] Loading base model: {base_model_id}")
+            # lora_path is either a PEFT adapter folder or a checkpoint exported by LoRA/merge_lora.py;
+            # `variant` tells results from the two (and from other adapters/quantizations) apart.
+            self.variant = model_variant(lora_path, quantization)
+            cache_key = lora_path or "__base__"
+            if quantization:
+                cache_key = f"{cache_key}@{quantization}"
 
-            tokenizer = AutoTokenizer.from_pretrained(base_model_id)
-            model = AutoModelForCausalLM.from_pretrained(
-                base_model_id,
-                device_map="auto",
-                torch_dtype="auto",
-            )
-
-            if lora_path:
-                print(f"[{self.name}] Loading LoRA adapter from: {lora_path}")
-                model = PeftModel.from_pretrained(model, lora_path)
+            if cache_key in BaseExpert._PIPELINE_CACHE:
+                print(f"[{self.name}] Reusing cached model for key: {cache_key}")
+                self.pipe = BaseExpert._PIPELINE_CACHE[cache_key]
             else:
-                print(f"[{self.name}] Using original Gemma-3-4B-IT model")
+                # Imported here so importing the experts (e.g. for `main.py --help`) stays cheap
+                from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 
-            self.pipe = pipeline(
-                "text-generation",
-                model=model,
-                tokenizer=tokenizer,
-                device_map="auto",
-                torch_dtype="auto",
-                max_new_tokens=512,
-            )
-            BaseExpert._PIPELINE_CACHE[cache_key] = self.pipe
+                merged = is_merged_checkpoint(lora_path)
+                model_id = lora_path if merged else BASE_MODEL_ID
+                print(f"[{self.name}] Loading {'merged LoRA checkpoint' if merged else 'base model'}: {model_id}")
 
-        #self.model = OllamaLLM(model='llama3.2')
-        
-        self.template = """
-You are a specialized code review expert focusing ONLY on {role}.
+                tokenizer = AutoTokenizer.from_pretrained(model_id)
+                # Batched generation (review_batch) pads on the left so every prompt ends where decoding starts
+                tokenizer.padding_side = "left"
+                load_options: Dict[str, Any] = {}
+                if quantization:
+                    print(f"[{self.name}] Quantizing weights to {quantization}")
+                    load_options["quantization_config"] = quantization_config(quantization)
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_id,
+                    device_map="auto",
+                    torch_dtype="auto",
+                    **load_options,
+                )
+
+                # A merged checkpoint already has the adapter folded in, so no LoRA layers per forward pass
+                if lora_path and not merged:
+                    from peft import PeftModel
+
+                    print(f"[{self.name}] Loading LoRA adapter from: {lora_path}")
+                    model = PeftModel.from_pretrained(model, lora_path)
+                elif not lora_path:
+                    print(f"[{self.name}] Using original Gemma-3-4B-IT model")
+
+                self.pipe = pipeline(
+                    "text-generation",
+                    model=model,
+                    tokenizer=tokenizer,
+                    device_map="auto",
+                    torch_dtype="auto",
+                    max_new_tokens=MAX_NEW_TOKENS,
+                )
+                BaseExpert._PIPELINE_CACHE[cache_key] = self.pipe
+
+            # Experts on the same model share one decode loop, so their requests batch together
+            self.engine = None
+            if continuous_batching:
+                if cache_key not in BaseExpert._ENGINE_CACHE:
+                    BaseExpert._ENGINE_CACHE[cache_key] = ContinuousBatchingEngine(
+                        self.pipe.model, self.pipe.tokenizer, max_new_tokens=MAX_NEW_TOKENS
+                    )
+                self.engine = BaseExpert._ENGINE_CACHE[cache_key]
+            self.backend = PipelineBackend(self.pipe)
+            self.tokenizer = self.pipe.tokenizer
 
+        # Code and context come first so experts reviewing the same chunk share a prompt
+        # prefix (and its KV cache, see review_with_shared_prefix); only the role part differs.
+        self.prefix_template = """
 Here is the code snippet to review:
 ```python
 {code}
@@ -54,104 +183,414 @@ Here is the code snippet to review:
 
 Additional Context (Related Code):
 {context}
+"""
+        self.role_template = """
+You are a specialized code review expert focusing ONLY on {role}.
 
 Your task:
-1. Identify any issues related specifically to **{role}**.
+1. Identify any issues in the code above related specifically to **{role}**.
 2. If there are NO issues related to {role}, reply with *exactly* "No issues found." and do not include any additional text.
 3. Be concise and actionable. Do not provide general feedback outside your scope.
 4. Format your response as a bulleted list of issues if any are found.
 
 Issues:
 """
+        if structured:
+            self.role_template = """
+You are a specialized code review expert focusing ONLY on {role}.
+
+Your task:
+1. Identify any issues in the code above related specifically to **{role}**.
+2. Answer with a JSON array with one object per issue: {{"line": <line number in the snippet, starting at 1>, "severity": "low" | "medium" | "high", "message": "<concise, actionable description>"}}.
+3. If there are NO issues related to {role}, answer with an empty array: [].
+4. Do not provide general feedback outside your scope.
+
+Issues:
+"""
+        self.context_packer = ContextPacker(self.count_tokens, self.token_limit)
+
+    @staticmethod
+    def _load_tokenizer(model_id: str):
+        if model_id not in BaseExpert._TOKENIZER_CACHE:
+            from transformers import AutoTokenizer
+
+            BaseExpert._TOKENIZER_CACHE[model_id] = AutoTokenizer.from_pretrained(model_id)
+        return BaseExpert._TOKENIZER_CACHE[model_id]
+
+    def count_tokens(self, text: str) -> int:
+        """Counts tokens with the expert's own tokenizer."""
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
     def generate(self, prompt: str) -> str:
         """Generate text using Gemma-3 model."""
-        output = self.pipe(prompt, do_sample=False)[0]["generated_text"]
-        # Strip prompt from output
-        return output[len(prompt):].strip()
+        if self.engine is not None:
+            return self.engine.submit(prompt).result()
+        if self.no_issues_probe and self.probe_no_issues(prompt):
+            return NO_ISSUES
+        return self.backend.generate(prompt, MAX_NEW_TOKENS, **self._generate_kwargs())
+
+    def generate_many(self, prompts: List[str]) -> List[str]:
+        """Generates answers for several prompts, batched where the decoding mode allows it."""
+        if not prompts:
+            return []
+        if self.engine is not None:
+            return self.engine.generate(prompts)
+        if self.speculative:
+            # Assisted generation only supports one sequence at a time
+            return [self.backend.generate(prompt, MAX_NEW_TOKENS, **self._generate_kwargs()) for prompt in prompts]
+        return self.backend.generate_many(prompts, MAX_NEW_TOKENS, **self._generate_kwargs())
+
+    def probe_no_issues(self, prompt: str) -> bool:
+        """True if greedy decoding of `prompt` would answer NO_ISSUES."""
+        from ast_reviewer.agents.decoding import greedy_starts_with
+
+        return greedy_starts_with(self.pipe.model, self.pipe.tokenizer, prompt, NO_ISSUES)
+
+    @property
+    def speculative(self) -> bool:
+        return bool(self.draft_model or self.prompt_lookup_tokens)
+
+    def _load_draft(self):
+        if self.draft_model not in BaseExpert._DRAFT_CACHE:
+            from transformers import AutoModelForCausalLM
+
+            print(f"[{self.name}] Loading draft model: {self.draft_model}")
+            BaseExpert._DRAFT_CACHE[self.draft_model] = AutoModelForCausalLM.from_pretrained(
+                self.draft_model,
+                device_map="auto",
+                torch_dtype="auto",
+            )
+        return BaseExpert._DRAFT_CACHE[self.draft_model]
+
+    def _generate_kwargs(self) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {}
+        if self.structured:
+            kwargs["structured"] = True
+        elif self.early_stop:
+            kwargs["stop"] = [NO_ISSUES]
+        if self.draft_model:
+            kwargs["assistant_model"] = self._load_draft()
+        elif self.prompt_lookup_tokens:
+            kwargs["prompt_lookup_num_tokens"] = self.prompt_lookup_tokens
+        return kwargs
     
-    def review(self, diff: str, context: List[Dict]) -> List[str]:
+    def build_prefix(self, diff: str, context: List[Dict], reserve_tokens: int = 0) -> str:
         """
-        Reviews the code snippet and returns bullet-point comments.
+        The code + context part of the prompt. Context chunks are packed into the
+        tokens left after the code and `reserve_tokens` (the role part that follows).
         """
+        context_str = ""
+        if context:
+            base_tokens = self.count_tokens(self.prefix_template.format(code=diff, context="")) + reserve_tokens
+            packed = self.context_packer.pack(context, token_budget=self.token_limit - base_tokens)
+            context_str = "\n".join(format_context_chunk(c) for c in packed)
+        return self.prefix_template.format(code=diff, context=context_str)
+
+    def build_suffix(self, role: Optional[str] = None) -> str:
+        """The role-specific instructions that follow the shared prefix."""
+        return self.role_template.format(role=role or self.role_description)
+
+    def build_prompt(self, diff: str, context: List[Dict], role: Optional[str] = None) -> str:
+        suffix = self.build_suffix(role)
+        return self.build_prefix(diff, context, self.count_tokens(suffix)) + suffix
+
+    def parse_response(self, response: str) -> List[str]:
+        """Turns the model's answer into a list of comments."""
+        if self.structured:
+            return [self.format_record(record) for record in self.parse_records(response)]
+        return self.parse_bullets(response)
+
+    @staticmethod
+    def parse_records(response: str) -> List[Dict[str, Any]]:
+        """
+        Review records from a structured answer. Constrained decoding always yields
+        a valid array prefix, so an answer cut off at max_new_tokens keeps its
+        complete records; anything else unparsable becomes a single record.
+        """
+        text = response.strip()
         try:
-            # Format context chunks
-            context_str = ""
-            if context:
-                context_str = "\n".join(
-                    [f"--- Chunk: {c['metadata']['name']} ---\n{c['content']}\n"
-                    for c in context]
-                )
+            records = json.loads(text)
+        except json.JSONDecodeError:
+            records = BaseExpert.complete_records(text)
+            if not records:
+                return [{"line": None, "severity": "low", "message": text}] if text else []
+        if not isinstance(records, list):
+            records = [records]
+        return [record for record in records if isinstance(record, dict) and record.get("message")]
 
-            # Build prompt
-            prompt = self.template.format(
-                role=self.role_description,
-                code=diff,
-                context=context_str
-            )
+    @staticmethod
+    def complete_records(text: str) -> List[Any]:
+        """
+        The complete elements of a JSON array cut off partway, decoded one at a
+        time so escaped quotes in messages (from remote backends) are handled.
+        """
+        if not text.startswith("["):
+            return []
+        decoder = json.JSONDecoder()
+        records = []
+        i = 1
+        while True:
+            while text[i:i + 1].isspace():
+                i += 1
+            try:
+                record, i = decoder.raw_decode(text, i)
+            except json.JSONDecodeError:
+                return records
+            records.append(record)
+            while text[i:i + 1].isspace():
+                i += 1
+            if text[i:i + 1] != ",":
+                return records
+            i += 1
 
-            # Run model
-            response = self.generate(prompt)
+    @staticmethod
+    def format_record(record: Dict[str, Any]) -> str:
+        return f"- Line {record.get('line')} [{record.get('severity')}]: {record['message']}"
 
-            # Parse model response
-            comments = []
-            if "No issues found" in response or not response.strip():
-                return []
+    @staticmethod
+    def parse_bullets(response: str) -> List[str]:
+        """Turns the model's bulleted answer into a list of comments."""
+        comments = []
+        if "No issues found" in response or not response.strip():
+            return []
 
-            for line in response.split("\n"):
-                clean = line.strip()
-                if clean.startswith("- ") or clean.startswith("* ") or clean.startswith("1. "):
-                    comments.append(clean)
+        for line in response.split("\n"):
+            clean = line.strip()
+            if clean.startswith("- ") or clean.startswith("* ") or clean.startswith("1. "):
+                comments.append(clean)
 
-            # fallback
-            if not comments and response.strip():
-                comments.append(response.strip())
+        # fallback
+        if not comments and response.strip():
+            comments.append(response.strip())
 
-            return comments
+        return comments
 
+    def review(self, diff: str, context: List[Dict]) -> List[str]:
+        """
+        Reviews the code snippet and returns bullet-point comments.
+        """
+        try:
+            prompt = self.build_prompt(diff, context)
+            return self.parse_response(self.generate(prompt))
         except Exception as e:
             return [f"Error during LLM review: {str(e)}"]
 
+    def review_batch(self, items: List[Tuple[str, List[Dict]]]) -> List[List[str]]:
+        """
+        Reviews several (code, context) pairs with one batched generate call.
+        Returns one comment list per item, in order.
+        """
+        if not items:
+            return []
+        if self.engine is not None:
+            return [future.result() for future in self.submit_reviews(items)]
+        try:
+            prompts = [self.build_prompt(diff, context) for diff, context in items]
+            results: List[List[str]] = [[] for _ in prompts]
+            # Probed-clean prompts keep their empty result and are not generated
+            pending = [
+                i for i, prompt in enumerate(prompts)
+                if not (self.no_issues_probe and self.probe_no_issues(prompt))
+            ]
+            responses = self.generate_many([prompts[i] for i in pending])
+            for i, response in zip(pending, responses):
+                results[i] = self.parse_response(response)
+            return results
+        except Exception as e:
+            return [[f"Error during LLM review: {str(e)}"] for _ in items]
+
+    def submit_reviews(self, items: List[Tuple[str, List[Dict]]]) -> List[Future]:
+        """
+        Queues (code, context) reviews on the shared engine without waiting.
+        Each future resolves to that item's comment list.
+        """
+        futures = []
+        for diff, context in items:
+            review: Future = Future()
+            try:
+                generation = self.engine.submit(self.build_prompt(diff, context))
+            except Exception as e:
+                review.set_result([f"Error during LLM review: {str(e)}"])
+            else:
+                generation.add_done_callback(self._resolve_review(review))
+            futures.append(review)
+        return futures
+
+    def _resolve_review(self, review: Future):
+        def resolve(generation: Future):
+            if generation.exception() is not None:
+                review.set_result([f"Error during LLM review: {str(generation.exception())}"])
+            else:
+                review.set_result(self.parse_response(generation.result()))
+        return resolve
+
 class SecurityExpert(BaseExpert):
-    def __init__(self, lora_path: str = None):
+    def __init__(self, lora_path: str = None, **options):
         super().__init__(
             "SecurityExpert",
             "Security Vulnerabilities (e.g., injection, hardcoded secrets, unsafe execution, weak cryptography)",
             lora_path=lora_path,
+            **options,
         )
 
 
 class StyleExpert(BaseExpert):
-    def __init__(self, lora_path: str = None):
+    def __init__(self, lora_path: str = None, **options):
         super().__init__(
             "StyleExpert",
             "Code Style and Readability (e.g., naming conventions, indentation, PEP8 compliance, clarity)",
             lora_path=lora_path,
+            **options,
         )
 
 
 class DocExpert(BaseExpert):
-    def __init__(self, lora_path: str = None):
+    def __init__(self, lora_path: str = None, **options):
         super().__init__(
             "DocExpert",
             "Documentation and Comments (e.g., missing docstrings, unclear comments, outdated documentation)",
             lora_path=lora_path,
+            **options,
         )
 
 
 class CommentConsistencyExpert(BaseExpert):
-    def __init__(self, lora_path: str = None):
+    def __init__(self, lora_path: str = None, **options):
         super().__init__(
             "CommentConsistencyExpert",
             "Judge whether the existing comment still accurately describes the updated code. "
             "Flag inconsistencies between the described behavior and the updated implementation.",
             lora_path=lora_path,
+            **options,
         )
 
 
 class BugExpert(BaseExpert):
-    def __init__(self, lora_path: str = None):
+    def __init__(self, lora_path: str = None, **options):
         super().__init__(
             "BugExpert",
             "Logic Bugs and Correctness (e.g., off-by-one errors, infinite loops, incorrect conditions, variable misuse)",
             lora_path=lora_path,
+            **options,
+        )
+
+
+def review_with_shared_prefix(experts: List[BaseExpert], diff: str, context: List[Dict]) -> Dict[str, List[str]]:
+    """
+    Reviews one chunk with several experts, computing the code + context prefix
+    once and forking its KV cache for each expert's role suffix.
+    Falls back to one review per expert when the experts do not share a model
+    or use a decoding mode that cannot fork a cache (engine, speculative, remote backend).
+    """
+    lead = experts[0]
+    if len(experts) == 1 or lead.pipe is None or any(e.pipe is not lead.pipe or e.structured != lead.structured or e.engine is not None or e.speculative for e in experts):
+        return {expert.name: expert.review(diff, context) for expert in experts}
+
+    from ast_reviewer.agents.decoding import generate_shared_prefix, review_json_constraints, stop_on_sentinel
+
+    try:
+        suffixes = [expert.build_suffix() for expert in experts]
+        # All experts must see the same packed context, so reserve room for the longest role part
+        prefix = lead.build_prefix(diff, context, max(lead.count_tokens(s) for s in suffixes))
+        kwargs: Dict[str, Any] = {"max_new_tokens": MAX_NEW_TOKENS}
+        if lead.structured:
+            kwargs.update(review_json_constraints(lead.pipe.tokenizer))
+        elif lead.early_stop:
+            kwargs["stopping_criteria"] = stop_on_sentinel(lead.pipe.tokenizer, NO_ISSUES)
+        responses = generate_shared_prefix(lead.pipe.model, lead.pipe.tokenizer, prefix, suffixes, **kwargs)
+        if "stopping_criteria" in kwargs:
+            responses = [cut_at_stop(response, [NO_ISSUES]).strip() for response in responses]
+        return {expert.name: expert.parse_response(response) for expert, response in zip(experts, responses)}
+    except Exception as e:
+        return {expert.name: [f"Error during LLM review: {str(e)}"] for expert in experts}
+
+
+class PanelExpert(BaseExpert):
+    """
+    Reviews a chunk for several experts with a single generation.
+
+    The prompt lists each expert's role and asks for one "### <ExpertName>"
+    section per role; the answer is split back into per-expert comment lists,
+    so callers get the same output as running the experts one by one, for the
+    cost of one prefill over the shared code and context.
+    """
+
+    def __init__(self, experts: List[BaseExpert], lora_path: str = None, **options):
+        # Each section may legitimately say "No issues found.", so the sentinel
+        # fast paths that end generation on it do not apply to the panel; its
+        # sectioned answer is parsed as text, so structured output is off too.
+        options.update(early_stop=False, no_issues_probe=False, structured=False)
+        super().__init__(
+            "PanelExpert",
+            "the roles listed below",
+            lora_path=lora_path,
+            **options,
         )
+        self.experts = {expert.name: expert for expert in experts}
+        self.roles = {expert.name: expert.role_description for expert in experts}
+        self.role_template = """
+You are a panel of specialized code review experts. Review the code above once for each of these roles:
+{role}
+
+Your task:
+1. Write one section per role, starting with its "### <ExpertName>" header line exactly as given above.
+2. Under each header, list only the issues within that role's scope as a bulleted list.
+3. If a role has NO issues, write *exactly* "No issues found." under its header.
+4. Be concise and actionable.
+
+Review:
+"""
+
+    def build_panel_prompt(self, diff: str, context: List[Dict], expert_names: List[str]) -> str:
+        roles = "\n".join(f"### {name}: {self.roles[name]}" for name in expert_names)
+        return self.build_prompt(diff, context, role=roles)
+
+    def parse_sections(self, response: str, expert_names: List[str]) -> Dict[str, List[str]]:
+        """
+        Splits a panel answer into per-expert comment lists. Sections start at a
+        "## <ExpertName>" or "**<ExpertName>**" header line; experts without a
+        section are left out rather than counted as clean.
+        """
+        sections: Dict[str, List[str]] = {}
+        current = None
+        for line in response.split("\n"):
+            header = SECTION_HEADER.match(line)
+            if header and header.group(1) in expert_names:
+                current = header.group(1)
+                sections[current] = []
+            elif current is not None:
+                sections[current].append(line)
+        return {name: self.parse_response("\n".join(lines)) for name, lines in sections.items()}
+
+    def review_panel(self, diff: str, context: List[Dict], expert_names: List[str]) -> Dict[str, List[str]]:
+        return self.review_panel_batch([(diff, context, expert_names)])[0]
+
+    def review_panel_batch(self, items: List[Tuple[str, List[Dict], List[str]]]) -> List[Dict[str, List[str]]]:
+        """
+        Reviews several (code, context, expert names) items, one generation each.
+        Experts whose section is missing from the answer are reviewed on their
+        own. Returns {expert name: comments} per item, in order.
+        """
+        results: List[Dict[str, List[str]]] = [{} for _ in items]
+        pending = [i for i, (_, _, names) in enumerate(items) if names]
+        try:
+            prompts = [self.build_panel_prompt(*items[i]) for i in pending]
+            for i, response in zip(pending, self.generate_many(prompts)):
+                results[i] = self.parse_sections(response, items[i][2])
+        except Exception as e:
+            for i in pending:
+                results[i] = {name: [f"Error during LLM review: {str(e)}"] for name in items[i][2]}
+            return results
+
+        missing: Dict[str, List[int]] = {}
+        for i in pending:
+            for name in items[i][2]:
+                if name not in results[i]:
+                    missing.setdefault(name, []).append(i)
+        for name, indices in missing.items():
+            print(f"[{self.name}] No {name} section in {len(indices)} answer(s); reviewing with {name} alone")
+            expert = self.experts[name]
+            comments = expert.review_batch([(items[i][0], items[i][1]) for i in indices])
+            for i, expert_comments in zip(indices, comments):
+                results[i][name] = expert_comments
+        return results
@@ -1,10 +1,11 @@
 from typing import List, Dict
-from langchain_ollama.llms import OllamaLLM
-from langchain_core.prompts import ChatPromptTemplate
 import json
 
 class RouterAgent:
     def __init__(self):
+        from langchain_ollama.llms import OllamaLLM
+        from langchain_core.prompts import ChatPromptTemplate
+
         # Use a lightweight model for routing if possible, but we'll stick to llama3.2
         self.model = OllamaLLM(model='llama3.2')
         
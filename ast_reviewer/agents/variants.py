@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Optional
+
+BASE_MODEL_ID = "google/gemma-3-4b-it"
+# Written by LoRA/merge_lora.py next to a merged checkpoint
+MERGED_METADATA_FILE = "merged_lora.json"
+ADAPTER_WEIGHT_FILES = ("adapter_model.safetensors", "adapter_model.bin")
+
+
+def is_merged_checkpoint(path: Optional[str]) -> bool:
+    """True if `path` is a standalone checkpoint with a LoRA adapter merged into its weights."""
+    return bool(path) and os.path.isfile(os.path.join(path, MERGED_METADATA_FILE))
+
+
+def load_merged_metadata(path: str) -> Dict:
+    with open(os.path.join(path, MERGED_METADATA_FILE), "r") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def adapter_fingerprint(adapter_path: str) -> str:
+    """sha256 of the adapter weights, so retrained adapters in the same folder count as new variants."""
+    digest = hashlib.sha256()
+    for name in ADAPTER_WEIGHT_FILES:
+        weights = os.path.join(adapter_path, name)
+        if os.path.isfile(weights):
+            with open(weights, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            return digest.hexdigest()
+    raise FileNotFoundError(f"No adapter weights ({', '.join(ADAPTER_WEIGHT_FILES)}) in {adapter_path}")
+
+
+def model_variant(lora_path: Optional[str] = None, quantization: Optional[str] = None) -> Dict:
+    """
+    Describes the weights an expert runs with. Merged and unmerged loads of the
+    same adapter share `adapter_sha256` but differ in `merged`, and `id` is a
+    short label that differs whenever any of the fields do.
+    """
+    variant = {"base_model": BASE_MODEL_ID, "adapter_sha256": None, "merged": False, "quantization": quantization}
+    if is_merged_checkpoint(lora_path):
+        metadata = load_merged_metadata(lora_path)
+        variant.update(base_model=metadata["base_model"], adapter_sha256=metadata["adapter_sha256"], merged=True)
+    elif lora_path:
+        variant["adapter_sha256"] = adapter_fingerprint(lora_path)
+
+    label = variant["base_model"].split("/")[-1]
+    if variant["adapter_sha256"]:
+        label += f"+lora-{variant['adapter_sha256'][:12]}"
+        if variant["merged"]:
+            label += "-merged"
+    if quantization:
+        label += f"@{quantization}"
+    variant["id"] = label
+    return variant
+
+
+def served_variant(backend: str, model: str) -> Dict:
+    """Variant of an expert whose model runs behind an inference server (weights unknown here)."""
+    return {"base_model": model, "adapter_sha256": None, "merged": False, "quantization": None,
+            "backend": backend, "id": f"{backend}:{model}"}
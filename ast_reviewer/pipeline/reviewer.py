@@ -1,21 +1,65 @@
-from typing import List, Dict
+from concurrent.futures import Future
+from typing import List, Dict, Optional
 from ast_reviewer.retrieval.cast import CASTChunker
 from ast_reviewer.retrieval.vector_store import VectorStore
+from ast_reviewer.retrieval.dependency_graph import DependencyGraph
 from ast_reviewer.agents.router import RouterAgent
-from ast_reviewer.agents.experts import SecurityExpert, StyleExpert, DocExpert, BugExpert
+from ast_reviewer.agents.experts import (
+    SecurityExpert, StyleExpert, DocExpert, BugExpert, PanelExpert, review_with_shared_prefix
+)
 import os
 
+# "dense" (vector store), "hybrid" (BM25 + dense fusion) or "graph" (callee definitions, no embeddings)
+RETRIEVAL_MODES = ("dense", "hybrid", "graph")
+
 class ReviewPipeline:
-    def __init__(self):
+    def __init__(
+        self,
+        retrieval_mode: str = "dense",
+        lora_path: Optional[str] = None,
+        quantization: Optional[str] = None,
+        backend: str = "hf",
+        backend_model: Optional[str] = None,
+        structured: bool = False,
+        continuous_batching: bool = False,
+        no_issues_probe: bool = False,
+        panel: bool = False,
+        shared_prefix: bool = False,
+    ):
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {retrieval_mode!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
+        self.retrieval_mode = retrieval_mode
         self.chunker = CASTChunker()
-        self.vector_store = VectorStore()
+        # The store is cleared and rebuilt per reviewed file, so keep it in memory
+        self.vector_store = VectorStore(backend="memory") if retrieval_mode != "graph" else None
         self.router = RouterAgent()
+        options = {
+            "lora_path": lora_path,
+            "quantization": quantization,
+            "backend": backend,
+            "backend_model": backend_model,
+            "structured": structured,
+            "continuous_batching": continuous_batching,
+            "no_issues_probe": no_issues_probe,
+        }
         self.experts = {
-            "SecurityExpert": SecurityExpert(),
-            "StyleExpert": StyleExpert(),
-            "DocExpert": DocExpert(),
-            "BugExpert": BugExpert()
+            "SecurityExpert": SecurityExpert(**options),
+            "StyleExpert": StyleExpert(**options),
+            "DocExpert": DocExpert(**options),
+            "BugExpert": BugExpert(**options)
         }
+        # panel: one generation per chunk covering all routed experts, instead of one per expert
+        self.panel = PanelExpert(list(self.experts.values()), **options) if panel else None
+        # shared_prefix: chunks routed to several experts prefill code + context once for all of them
+        self.shared_prefix = shared_prefix
+
+    def warm_up(self):
+        """Loads lazily initialized models and engines ahead of the first review."""
+        if self.vector_store is not None:
+            self.vector_store.embedding_fn(["def warm_up(): pass"])
+        for expert in self.experts.values():
+            if expert.engine is not None:
+                expert.engine.start()
 
     def review_file(self, file_path: str) -> str:
         # 1. Chunking
@@ -25,57 +69,139 @@ class ReviewPipeline:
         except Exception as e:
             return f"Error chunking file: {e}"
 
+        tasks = self.plan(chunks, file_path)
+        return self._format_report(self.run_tasks(tasks))
+
+    def review_code(self, code: str, file_path: str = "<snippet>") -> str:
+        """Same as `review_file` for source code that is not on disk."""
+        try:
+            chunks = self.chunker.chunk_code(code)
+        except Exception as e:
+            return f"Error chunking code: {e}"
+        return self._format_report(self.run_tasks(self.plan(chunks, file_path, source=code)))
+
+    def plan(
+        self,
+        chunks: List[Dict],
+        file_path: str,
+        experts: Optional[List[str]] = None,
+        source: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Indexes the chunks, retrieves context for each one and routes it.
+        Returns one task per chunk: {"file", "chunk", "context", "experts"}.
+        `experts` skips the router and sends every chunk to the given experts;
+        `source` is the file's code when it is not on disk (graph mode).
+        """
         # 2. Indexing (In a real scenario, we'd index the whole repo beforehand)
         # For this prototype, we'll clear and index the current file + maybe others if we had them
         print("Indexing chunks...")
-        self.vector_store.clear()
-        self.vector_store.add_chunks(chunks)
-
-        all_comments = []
+        graph = None
+        if self.retrieval_mode == "graph":
+            graph = DependencyGraph()
+            if source is not None:
+                graph.add_source(source, file_path)
+            else:
+                graph.add_file(file_path)
+        else:
+            self.vector_store.clear()
+            self.vector_store.add_chunks(chunks, file_path=file_path)
 
-        # 3. Review each chunk
-        print("Reviewing chunks...")
+        tasks = []
         for chunk in chunks:
             diff = chunk['content']
-            
+
             # Retrieve context (find similar chunks in the store - e.g. related functions)
-            # We exclude the chunk itself from context ideally, but for now we just query
-            context = self.vector_store.query(diff, n_results=3)
-            
-            # Filter out the chunk itself from context if it appears
-            filtered_context = [
-                c for c in context 
-                if c['metadata']['name'] != chunk['name'] or c['metadata']['start_line'] != chunk['start_line']
-            ]
+            if graph is not None:
+                filtered_context = graph.query(diff, n_results=3, file_path=file_path)
+            elif self.retrieval_mode == "hybrid":
+                filtered_context = self.vector_store.hybrid_query_unique(diff, n_results=3, exclude=dict(chunk, file=file_path))
+            else:
+                # Over-fetch and drop the chunk itself, its split/merged variants and near-duplicates
+                filtered_context = self.vector_store.query_unique(diff, n_results=3, exclude=dict(chunk, file=file_path))
 
             # 4. Routing
-            selected_experts = self.router.route(diff, filtered_context)
+            selected_experts = experts if experts is not None else self.router.route(diff, filtered_context)
             print(f"  - Chunk '{chunk['name']}' routed to: {selected_experts}")
-            
-            # 5. Expert Review
-            for expert_name in selected_experts:
-                if expert_name in self.experts:
-                    comments = self.experts[expert_name].review(diff, filtered_context)
-                    for comment in comments:
-                        all_comments.append({
-                            "file": file_path,
-                            "line": chunk['start_line'] + 1, # Approximate line
-                            "expert": expert_name,
-                            "message": comment
-                        })
-
-        # 6. Aggregation & Formatting
-        return self._format_report(all_comments)
+            tasks.append({
+                "file": file_path,
+                "chunk": chunk,
+                "context": filtered_context,
+                "experts": [e for e in selected_experts if e in self.experts],
+            })
+        return tasks
+
+    def run_tasks(self, tasks: List[Dict]) -> List[Dict]:
+        """
+        Runs the expert reviews for planned tasks, batching all chunks routed
+        to the same expert into one generate call (or, with continuous batching,
+        queueing every expert's requests on the shared engine before waiting).
+        Returns all comments and also stores each task's own comments under
+        `task["comments"]`.
+        """
+        # 5. Expert Review
+        print("Reviewing chunks...")
+        for task in tasks:
+            task["comments"] = []
+
+        all_comments: List[Dict] = []
+        if self.panel is not None:
+            results = self.panel.review_panel_batch(
+                [(t["chunk"]['content'], t["context"], t["experts"]) for t in tasks]
+            )
+            for task, by_expert in zip(tasks, results):
+                for expert_name in task["experts"]:
+                    self._add_comments(task, expert_name, by_expert.get(expert_name, []), all_comments)
+            return all_comments
+
+        by_expert: Dict[str, List[Dict]] = {}
+        for task in tasks:
+            if self.shared_prefix and len(task["experts"]) > 1:
+                experts = [self.experts[name] for name in task["experts"]]
+                results = review_with_shared_prefix(experts, task["chunk"]['content'], task["context"])
+                for expert_name in task["experts"]:
+                    self._add_comments(task, expert_name, results[expert_name], all_comments)
+                continue
+            for expert_name in task["experts"]:
+                by_expert.setdefault(expert_name, []).append(task)
+
+        pending = []
+        for expert_name, expert_tasks in by_expert.items():
+            expert = self.experts[expert_name]
+            items = [(t["chunk"]['content'], t["context"]) for t in expert_tasks]
+            if expert.engine is not None:
+                pending.append((expert_name, expert_tasks, expert.submit_reviews(items)))
+            else:
+                pending.append((expert_name, expert_tasks, expert.review_batch(items)))
+
+        for expert_name, expert_tasks, results in pending:
+            for task, comments in zip(expert_tasks, results):
+                if isinstance(comments, Future):
+                    comments = comments.result()
+                self._add_comments(task, expert_name, comments, all_comments)
+        return all_comments
+
+    @staticmethod
+    def _add_comments(task: Dict, expert_name: str, comments: List[str], all_comments: List[Dict]):
+        for comment in comments:
+            entry = {
+                "file": task["file"],
+                "line": task["chunk"]['start_line'] + 1, # Approximate line
+                "expert": expert_name,
+                "message": comment
+            }
+            task["comments"].append(entry)
+            all_comments.append(entry)
 
     def _format_report(self, comments: List[Dict]) -> str:
         if not comments:
             return "No issues found."
-        
+
         report = "AST-Reviewer Report\n===================\n\n"
-        
+
         # Group by file and line
         sorted_comments = sorted(comments, key=lambda x: (x['file'], x['line']))
-        
+
         for c in sorted_comments:
             report += f"[{c['expert']}] {c['file']}:{c['line']}\n"
             report += f"  {c['message']}\n\n"
@@ -0,0 +1,296 @@
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+JOB_KINDS = ("file", "diff", "snippet")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class ReviewServer:
+    """
+    Keeps a ReviewPipeline warm and reviews jobs submitted by any number of clients.
+
+    Jobs are queued and picked up by a single worker thread. When a job
+    arrives, the worker waits up to `batch_timeout` seconds for more jobs (at
+    most `max_batch_size`), plans all of them and runs their expert reviews
+    together, so concurrent clients share batched generate calls.
+
+    A job is a dict:
+      {"kind": "file", "path": "...", ["content": "..."]}  a Python file (read from `file_root` unless content is given)
+      {"kind": "snippet", "content": "..."}                Python source, chunked like a file
+      {"kind": "diff", "content": "..."}                   reviewed as a single chunk
+    plus optional "experts" (skip the router) and "name" (label used in the report).
+    Without `file_root` the server reads no files: "file" jobs must carry their content.
+    """
+
+    def __init__(self, pipeline, max_batch_size: int = 8, batch_timeout: float = 0.05, max_queue_size: int = 64,
+                 file_root: Optional[str] = None):
+        self.pipeline = pipeline
+        self.file_root = file_root
+        self.max_batch_size = max_batch_size
+        self.batch_timeout = batch_timeout
+        self.jobs: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="review-worker", daemon=True)
+        self.stats = {"jobs": 0, "batches": 0, "errors": 0}
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+        self._worker.join(timeout=5)
+
+    def submit(self, job: Dict) -> Future:
+        """Validates and queues a job; the returned future resolves to its result dict."""
+        job = normalize_job(job, self.file_root)
+        future: Future = Future()
+        try:
+            self.jobs.put_nowait((job, future))
+        except queue.Full:
+            raise QueueFullError(f"Review queue is full ({self.jobs.maxsize} jobs)")
+        return future
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self.jobs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.batch_timeout
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.jobs.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        planned = []
+        for job, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                planned.append((job, future, self._plan(job)))
+            except Exception as e:
+                self.stats["errors"] += 1
+                future.set_exception(e)
+
+        try:
+            self.pipeline.run_tasks([task for _, _, tasks in planned for task in tasks])
+        except Exception as e:
+            for _, future, _ in planned:
+                self.stats["errors"] += 1
+                future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - started
+        self.stats["batches"] += 1
+        for job, future, tasks in planned:
+            comments = [c for task in tasks for c in task["comments"]]
+            self.stats["jobs"] += 1
+            future.set_result({
+                "name": job["name"],
+                "comments": comments,
+                "report": self.pipeline._format_report(comments),
+                "batch_size": len(planned),
+                "seconds": round(elapsed, 3),
+            })
+
+    def _plan(self, job: Dict) -> List[Dict]:
+        if job["kind"] == "diff":
+            content = job["content"]
+            chunk = {
+                "name": job["name"],
+                "type": "diff",
+                "content": content,
+                "start_line": 0,
+                "end_line": content.count("\n"),
+            }
+            return self.pipeline.plan([chunk], job["name"], experts=job.get("experts"), source="")
+        return self.pipeline.plan(
+            self.pipeline.chunker.chunk_code(job["content"]),
+            job["name"],
+            experts=job.get("experts"),
+            source=job["content"],
+        )
+
+
+def normalize_job(job: Dict, file_root: Optional[str] = None) -> Dict:
+    """
+    Checks a job dict and fills in `content` and `name`. Raises ValueError on bad input.
+    A "file" job without content is read from `path` only if it lies under `file_root`.
+    """
+    if not isinstance(job, dict):
+        raise ValueError("Job must be a JSON object")
+    kind = job.get("kind")
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind {kind!r}, expected one of {', '.join(JOB_KINDS)}")
+    job = dict(job)
+    if kind == "file" and job.get("content") is None:
+        job["content"] = read_job_file(job.get("path"), file_root)
+    if not isinstance(job.get("content"), str):
+        raise ValueError(f"'{kind}' jobs need a 'content' string")
+    experts = job.get("experts")
+    if experts is not None and not (isinstance(experts, list) and all(isinstance(e, str) for e in experts)):
+        raise ValueError("'experts' must be a list of expert names")
+    job["name"] = job.get("name") or job.get("path") or f"<{kind}>"
+    return job
+
+
+def read_job_file(path: Optional[str], file_root: Optional[str]) -> str:
+    if file_root is None:
+        raise ValueError("'file' jobs need a 'content' string; this server reads no files (see --file-root)")
+    root = os.path.realpath(file_root)
+    # Resolve symlinks and ".." before the check, so neither can leave the root
+    full_path = os.path.realpath(os.path.join(root, path or ""))
+    if os.path.commonpath([root, full_path]) != root:
+        raise ValueError(f"Path outside the server's file root: {path}")
+    if not os.path.isfile(full_path):
+        raise ValueError(f"File not found: {path}")
+    with open(full_path, "r") as f:
+        return f.read()
+
+
+class ReviewRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API:
+      GET  /health  -> {"status": "ok", "queued": n, ...stats}
+      POST /review  -> body is a job, response is its result (blocks until reviewed)
+    """
+
+    server_version = "ast-reviewer"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send(404, {"error": f"Unknown path {self.path}"})
+        review_server = self.server.review_server
+        self._send(200, {"status": "ok", "queued": review_server.jobs.qsize(), **review_server.stats})
+
+    def do_POST(self):
+        if self.path != "/review":
+            return self._send(404, {"error": f"Unknown path {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length) or b"null")
+            future = self.server.review_server.submit(job)
+        except (ValueError, json.JSONDecodeError) as e:
+            return self._send(400, {"error": str(e)})
+        except QueueFullError as e:
+            return self._send(503, {"error": str(e)})
+
+        try:
+            result = future.result(timeout=self.server.request_timeout)
+        except Exception as e:
+            return self._send(500, {"error": f"{type(e).__name__}: {e}"})
+        self._send(200, result)
+
+    def _send(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+        # BaseHTTPRequestHandler expects these from HTTPServer
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def make_http_server(
+    review_server: ReviewServer,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Optional[str] = None,
+    request_timeout: Optional[float] = None,
+    verbose: bool = False,
+):
+    """Binds the HTTP API on a Unix socket (if `socket_path` is given) or on host:port."""
+    if socket_path:
+        httpd = UnixHTTPServer(socket_path, ReviewRequestHandler)
+    else:
+        httpd = ThreadingHTTPServer((host, port), ReviewRequestHandler)
+    httpd.review_server = review_server
+    httpd.request_timeout = request_timeout
+    httpd.verbose = verbose
+    return httpd
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ReviewClient:
+    """Thin client for a running ReviewServer, over TCP or a Unix socket."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        if self.socket_path:
+            conn = _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            body = json.dumps(payload).encode("utf8") if payload is not None else None
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise RuntimeError(f"Review server returned {response.status}: {data.get('error')}")
+        return data
+
+    def health(self) -> Dict:
+        return self._request("GET", "/health")
+
+    def review(self, kind: str, content: Optional[str] = None, path: Optional[str] = None,
+               experts: Optional[List[str]] = None, name: Optional[str] = None) -> Dict:
+        job = {"kind": kind, "content": content, "path": path, "experts": experts, "name": name}
+        return self._request("POST", "/review", {k: v for k, v in job.items() if v is not None})
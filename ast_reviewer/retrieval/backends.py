@@ -0,0 +1,377 @@
+import json
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class VectorBackend:
+    """
+    Storage/search interface behind VectorStore.
+    Backends store precomputed embeddings with their documents and metadata
+    and return (ids, squared L2 distances) for a query vector.
+    """
+
+    def add(self, ids: List[str], embeddings: Sequence, documents: List[str], metadatas: List[Dict]):
+        raise NotImplementedError
+
+    def query(self, embedding, n_results: int) -> Tuple[List[str], List[float]]:
+        raise NotImplementedError
+
+    def get_all(self) -> Tuple[List[str], List[str], List[Dict]]:
+        """Returns (ids, documents, metadatas) for everything stored."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    """Persistent Chroma collection (SQLite + HNSW on disk)."""
+
+    def __init__(self, collection_name: str, embedding_fn=None, path: str = "./chroma_db"):
+        import chromadb
+
+        # Use persistent client to save data to disk
+        self.client = chromadb.PersistentClient(path=path)
+        self.embedding_fn = embedding_fn
+        self.collection = self.client.get_or_create_collection(
+            name=collection_name,
+            embedding_function=embedding_fn
+        )
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.add(
+            documents=documents,
+            embeddings=list(embeddings),
+            metadatas=metadatas,
+            ids=ids
+        )
+
+    def query(self, embedding, n_results):
+        results = self.collection.query(query_embeddings=[embedding], n_results=n_results)
+        ids = results['ids'][0] if results['ids'] else []
+        distances = results['distances'][0] if results['distances'] else [None] * len(ids)
+        return ids, distances
+
+    def get_all(self):
+        stored = self.collection.get(include=["documents", "metadatas"])
+        return stored['ids'], stored['documents'], stored['metadatas']
+
+    def count(self):
+        return self.collection.count()
+
+    def clear(self):
+        self.client.delete_collection(self.collection.name)
+        self.collection = self.client.get_or_create_collection(
+            name=self.collection.name,
+            embedding_function=self.embedding_fn
+        )
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means; returns the (k, dim) centroids."""
+    rng = np.random.RandomState(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(data, centroids)
+        for c in range(k):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                centroids[c] = data[rng.randint(len(data))]
+    return centroids
+
+
+def _squared_l2(queries: np.ndarray, data: np.ndarray, data_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """Squared L2 distances via one matrix multiply: |q|^2 - 2 q.x + |x|^2."""
+    if data_norms is None:
+        data_norms = np.einsum("ij,ij->i", data, data)
+    q_norms = np.einsum("ij,ij->i", queries, queries)
+    return np.maximum(q_norms[:, None] - 2.0 * queries @ data.T + data_norms[None, :], 0.0)
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return _squared_l2(data, centroids).argmin(axis=1)
+
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(distances):
+        return np.argsort(distances)
+    part = np.argpartition(distances, k)[:k]
+    return part[np.argsort(distances[part])]
+
+
+class NumpyBackend(VectorBackend):
+    """
+    In-process backend for ephemeral stores: nothing touches disk unless
+    `save` is called.
+
+    index="flat" does exact search with one matrix multiply.
+    index="ivf" clusters vectors into `nlist` inverted lists and scans only
+    the `nprobe` closest lists. index="ivfpq" additionally replaces the float
+    vectors with product-quantization codes (`pq_m` sub-vectors, one byte
+    each) and ranks with asymmetric distance tables.
+    index="auto" uses flat below `ivf_threshold` vectors and ivf above it.
+
+    dtype="float16" or "int8" stores scalar-quantized vectors (2x / ~4x
+    smaller; int8 keeps one float32 scale per row). When a `rerank_fn`
+    (ids -> float32 vectors) is given, the top `n_results * rerank_factor`
+    candidates are re-scored with exact float distances.
+
+    IVF/PQ are trained lazily on the first query that needs them; later adds
+    are assigned/encoded with the trained quantizers. IVF lists are re-trained
+    when the collection has doubled since training (PQ codebooks are not,
+    since the float vectors are gone once encoded).
+    """
+
+    DTYPES = ("float32", "float16", "int8")
+    BLOCK_ROWS = 65536
+
+    def __init__(
+        self,
+        index: str = "auto",
+        ivf_threshold: int = 20000,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        pq_m: int = 16,
+        dtype: str = "float32",
+        rerank_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+        rerank_factor: int = 4,
+    ):
+        if index not in ("auto", "flat", "ivf", "ivfpq"):
+            raise ValueError(f"Unknown index type: {index}")
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype}")
+        self.index = index
+        self.ivf_threshold = ivf_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.dtype = dtype
+        self.rerank_fn = rerank_fn
+        self.rerank_factor = rerank_factor
+        self.clear()
+
+    def clear(self):
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._pending: List[np.ndarray] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        # IVF state
+        self._centroids: Optional[np.ndarray] = None
+        self._assign: Optional[np.ndarray] = None
+        self._lists: Optional[List[np.ndarray]] = None
+        self._trained_size = 0
+        # PQ state
+        self._codebooks: Optional[List[np.ndarray]] = None
+        self._codes: Optional[np.ndarray] = None
+
+    def count(self):
+        return len(self.ids)
+
+    def add(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+        self.metadatas.extend(metadatas)
+        self._pending.append(np.asarray(embeddings, dtype=np.float32))
+
+    def get_all(self):
+        return list(self.ids), list(self.documents), list(self.metadatas)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the vector index (excluding documents/metadata)."""
+        self._sync()
+        arrays = [self._vectors, self._scales, self._norms, self._codes, self._assign, self._centroids]
+        arrays += self._codebooks or []
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    # ------------------------------------------------------------------ #
+    # Scalar quantization
+    # ------------------------------------------------------------------ #
+    def _quantize(self, vectors: np.ndarray):
+        """Returns (stored rows, per-row scales or None)."""
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), None
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return vectors, None
+
+    def _dequantize(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        vectors = self._vectors if rows is None else self._vectors[rows]
+        if self.dtype == "int8":
+            scales = self._scales if rows is None else self._scales[rows]
+            return vectors.astype(np.float32) * scales[:, None]
+        return vectors.astype(np.float32, copy=False)
+
+    def _scan(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Squared L2 from `query` to stored rows, dequantizing block by block."""
+        total = len(self._vectors) if rows is None else len(rows)
+        out = np.empty(total, dtype=np.float32)
+        for start in range(0, total, self.BLOCK_ROWS):
+            block = np.arange(start, min(start + self.BLOCK_ROWS, total))
+            idx = block if rows is None else rows[block]
+            out[block] = _squared_l2(query, self._dequantize(idx), self._norms[idx])[0]
+        return out
+
+    def _sync(self):
+        """Folds pending adds into the (possibly quantized) storage."""
+        if not self._pending:
+            return
+        new = np.concatenate(self._pending, axis=0)
+        self._pending = []
+
+        if self._codebooks is not None:
+            codes = self._encode(new)
+            self._codes = np.concatenate([self._codes, codes]) if self._codes is not None else codes
+        else:
+            stored, scales = self._quantize(new)
+            restored = stored.astype(np.float32) * scales[:, None] if scales is not None else stored.astype(np.float32)
+            norms = np.einsum("ij,ij->i", restored, restored)
+            self._vectors = np.concatenate([self._vectors, stored]) if self._vectors is not None else stored
+            self._norms = np.concatenate([self._norms, norms]) if self._norms is not None else norms
+            if scales is not None:
+                self._scales = np.concatenate([self._scales, scales]) if self._scales is not None else scales
+
+        if self._centroids is not None:
+            self._assign = np.concatenate([self._assign, _nearest(new, self._centroids)])
+            self._lists = None
+
+    def _mode(self) -> str:
+        if self.index == "auto":
+            return "ivf" if self.count() >= self.ivf_threshold else "flat"
+        return self.index
+
+    # ------------------------------------------------------------------ #
+    # Search
+    # ------------------------------------------------------------------ #
+    def query(self, embedding, n_results):
+        if not self.ids:
+            return [], []
+        self._sync()
+        query = np.asarray(embedding, dtype=np.float32)[None, :]
+        mode = self._mode()
+        quantized = self.dtype != "float32" or mode == "ivfpq"
+        depth = n_results * self.rerank_factor if quantized and self.rerank_fn else n_results
+
+        if mode == "flat":
+            candidates = np.arange(len(self.ids))
+            distances = self._scan(query)
+        else:
+            self._ensure_trained(pq=(mode == "ivfpq"))
+            if self._lists is None:
+                self._lists = [np.flatnonzero(self._assign == c) for c in range(len(self._centroids))]
+
+            probe = _top_k(_squared_l2(query, self._centroids)[0], self.nprobe)
+            candidates = np.concatenate([self._lists[c] for c in probe])
+            if len(candidates) == 0:
+                return [], []
+            if self._codes is not None:
+                distances = self._pq_distances(query[0], candidates)
+            else:
+                distances = self._scan(query, candidates)
+
+        order = _top_k(distances, depth)
+        ids = [self.ids[candidates[i]] for i in order]
+        distances = distances[order]
+
+        if depth > n_results:
+            # Exact float re-ranking of the quantized shortlist
+            exact = np.asarray(self.rerank_fn(ids), dtype=np.float32)
+            distances = _squared_l2(query, exact)[0]
+            order = _top_k(distances, n_results)
+            ids = [ids[i] for i in order]
+            distances = distances[order]
+        return ids, [float(d) for d in distances]
+
+    def _ensure_trained(self, pq: bool):
+        if self._codebooks is None and (self._centroids is None or self.count() >= 2 * self._trained_size):
+            vectors = self._dequantize()
+            nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+            sample_size = min(len(vectors), 50 * nlist)
+            sample = vectors[np.random.RandomState(0).choice(len(vectors), sample_size, replace=False)]
+            self._centroids = _kmeans(sample, nlist)
+            self._assign = _nearest(vectors, self._centroids)
+            self._lists = None
+            self._trained_size = len(vectors)
+
+        if pq and self._codebooks is None:
+            vectors = self._dequantize()
+            self._train_pq(vectors)
+            self._codes = self._encode(vectors)
+            # The compressed codes replace the stored rows
+            self._vectors = None
+            self._scales = None
+            self._norms = None
+
+    def _train_pq(self, vectors: np.ndarray):
+        dim = vectors.shape[1]
+        if dim % self.pq_m:
+            raise ValueError(f"pq_m={self.pq_m} must divide the vector dimension {dim}")
+        sub = dim // self.pq_m
+        n_codes = min(256, len(vectors))
+        self._codebooks = [
+            _kmeans(vectors[:, m * sub:(m + 1) * sub], n_codes, iterations=5, seed=m)
+            for m in range(self.pq_m)
+        ]
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        sub = vectors.shape[1] // self.pq_m
+        codes = np.empty((len(vectors), self.pq_m), dtype=np.uint8)
+        for m, codebook in enumerate(self._codebooks):
+            codes[:, m] = _nearest(vectors[:, m * sub:(m + 1) * sub], codebook)
+        return codes
+
+    def _pq_distances(self, query: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        sub = len(query) // self.pq_m
+        tables = [
+            _squared_l2(query[None, m * sub:(m + 1) * sub], codebook)[0]
+            for m, codebook in enumerate(self._codebooks)
+        ]
+        codes = self._codes[candidates]
+        return sum(tables[m][codes[:, m]] for m in range(self.pq_m))
+
+    # ------------------------------------------------------------------ #
+    # Persistence
+    # ------------------------------------------------------------------ #
+    def save(self, path: str):
+        """Writes the quantized flat index and documents to `path` (a directory)."""
+        self._sync()
+        if self._codebooks is not None:
+            raise ValueError("Saving IVF-PQ indexes is not supported; use index='flat' or 'ivf'")
+        os.makedirs(path, exist_ok=True)
+        arrays = {"vectors": self._vectors, "norms": self._norms}
+        if self._scales is not None:
+            arrays["scales"] = self._scales
+        np.savez(os.path.join(path, "vectors.npz"), **{k: v for k, v in arrays.items() if v is not None})
+        with open(os.path.join(path, "documents.json"), "w") as f:
+            json.dump({"dtype": self.dtype, "ids": self.ids, "documents": self.documents, "metadatas": self.metadatas}, f)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "NumpyBackend":
+        with open(os.path.join(path, "documents.json"), "r") as f:
+            stored = json.load(f)
+        backend = cls(dtype=stored["dtype"], **kwargs)
+        backend.ids = stored["ids"]
+        backend.documents = stored["documents"]
+        backend.metadatas = stored["metadatas"]
+        if backend.ids:
+            arrays = np.load(os.path.join(path, "vectors.npz"))
+            backend._vectors = arrays["vectors"]
+            backend._norms = arrays["norms"]
+            backend._scales = arrays["scales"] if "scales" in arrays else None
+        return backend
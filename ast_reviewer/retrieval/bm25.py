@@ -0,0 +1,117 @@
+import heapq
+import keyword
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_STOPWORDS = set(keyword.kwlist) | {"self", "cls", "context", "definition", "block", "comment"}
+
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Splits code into lowercase lexical terms.
+    Every identifier is kept whole (so `normalize_vectors` matches exactly) and
+    is also broken into its snake_case / CamelCase parts for partial matches.
+    """
+    terms = []
+    for ident in _IDENT_RE.findall(text):
+        lower = ident.lower()
+        if lower in _STOPWORDS:
+            continue
+        terms.append(lower)
+        parts = [p.lower() for piece in ident.split("_") for p in _CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(p for p in parts if len(p) > 1 and p not in _STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+    Lookups only touch the posting lists of the query terms, so identifier
+    queries are answered without embedding anything.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.documents: Dict[str, Tuple[str, Dict]] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, content: str, metadata: Optional[Dict] = None):
+        """Adds (or replaces) a document in the index."""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        terms = Counter(tokenize_code(content))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self._total_length += length
+        self.documents[doc_id] = (content, metadata or {})
+
+    def remove(self, doc_id: str):
+        """Removes a document from the index if present."""
+        if doc_id not in self.doc_lengths:
+            return
+        content, _ = self.documents.pop(doc_id)
+        for term in set(tokenize_code(content)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+        self._total_length -= self.doc_lengths.pop(doc_id)
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_lengths.clear()
+        self.documents.clear()
+        self._total_length = 0
+
+    def search(self, query: str, n_results: int = 3, terms: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Returns the top `n_results` (doc_id, score) pairs for the query.
+        If `terms` is given (e.g. identifiers extracted from a snippet) they are
+        tokenized and used instead of the query text.
+        """
+        if not self.doc_lengths:
+            return []
+
+        query_terms = set(tokenize_code(" ".join(terms) if terms is not None else query))
+        n_docs = len(self.doc_lengths)
+        avg_len = self._total_length / n_docs if n_docs else 0.0
+
+        scores: Dict[str, float] = {}
+        for term in query_terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_len) if avg_len else self.k1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuses several ranked id lists with reciprocal-rank fusion:
+    score(d) = sum over rankings of 1 / (k + rank(d)).
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -25,7 +25,9 @@ class CASTChunker:
     def chunk_file(self, file_path: str) -> List[Dict]:
         with open(file_path, "r") as f:
             code = f.read()
-        
+        return self.chunk_code(code)
+
+    def chunk_code(self, code: str) -> List[Dict]:
         tree = self.parse(code)
         
         # 1. Extract
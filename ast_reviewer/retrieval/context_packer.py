@@ -0,0 +1,112 @@
+import textwrap
+from typing import Callable, Dict, List, Optional
+
+from tree_sitter import Language, Parser
+import tree_sitter_python as tspython
+
+TRUNCATION_MARKER = "# ... (truncated)"
+
+
+def format_context_chunk(chunk: Dict) -> str:
+    """Formats a retrieved chunk the way experts show it in their prompt."""
+    return f"--- Chunk: {chunk['metadata']['name']} ---\n{chunk['content']}\n"
+
+
+def relevance_key(chunk: Dict):
+    """Sort key: higher `score` first, then lower `distance`, then retrieval order."""
+    score = chunk.get("score")
+    if score is not None:
+        return -score
+    distance = chunk.get("distance")
+    if distance is not None:
+        return distance
+    return 0.0
+
+
+class ContextPacker:
+    """
+    Fits retrieved chunks into a token budget.
+    Chunks are de-duplicated, ordered by relevance and added greedily; the first
+    chunk that does not fit is cut at the last statement boundary that does,
+    so the prompt never carries half a statement.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int], token_budget: int):
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.parser = Parser(Language(tspython.language()))
+
+    def pack(self, chunks: List[Dict], token_budget: Optional[int] = None) -> List[Dict]:
+        budget = self.token_budget if token_budget is None else token_budget
+        if not chunks or budget <= 0:
+            return []
+
+        ordered = sorted(enumerate(chunks), key=lambda item: (relevance_key(item[1]), item[0]))
+        packed: List[Dict] = []
+        remaining = budget
+
+        for _, chunk in ordered:
+            if self._is_duplicate(chunk, packed):
+                continue
+            # +1 for the newline joining chunks in the prompt
+            cost = self.count_tokens(format_context_chunk(chunk)) + 1
+            if cost <= remaining:
+                packed.append(chunk)
+                remaining -= cost
+                continue
+
+            truncated = self._truncate(chunk, remaining)
+            if truncated is not None:
+                packed.append(truncated)
+            break
+
+        return packed
+
+    def _is_duplicate(self, chunk: Dict, packed: List[Dict]) -> bool:
+        """A chunk is redundant if its content or line span is already covered."""
+        meta = chunk.get("metadata", {})
+        for other in packed:
+            if chunk["content"] == other["content"]:
+                return True
+            other_meta = other.get("metadata", {})
+            # Line spans only compare within one known file
+            if meta.get("file") is None or meta.get("file") != other_meta.get("file"):
+                continue
+            if "start_line" not in meta or "start_line" not in other_meta:
+                continue
+            if other_meta["start_line"] <= meta["start_line"] and meta["end_line"] <= other_meta["end_line"]:
+                return True
+        return False
+
+    def _truncate(self, chunk: Dict, budget: int) -> Optional[Dict]:
+        """Returns a copy of `chunk` cut at the longest statement prefix that fits, or None."""
+        lines = chunk["content"].split("\n")
+        boundaries = self._statement_boundaries(chunk["content"])
+
+        best = None
+        lo, hi = 0, len(boundaries) - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            candidate = dict(chunk)
+            candidate["content"] = "\n".join(lines[:boundaries[mid] + 1] + [TRUNCATION_MARKER])
+            if self.count_tokens(format_context_chunk(candidate)) + 1 <= budget:
+                best = candidate
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        return best
+
+    def _statement_boundaries(self, content: str) -> List[int]:
+        """Line numbers (0-based) on which a statement ends, at any nesting depth."""
+        # Dedent so method chunks parse; line numbers are unchanged
+        tree = self.parser.parse(bytes(textwrap.dedent(content), "utf8"))
+        ends = set()
+        stack = [tree.root_node]
+        while stack:
+            node = stack.pop()
+            for child in node.children:
+                if node.type in ("module", "block") and child.is_named and child.type != "comment":
+                    ends.add(child.end_point[0])
+                if child.children:
+                    stack.append(child)
+        return sorted(ends)
@@ -0,0 +1,129 @@
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_PART_SUFFIX_RE = re.compile(r"(_part\d+)+$")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# a * h + b stays below 2**64 for a, b < 2**31 and 32-bit shingle hashes
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def base_name(name: str) -> str:
+    """Strips cAST split suffixes, e.g. `foo_part1_part2` -> `foo`."""
+    return _PART_SUFFIX_RE.sub("", name or "")
+
+
+class MinHasher:
+    """
+    MinHash signatures over token shingles, used to estimate the Jaccard
+    similarity of two chunks without comparing their full text.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Deterministic universal hash family h(x) = (a*x + b) mod p
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, _MERSENNE_PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self.b = rng.randint(0, _MERSENNE_PRIME, size=(num_perm, 1)).astype(np.uint64)
+
+    def shingles(self, text: str) -> set:
+        # Drop the cAST "# Context:" breadcrumb so split parts don't look alike by header alone
+        lines = [line for line in text.splitlines() if not line.strip().startswith("# Context:")]
+        tokens = _TOKEN_RE.findall("\n".join(lines))
+        if len(tokens) < self.shingle_size:
+            return {" ".join(tokens)} if tokens else set()
+        return {
+            " ".join(tokens[i:i + self.shingle_size])
+            for i in range(len(tokens) - self.shingle_size + 1)
+        }
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf8")) for s in self.shingles(text)), dtype=np.uint64
+        )
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+        return ((self.a * hashes[None, :] + self.b) % _MERSENNE_PRIME).min(axis=1)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        if len(sig_a) == 0:
+            return 0.0
+        return float(np.mean(sig_a == sig_b))
+
+
+def span_overlap(meta_a: Dict, meta_b: Dict) -> float:
+    """
+    Fraction of the shorter chunk's line span covered by the other chunk.
+    Chunks from different or unknown files never overlap: the vector store
+    does not record source paths, and equal line numbers alone say nothing.
+    """
+    if meta_a.get("file") is None or meta_a.get("file") != meta_b.get("file"):
+        return 0.0
+    if meta_a.get("start_line") is None or meta_b.get("start_line") is None:
+        return 0.0
+    start = max(meta_a["start_line"], meta_b["start_line"])
+    end = min(meta_a["end_line"], meta_b["end_line"])
+    if end < start:
+        return 0.0
+    shorter = min(meta_a["end_line"] - meta_a["start_line"], meta_b["end_line"] - meta_b["start_line"]) + 1
+    return (end - start + 1) / shorter
+
+
+class ContextDeduplicator:
+    """
+    Post-retrieval filter that drops near-duplicate context chunks.
+    A chunk is a duplicate of an already kept one if their line spans mostly
+    overlap (merged/split variants of the same code) or if their MinHash
+    similarity is above the threshold (copied definitions).
+    """
+
+    def __init__(self, similarity_threshold: float = 0.8, overlap_threshold: float = 0.6, num_perm: int = 64):
+        self.similarity_threshold = similarity_threshold
+        self.overlap_threshold = overlap_threshold
+        self.hasher = MinHasher(num_perm=num_perm)
+
+    def deduplicate(self, results: List[Dict], k: Optional[int] = None, exclude: Optional[Dict] = None) -> List[Dict]:
+        """
+        Returns up to `k` results in their original order with near-duplicates removed.
+        `exclude` is a chunk (e.g. the one under review) that counts as already
+        kept, so it and its split parts are filtered out too.
+        """
+        kept: List[Dict] = []
+        seen = []
+        if exclude is not None:
+            seen.append((self._metadata(exclude), self.hasher.signature(exclude["content"])))
+
+        for result in results:
+            if k is not None and len(kept) >= k:
+                break
+            meta = self._metadata(result)
+            sig = self.hasher.signature(result["content"])
+            if any(self._is_duplicate(meta, sig, other_meta, other_sig) for other_meta, other_sig in seen):
+                continue
+            kept.append(result)
+            seen.append((meta, sig))
+        return kept
+
+    def _is_duplicate(self, meta, sig, other_meta, other_sig) -> bool:
+        same_code = base_name(meta.get("name")) == base_name(other_meta.get("name"))
+        if same_code and span_overlap(meta, other_meta) >= self.overlap_threshold:
+            return True
+        if span_overlap(meta, other_meta) >= 1.0:
+            return True
+        return self.hasher.similarity(sig, other_sig) >= self.similarity_threshold
+
+    @staticmethod
+    def _metadata(chunk: Dict) -> Dict:
+        # Raw chunker output keeps name/lines at the top level, query results under "metadata"
+        if "metadata" in chunk and "start_line" in chunk["metadata"]:
+            return chunk["metadata"]
+        return {
+            "name": chunk.get("name"),
+            "start_line": chunk.get("start_line"),
+            "end_line": chunk.get("end_line"),
+            "file": chunk.get("file", chunk.get("metadata", {}).get("file")),
+        }
@@ -0,0 +1,248 @@
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from tree_sitter import Language, Parser
+import tree_sitter_python as tspython
+
+
+@dataclass
+class Definition:
+    """A function or class definition node in the dependency graph."""
+    name: str
+    qualified_name: str
+    kind: str  # function_definition, class_definition
+    file_path: str
+    content: str
+    start_line: int
+    end_line: int
+    references: Counter = field(default_factory=Counter)
+
+
+class DependencyGraph:
+    """
+    Call/import graph over a set of Python files, built with tree-sitter.
+    Each definition keeps the names it calls or references; edges are resolved
+    by name at query time (same file first, then imported modules, then the rest),
+    so retrieval is a pure in-memory graph walk with no embedding cost.
+    """
+
+    DEFINITIONS = ("function_definition", "class_definition")
+
+    def __init__(self):
+        self.parser = Parser(Language(tspython.language()))
+        self.definitions: List[Definition] = []
+        self.by_name: Dict[str, List[int]] = {}
+        # file -> local alias -> imported module / symbol path
+        self.imports: Dict[str, Dict[str, str]] = {}
+        self.module_names: Dict[str, str] = {}
+
+    # ------------------------------------------------------------------ #
+    # Building
+    # ------------------------------------------------------------------ #
+    def add_file(self, file_path: str, root: Optional[str] = None):
+        """Parses a file and adds its definitions and imports to the graph."""
+        with open(file_path, "r") as f:
+            code = f.read()
+        self.add_source(code, file_path, root=root)
+
+    def add_source(self, code: str, file_path: str, root: Optional[str] = None):
+        source = bytes(code, "utf8")
+        tree = self.parser.parse(source)
+
+        rel = os.path.relpath(file_path, root) if root else os.path.basename(file_path)
+        self.module_names[file_path] = os.path.splitext(rel)[0].replace(os.sep, ".")
+        self.imports[file_path] = self._collect_imports(tree.root_node, source)
+        self._collect_definitions(tree.root_node, source, file_path, scope="")
+
+    def add_directory(self, directory: str):
+        """Indexes every .py file under a directory."""
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.endswith(".py"):
+                    full_path = os.path.join(root, file)
+                    try:
+                        self.add_file(full_path, root=directory)
+                    except (OSError, UnicodeDecodeError) as e:
+                        print(f"  Failed to index {file}: {e}")
+
+    def _collect_definitions(self, node, source: bytes, file_path: str, scope: str):
+        for child in node.children:
+            target = child
+            if child.type == "decorated_definition":
+                target = child.child_by_field_name("definition") or child
+
+            if target.type not in self.DEFINITIONS:
+                # Definitions nested in if/try/with blocks
+                self._collect_definitions(child, source, file_path, scope=scope)
+                continue
+
+            name_node = target.child_by_field_name("name")
+            name = self._text(name_node, source) if name_node else "unknown"
+            qualified = f"{scope}.{name}" if scope else name
+
+            definition = Definition(
+                name=name,
+                qualified_name=qualified,
+                kind=target.type,
+                file_path=file_path,
+                content=self._text(child, source),
+                start_line=child.start_point[0],
+                end_line=child.end_point[0],
+            )
+            self._collect_references(target, source, definition.references)
+            if child is not target:
+                self._collect_references(child, source, definition.references)
+            # The definition's own name is not a reference
+            definition.references[name] -= 1
+            if definition.references[name] <= 0:
+                del definition.references[name]
+
+            self.by_name.setdefault(name, []).append(len(self.definitions))
+            self.definitions.append(definition)
+
+            body = target.child_by_field_name("body")
+            if body is not None:
+                self._collect_definitions(body, source, file_path, scope=qualified)
+
+    def _collect_references(self, node, source: bytes, refs: Counter, skip_definitions: bool = True):
+        """
+        Collects identifiers and attribute names used below a node.
+        Nested definitions are skipped unless `skip_definitions` is False,
+        since they are graph nodes of their own.
+        """
+        for child in node.children:
+            self._visit_reference(child, source, refs, skip_definitions)
+
+    def _visit_reference(self, node, source: bytes, refs: Counter, skip_definitions: bool):
+        if node.type == "identifier":
+            refs[self._text(node, source)] += 1
+            return
+        if skip_definitions and node.type in self.DEFINITIONS + ("decorated_definition",):
+            return
+        if node.type == "attribute":
+            attr = node.child_by_field_name("attribute")
+            if attr is not None:
+                refs[self._text(attr, source)] += 1
+            obj = node.child_by_field_name("object")
+            if obj is not None:
+                self._visit_reference(obj, source, refs, skip_definitions)
+            return
+        if node.type == "call":
+            # Callees count double so they outrank plain name references
+            func = node.child_by_field_name("function")
+            if func is not None and func.type == "attribute":
+                func = func.child_by_field_name("attribute")
+            if func is not None and func.type == "identifier":
+                refs[self._text(func, source)] += 1
+        self._collect_references(node, source, refs, skip_definitions)
+
+    def _collect_imports(self, root, source: bytes) -> Dict[str, str]:
+        imports: Dict[str, str] = {}
+        for node in root.children:
+            if node.type == "import_statement":
+                for name in node.children_by_field_name("name"):
+                    path, alias = self._import_alias(name, source)
+                    imports[alias] = path
+            elif node.type == "import_from_statement":
+                module_node = node.child_by_field_name("module_name")
+                module = self._text(module_node, source).lstrip(".") if module_node else ""
+                for name in node.children_by_field_name("name"):
+                    path, alias = self._import_alias(name, source)
+                    imports[alias] = f"{module}.{path}" if module else path
+        return imports
+
+    def _import_alias(self, node, source: bytes):
+        if node.type == "aliased_import":
+            path = self._text(node.child_by_field_name("name"), source)
+            alias = self._text(node.child_by_field_name("alias"), source)
+            return path, alias
+        path = self._text(node, source)
+        return path, path.split(".")[-1]
+
+    @staticmethod
+    def _text(node, source: bytes) -> str:
+        return source[node.start_byte:node.end_byte].decode("utf8", errors="replace")
+
+    # ------------------------------------------------------------------ #
+    # Querying
+    # ------------------------------------------------------------------ #
+    def resolve(self, name: str, from_file: Optional[str] = None) -> List[int]:
+        """
+        Resolves a referenced name to definition indices, preferring the
+        referencing file, then modules it imports, then any other file.
+        """
+        candidates = self.by_name.get(name, [])
+        if not candidates or not from_file:
+            return list(candidates)
+
+        imported_modules = {path.rsplit(".", 1)[0] for path in self.imports.get(from_file, {}).values()}
+        imported_modules |= set(self.imports.get(from_file, {}).values())
+
+        def rank(idx: int) -> int:
+            definition = self.definitions[idx]
+            if definition.file_path == from_file:
+                return 0
+            if self.module_names.get(definition.file_path) in imported_modules:
+                return 1
+            return 2
+
+        return sorted(candidates, key=rank)
+
+    def query(
+        self,
+        code: str,
+        n_results: int = 3,
+        max_depth: int = 2,
+        file_path: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Returns the definitions of callees and referenced classes of `code`,
+        ranked by graph distance (direct references first), then by how often
+        they are referenced. Definitions already fully contained in `code` are
+        skipped; ones the snippet only cuts into are kept, since the rest of
+        their body is useful context.
+        """
+        source = bytes(code, "utf8")
+        tree = self.parser.parse(source)
+
+        refs: Counter = Counter()
+        self._collect_references(tree.root_node, source, refs, skip_definitions=False)
+
+        seen: Set[int] = set()
+        ranked = []  # (depth, -weight, order, idx)
+        frontier = refs
+        for depth in range(1, max_depth + 1):
+            next_refs: Counter = Counter()
+            for name, weight in frontier.most_common():
+                for idx in self.resolve(name, from_file=file_path):
+                    if idx in seen:
+                        continue
+                    if self.definitions[idx].content in code:
+                        seen.add(idx)
+                        continue
+                    seen.add(idx)
+                    ranked.append((depth, -weight, len(ranked), idx))
+                    next_refs.update(self.definitions[idx].references)
+            frontier = next_refs
+            if len(ranked) >= n_results or not frontier:
+                break
+
+        ranked.sort()
+        results = []
+        for depth, _, _, idx in ranked[:n_results]:
+            definition = self.definitions[idx]
+            results.append({
+                "content": definition.content,
+                "metadata": {
+                    "name": definition.qualified_name,
+                    "type": definition.kind,
+                    "start_line": definition.start_line,
+                    "end_line": definition.end_line,
+                    "file": definition.file_path,
+                    "depth": depth,
+                },
+                "distance": float(depth),
+            })
+        return results
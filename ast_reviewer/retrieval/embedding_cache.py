@@ -0,0 +1,157 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+KEY_SIZE = 32  # sha256 digest
+
+
+class EmbeddingCache:
+    """
+    Persistent content-hash -> float32 vector cache for one embedding model.
+
+    Layout under `<cache_dir>/<model>/`:
+      - keys.bin     append-only sha256(model_name, content) digests
+      - vectors.f32  append-only float32 rows, memory-mapped for reads
+      - meta.json    model name and vector dimension
+      - lock         flock'ed while loading or appending
+    Rows are written before their key, so a crash mid-append only leaves an
+    orphaned tail that is trimmed on the next load. Several instances (and
+    processes) may share a directory: appends happen under an exclusive lock
+    and first pick up the keys others appended since this instance last looked.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+        self.keys_path = os.path.join(self.path, "keys.bin")
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self.lock_path = os.path.join(self.path, "lock")
+
+        self.dim: Optional[int] = None
+        self.index: Dict[bytes, int] = {}
+        # Rows on disk this instance knows about (keys read so far)
+        self._rows = 0
+        self._vectors: Optional[np.memmap] = None
+        with self._locked():
+            self._load()
+
+    def __len__(self):
+        return len(self.index)
+
+    def key(self, content: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{content}".encode("utf8")).digest()
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load(self):
+        """Reads keys appended since the last call and trims an orphaned tail. Call under the lock."""
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, "r") as f:
+                self.dim = json.load(f)["dim"]
+
+        keys = b""
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "rb") as f:
+                f.seek(self._rows * KEY_SIZE)
+                keys = f.read()
+        row_bytes = self.dim * 4
+        vector_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        n = min(self._rows + len(keys) // KEY_SIZE, vector_bytes // row_bytes)
+        # Trim a partially written tail so new rows line up with new keys
+        if vector_bytes != n * row_bytes:
+            os.truncate(self.vectors_path, n * row_bytes)
+        if keys and self._rows * KEY_SIZE + len(keys) != n * KEY_SIZE:
+            os.truncate(self.keys_path, n * KEY_SIZE)
+        for row in range(self._rows, n):
+            offset = (row - self._rows) * KEY_SIZE
+            self.index.setdefault(keys[offset:offset + KEY_SIZE], row)
+        self._rows = n
+
+    def _mapped(self) -> Optional[np.memmap]:
+        rows = self._rows
+        if rows == 0:
+            return None
+        if self._vectors is None or self._vectors.shape[0] < rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._vectors
+
+    def get_many(self, contents: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Returns the cached vector for each content, or None on a miss."""
+        vectors = self._mapped()
+        results = []
+        for content in contents:
+            row = self.index.get(self.key(content))
+            results.append(np.array(vectors[row]) if row is not None else None)
+        return results
+
+    def put_many(self, contents: Sequence[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(contents) == 0:
+            return
+        with self._locked():
+            self._load()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w") as f:
+                    json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dim vectors for {self.model_name}, got {vectors.shape[1]}")
+
+            new_keys, new_rows, pending = [], [], set()
+            for content, vector in zip(contents, vectors):
+                key = self.key(content)
+                if key in self.index or key in pending:
+                    continue
+                pending.add(key)
+                new_keys.append(key)
+                new_rows.append(vector)
+            if not new_keys:
+                return
+
+            # _load left both files at exactly self._rows rows
+            start = self._rows
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(new_rows).astype(np.float32).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            for offset, key in enumerate(new_keys):
+                self.index[key] = start + offset
+            self._rows = start + len(new_keys)
+
+
+class CachedEmbedder:
+    """Wraps an embedding function so only cache misses reach the encoder."""
+
+    def __init__(self, embedding_fn: Callable[[List[str]], Sequence], cache: Optional[EmbeddingCache]):
+        self.embedding_fn = embedding_fn
+        self.cache = cache
+
+    def __call__(self, texts: List[str]) -> List[np.ndarray]:
+        if self.cache is None:
+            return [np.asarray(v, dtype=np.float32) for v in self.embedding_fn(texts)]
+
+        results = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        if missing:
+            computed = np.asarray(self.embedding_fn([texts[i] for i in missing]), dtype=np.float32)
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                results[i] = vector
+        return results
@@ -0,0 +1,181 @@
+import os
+import re
+from typing import List, Optional, Union
+
+import numpy as np
+
+# Short names for models we have benchmarked; any sentence-transformers / HF id also works
+EMBEDDING_PRESETS = {
+    "mpnet": "all-mpnet-base-v2",
+    "minilm": "all-MiniLM-L6-v2",
+    "codesearch": "flax-sentence-embeddings/st-codesearch-distilroberta-base",
+}
+
+
+def _hub_id(model_name: str) -> str:
+    model_name = EMBEDDING_PRESETS.get(model_name, model_name)
+    # Bare sentence-transformers names live under the sentence-transformers org
+    return model_name if "/" in model_name or os.path.isdir(model_name) else f"sentence-transformers/{model_name}"
+
+
+class EmbeddingProvider:
+    """
+    Turns a batch of texts into a (n, dim) float32 matrix.
+    `name` identifies the model *and* inference path, and is used as the
+    embedding cache key so different providers never share vectors.
+    """
+
+    name: str = "base"
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    """PyTorch sentence-transformers model, loaded on first use."""
+
+    def __init__(self, model_name: str = "all-mpnet-base-v2", device: Optional[str] = None, batch_size: int = 32):
+        self.model_name = EMBEDDING_PRESETS.get(model_name, model_name)
+        self.name = self.model_name
+        self.device = device
+        self.batch_size = batch_size
+        self._model = None
+
+    def __call__(self, texts):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return np.asarray(
+            self._model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True),
+            dtype=np.float32,
+        )
+
+
+class OnnxProvider(EmbeddingProvider):
+    """
+    ONNX Runtime CPU inference for a sentence-transformers style encoder
+    (mean pooling + L2 normalization).
+
+    On first use the HF model is exported to `<export_dir>/<model>/model.onnx`
+    and, with `quantize=True`, dynamically quantized to int8 weights. Later
+    runs load the exported file directly and need neither PyTorch nor
+    sentence-transformers.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-mpnet-base-v2",
+        quantize: bool = False,
+        export_dir: str = "./onnx_models",
+        batch_size: int = 32,
+        max_length: int = 384,
+        normalize: bool = True,
+        num_threads: Optional[int] = None,
+    ):
+        self.model_name = EMBEDDING_PRESETS.get(model_name, model_name)
+        self.quantize = quantize
+        self.name = f"onnx-int8:{self.model_name}" if quantize else f"onnx:{self.model_name}"
+        self.model_dir = os.path.join(export_dir, re.sub(r"[^A-Za-z0-9._-]", "_", self.model_name))
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.normalize = normalize
+        self.num_threads = num_threads
+        self._session = None
+        self._tokenizer = None
+
+    @property
+    def onnx_path(self) -> str:
+        return os.path.join(self.model_dir, "model_int8.onnx" if self.quantize else "model.onnx")
+
+    def export(self):
+        """Exports (and optionally quantizes) the model if it is not on disk yet."""
+        fp32_path = os.path.join(self.model_dir, "model.onnx")
+        if not os.path.exists(fp32_path):
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+
+            os.makedirs(self.model_dir, exist_ok=True)
+            hub_id = _hub_id(self.model_name)
+            tokenizer = AutoTokenizer.from_pretrained(hub_id)
+            tokenizer.save_pretrained(self.model_dir)
+            model = AutoModel.from_pretrained(hub_id).eval()
+
+            sample = tokenizer(["def f(x): return x"], return_tensors="pt")
+            input_names = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in sample]
+
+            class Encoder(torch.nn.Module):
+                # Positional inputs -> last_hidden_state, independent of the model's forward signature
+                def __init__(self, inner):
+                    super().__init__()
+                    self.inner = inner
+
+                def forward(self, *inputs):
+                    return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+            dynamic_axes = {k: {0: "batch", 1: "sequence"} for k in input_names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+            with torch.no_grad():
+                torch.onnx.export(
+                    Encoder(model),
+                    tuple(sample[k] for k in input_names),
+                    fp32_path,
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=17,
+                    dynamo=False,
+                )
+
+        if self.quantize and not os.path.exists(self.onnx_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(fp32_path, self.onnx_path, weight_type=QuantType.QInt8)
+
+    def _load(self):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.export()
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        self._session = ort.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+    def __call__(self, texts):
+        if self._session is None:
+            self._load()
+        texts = list(texts)
+        outputs = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            encoded = self._tokenizer(
+                batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in self._input_names}
+            hidden = self._session.run(None, feeds)[0]
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32))
+        return np.concatenate(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+
+
+def get_embedding_provider(spec: Union[str, EmbeddingProvider]) -> EmbeddingProvider:
+    """
+    Builds a provider from a spec string:
+      "all-mpnet-base-v2" / "st:minilm"  -> sentence-transformers (PyTorch)
+      "onnx:minilm"                       -> ONNX Runtime, fp32
+      "onnx-int8:codesearch"              -> ONNX Runtime, int8 dynamic quantization
+    """
+    if isinstance(spec, EmbeddingProvider):
+        return spec
+    kind, _, model = spec.partition(":") if ":" in spec else ("st", "", spec)
+    if kind == "st":
+        return SentenceTransformerProvider(model)
+    if kind == "onnx":
+        return OnnxProvider(model)
+    if kind == "onnx-int8":
+        return OnnxProvider(model, quantize=True)
+    raise ValueError(f"Unknown embedding provider: {spec}")
@@ -1,29 +1,68 @@
-import chromadb
-from chromadb.utils import embedding_functions
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional, Union
 import os
 
+from .backends import ChromaBackend, NumpyBackend, VectorBackend
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .dedup import ContextDeduplicator
+from .embedding_cache import CachedEmbedder, EmbeddingCache
+from .embeddings import EmbeddingProvider, get_embedding_provider
+
+EMBEDDING_MODEL = "all-mpnet-base-v2"
+
 class VectorStore:
-    def __init__(self, collection_name="ast_reviewer_context"):
-        # Use persistent client to save data to disk
-        self.client = chromadb.PersistentClient(path="./chroma_db")
-        
-        # Use default embedding function for simplicity in prototype
-        # In production, we would use OpenAI or a local model via Ollama
-        # For now, let's use the default SentenceTransformer (all-MiniLM-L6-v2) 
-        # that Chroma provides if no function is specified.
-        # Note: This requires 'sentence-transformers' which is usually installed with chromadb default
-        # Use all-mpnet-base-v2 for better semantic retrieval
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-mpnet-base-v2")
-        
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            embedding_function=self.embedding_fn
-        )
+    def __init__(
+        self,
+        collection_name="ast_reviewer_context",
+        embedding_cache_dir: Optional[str] = "./embedding_cache",
+        backend: Union[str, VectorBackend] = "chroma",
+        vector_dtype: str = "float32",
+        embedding_model: Union[str, EmbeddingProvider] = EMBEDDING_MODEL,
+    ):
+        # Embedding provider: sentence-transformers by default, or e.g. "onnx-int8:minilm"
+        # for the ONNX Runtime CPU path (see embeddings.get_embedding_provider)
+        self.embedding_fn = get_embedding_provider(embedding_model)
+
+        # Vectors are computed here (not by Chroma) so they can be shared across
+        # collections through the content-hash cache; pass None to disable it.
+        # The provider name is part of the cache key.
+        cache = EmbeddingCache(embedding_cache_dir, self.embedding_fn.name) if embedding_cache_dir else None
+        self.embedder = CachedEmbedder(self.embedding_fn, cache)
+
+        # "chroma" persists to ./chroma_db; "memory" keeps an ephemeral in-process
+        # NumPy index (exact search, IVF/PQ for large collections).
+        # vector_dtype="float16"/"int8" quantizes the in-memory index; the shortlist
+        # is re-ranked with exact float vectors from the embedding cache.
+        if backend == "chroma":
+            if vector_dtype != "float32":
+                raise ValueError("Quantized vectors require backend='memory'")
+            backend = ChromaBackend(collection_name)
+        elif backend == "memory":
+            backend = NumpyBackend(dtype=vector_dtype, rerank_fn=self._exact_vectors)
+        elif isinstance(backend, str):
+            raise ValueError(f"Unknown vector store backend: {backend}")
+        self.backend = backend
+
+        # Lexical index over identifiers/tokens, kept in sync with the collection.
+        # Rebuilt from stored documents on startup (no embedding needed).
+        self.lexical_index = BM25Index()
+        self._load_lexical_index()
+        self.deduplicator = ContextDeduplicator()
+
+    def _load_lexical_index(self):
+        if self.backend.count() == 0:
+            return
+        for doc_id, document, metadata in zip(*self.backend.get_all()):
+            self.lexical_index.add(doc_id, document, metadata)
+
+    def _exact_vectors(self, ids: List[str]):
+        # Served from the memory-mapped embedding cache; misses are re-embedded
+        return self.embedder([self.lexical_index.documents[doc_id][0] for doc_id in ids])
 
-    def add_chunks(self, chunks: List[Dict]):
+    def add_chunks(self, chunks: List[Dict], file_path: Optional[str] = None):
         """
         Adds chunks to the vector store.
+        `file_path` (or a chunk's own "file") is recorded in the metadata, so
+        overlapping line spans can be recognised as the same code at query time.
         """
         if not chunks:
             return
@@ -32,50 +71,119 @@ class VectorStore:
         metadatas = []
         ids = []
 
+        # Offset by the current size so ids stay unique across add_chunks calls
+        # (otherwise Chroma silently drops the duplicates and the BM25 index drifts)
+        offset = self.backend.count()
         for i, chunk in enumerate(chunks):
             # Create a unique ID
-            chunk_id = f"{chunk['name']}_{chunk['start_line']}_{i}"
+            chunk_id = f"{chunk['name']}_{chunk['start_line']}_{offset + i}"
             
             documents.append(chunk['content'])
-            metadatas.append({
+            metadata = {
                 "name": chunk['name'],
                 "type": chunk['type'],
                 "start_line": chunk['start_line'],
                 "end_line": chunk['end_line']
-            })
+            }
+            # Chroma metadata values cannot be None, so the key is only set when known
+            file = chunk.get("file", file_path)
+            if file is not None:
+                metadata["file"] = str(file)
+            metadatas.append(metadata)
             ids.append(chunk_id)
 
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        self.backend.add(ids, self.embedder(documents), documents, metadatas)
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            self.lexical_index.add(chunk_id, document, metadata)
 
     def query(self, query_text: str, n_results: int = 3) -> List[Dict]:
         """
         Queries the vector store for relevant chunks.
         """
-        results = self.collection.query(
-            query_texts=[query_text],
-            n_results=n_results
-        )
+        if self.backend.count() == 0:
+            return []
+        ids, distances = self.backend.query(self.embedding_fn([query_text])[0], n_results)
         
-        # Format results
+        # Format results (documents are kept alongside the lexical index)
         formatted_results = []
-        if results['documents']:
-            for i in range(len(results['documents'][0])):
-                formatted_results.append({
-                    "content": results['documents'][0][i],
-                    "metadata": results['metadatas'][0][i],
-                    "distance": results['distances'][0][i] if results['distances'] else None
-                })
+        for doc_id, distance in zip(ids, distances):
+            content, metadata = self.lexical_index.documents[doc_id]
+            formatted_results.append({
+                "content": content,
+                "metadata": metadata,
+                "distance": distance
+            })
                 
         return formatted_results
 
+    def query_unique(self, query_text: str, n_results: int = 3, overfetch: int = 3, exclude: Optional[Dict] = None) -> List[Dict]:
+        """
+        Queries `n_results * overfetch` candidates and drops near-duplicates
+        (overlapping spans, split/merged variants, copied code), keeping up to
+        `n_results` unique chunks. `exclude` is the chunk under review, if any.
+        """
+        results = self.query(query_text, n_results=n_results * overfetch)
+        return self.deduplicator.deduplicate(results, k=n_results, exclude=exclude)
+
+    def lexical_query(self, query_text: str, n_results: int = 3, keywords: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Queries the BM25 index only. Nothing is embedded, so identifier lookups
+        are answered directly from the inverted index.
+        """
+        formatted_results = []
+        for doc_id, score in self.lexical_index.search(query_text, n_results=n_results, terms=keywords):
+            content, metadata = self.lexical_index.documents[doc_id]
+            formatted_results.append({
+                "content": content,
+                "metadata": metadata,
+                "distance": None,
+                "score": score
+            })
+        return formatted_results
+
+    def hybrid_query(
+        self,
+        query_text: str,
+        n_results: int = 3,
+        keywords: Optional[Iterable[str]] = None,
+        candidates: int = 20,
+        rrf_k: int = 60,
+    ) -> List[Dict]:
+        """
+        Queries both the BM25 index and the dense collection and fuses the two
+        rankings with reciprocal-rank fusion.
+        `keywords` (e.g. identifiers used by the snippet) drive the lexical side;
+        the dense side always embeds `query_text` as-is.
+        """
+        total = self.backend.count()
+        if total == 0:
+            return []
+        depth = min(max(candidates, n_results), total)
+
+        lexical_hits = self.lexical_index.search(query_text, n_results=depth, terms=keywords)
+        dense_ids, dense_distances = self.backend.query(self.embedding_fn([query_text])[0], depth)
+        distances = dict(zip(dense_ids, dense_distances))
+
+        fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in lexical_hits], dense_ids], k=rrf_k)
+
+        formatted_results = []
+        for doc_id, score in fused[:n_results]:
+            content, metadata = self.lexical_index.documents[doc_id]
+            formatted_results.append({
+                "content": content,
+                "metadata": metadata,
+                "distance": distances.get(doc_id),
+                "score": score
+            })
+        return formatted_results
+
+    def hybrid_query_unique(self, query_text: str, n_results: int = 3, overfetch: int = 3, exclude: Optional[Dict] = None,
+                            **fusion) -> List[Dict]:
+        """`hybrid_query` with the near-duplicate filtering of `query_unique`."""
+        results = self.hybrid_query(query_text, n_results=n_results * overfetch, **fusion)
+        return self.deduplicator.deduplicate(results, k=n_results, exclude=exclude)
+
     def clear(self):
         """Clears the collection"""
-        self.client.delete_collection(self.collection.name)
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection.name,
-            embedding_function=self.embedding_fn
-        )
+        self.backend.clear()
+        self.lexical_index.clear()
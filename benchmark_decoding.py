@@ -0,0 +1,144 @@
+"""
+Speculative decoding benchmark on CPU with tiny models.
+
+Trains a small "expert" and an even smaller draft model (character level) on
+synthetic review traffic: short functions followed by either "No issues found."
+or bullets that quote identifiers from the code. Then times greedy decoding
+against draft-model assisted decoding and prompt-lookup decoding, and checks
+that all three produce exactly the same tokens.
+
+    python benchmark_decoding.py [--steps 400] [--samples 30]
+"""
+import argparse
+import random
+import string
+import time
+
+import torch
+from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+WORDS = ["user", "total", "items", "path", "count", "index", "buffer", "config", "value", "result",
+         "request", "token", "cache", "offset", "record", "node", "payload", "limit", "session", "entry"]
+
+PROMPT_TEMPLATE = "Review:\n{code}\nIssues:\n"
+
+
+def char_tokenizer() -> PreTrainedTokenizerFast:
+    """One token per printable character, so encode/decode round-trips exactly."""
+    vocab = {t: i for i, t in enumerate(["<pad>", "<bos>", "<eos>", "<unk>"] + list(dict.fromkeys(string.printable)))}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split(Regex("."), "isolated")
+    tokenizer.decoder = decoders.Fuse()
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, pad_token="<pad>", bos_token="<bos>", eos_token="<eos>", unk_token="<unk>"
+    )
+
+
+def tiny_causal_lm(tokenizer, hidden_size: int, layers: int, seed: int = 0) -> LlamaForCausalLM:
+    torch.manual_seed(seed)
+    config = LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=layers,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=1024,
+        pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    return LlamaForCausalLM(config)
+
+
+def review_sample(rng: random.Random):
+    """Returns (prompt, answer) for one synthetic review."""
+    fn = "_".join(rng.sample(WORDS, 2))
+    arg, var = rng.sample(WORDS, 2)
+    code = (
+        f"def {fn}({arg}):\n"
+        f"    {var} = load({arg})\n"
+        f"    for i in range(len({var}) + 1):\n"
+        f"        total += {var}[i]\n"
+        f"    return total"
+    )
+    if rng.random() < 0.5:
+        answer = "No issues found."
+    else:
+        answer = (
+            f"- `{var}[i]` reads past the end in `{fn}`; loop over range(len({var})).\n"
+            f"- `total` is used before assignment in `{fn}`."
+        )
+    return PROMPT_TEMPLATE.format(code=code), answer
+
+
+def train(model, tokenizer, steps: int, seed: int, batch_size: int = 8, lr: float = 3e-3):
+    rng = random.Random(seed)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr)
+    model.train()
+    for step in range(steps):
+        texts = [prompt + answer + tokenizer.eos_token for prompt, answer in (review_sample(rng) for _ in range(batch_size))]
+        batch = tokenizer(texts, return_tensors="pt", padding=True)
+        labels = batch["input_ids"].masked_fill(batch["attention_mask"] == 0, -100)
+        loss = model(**batch, labels=labels).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        if step % 100 == 0 or step == steps - 1:
+            print(f"  step {step:4d} loss {loss.item():.3f}")
+    return model.eval()
+
+
+@torch.no_grad()
+def timed_generate(model, tokenizer, prompts, **kwargs):
+    outputs, new_tokens = [], 0
+    start = time.perf_counter()
+    for prompt in prompts:
+        input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+        out = model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            do_sample=False,
+            max_new_tokens=160,
+            pad_token_id=tokenizer.pad_token_id,
+            **kwargs,
+        )[0, input_ids.shape[1]:].tolist()
+        outputs.append(out)
+        new_tokens += len(out)
+    return outputs, new_tokens / (time.perf_counter() - start)
+
+
+def run_decoding_benchmark(steps: int = 400, samples: int = 30, prompt_lookup_tokens: int = 10):
+    tokenizer = char_tokenizer()
+    print("Training expert model...")
+    expert = train(tiny_causal_lm(tokenizer, hidden_size=192, layers=4, seed=0), tokenizer, steps, seed=0)
+    print("Training draft model...")
+    draft = train(tiny_causal_lm(tokenizer, hidden_size=64, layers=1, seed=1), tokenizer, steps, seed=1)
+
+    rng = random.Random(1234)
+    prompts = [review_sample(rng)[0] for _ in range(samples)]
+
+    greedy, greedy_tps = timed_generate(expert, tokenizer, prompts)
+    rows = [("greedy", greedy, greedy_tps)]
+    rows.append(("draft model", *timed_generate(expert, tokenizer, prompts, assistant_model=draft)))
+    rows.append((f"prompt lookup ({prompt_lookup_tokens})",
+                 *timed_generate(expert, tokenizer, prompts, prompt_lookup_num_tokens=prompt_lookup_tokens)))
+
+    print("\n" + "=" * 50)
+    print(f"SPECULATIVE DECODING BENCHMARK (CPU, {samples} prompts)")
+    print("=" * 50)
+    print("| Method | Tokens/sec | Speedup | Identical to greedy |")
+    print("| :--- | :---: | :---: | :---: |")
+    for name, outputs, tps in rows:
+        print(f"| {name} | {tps:.1f} | {tps / greedy_tps:.2f}x | {outputs == greedy} |")
+    return {name: tps / greedy_tps for name, _, tps in rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark speculative decoding with tiny CPU models.")
+    parser.add_argument("--steps", type=int, default=400, help="Training steps per model.")
+    parser.add_argument("--samples", type=int, default=30, help="Number of prompts to decode.")
+    parser.add_argument("--prompt-lookup-tokens", type=int, default=10, help="Draft length for prompt lookup.")
+    args = parser.parse_args()
+    run_decoding_benchmark(args.steps, args.samples, args.prompt_lookup_tokens)
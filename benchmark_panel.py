@@ -0,0 +1,80 @@
+"""
+Sequential experts vs. a single panel generation on generated_projects.
+
+For each sample a snippet is reviewed twice: once by every expert in turn
+(one prompt each) and once by PanelExpert (one prompt for all roles).
+Reports tokens processed (prompt + generated) and wall-clock latency.
+
+    python benchmark_panel.py [--limit 10] [--lora ../gemma4b-lora-python]
+"""
+import argparse
+import glob
+import os
+import time
+
+from ast_reviewer.agents.experts import BugExpert, DocExpert, PanelExpert, SecurityExpert, StyleExpert
+from ast_reviewer.retrieval.dependency_graph import DependencyGraph
+from compare_generated import get_snippet
+
+GENERATED_DIR = "./generated_projects"
+
+
+def run_panel_benchmark(generated_dir: str = GENERATED_DIR, limit: int = 10, lora_path: str = None):
+    files = sorted(glob.glob(os.path.join(generated_dir, "*.py")))[:limit]
+    experts = [SecurityExpert(lora_path=lora_path), StyleExpert(lora_path=lora_path),
+               DocExpert(lora_path=lora_path), BugExpert(lora_path=lora_path)]
+    panel = PanelExpert(experts, lora_path=lora_path)
+    names = [e.name for e in experts]
+
+    totals = {
+        "sequential": {"prompt": 0, "generated": 0, "seconds": 0.0, "comments": 0},
+        "panel": {"prompt": 0, "generated": 0, "seconds": 0.0, "comments": 0},
+    }
+    for path in files:
+        with open(path, "r") as f:
+            code = f.read()
+        snippet = get_snippet(code)
+        graph = DependencyGraph()
+        graph.add_source(code, path)
+        context = graph.query(snippet, n_results=3, file_path=path)
+
+        stats = totals["sequential"]
+        start = time.perf_counter()
+        for expert in experts:
+            prompt = expert.build_prompt(snippet, context)
+            response = expert.generate(prompt)
+            stats["prompt"] += expert.count_tokens(prompt)
+            stats["generated"] += expert.count_tokens(response)
+            stats["comments"] += len(expert.parse_response(response))
+        stats["seconds"] += time.perf_counter() - start
+
+        stats = totals["panel"]
+        start = time.perf_counter()
+        prompt = panel.build_panel_prompt(snippet, context, names)
+        response = panel.generate(prompt)
+        stats["prompt"] += panel.count_tokens(prompt)
+        stats["generated"] += panel.count_tokens(response)
+        stats["comments"] += sum(len(c) for c in panel.parse_sections(response, names).values())
+        stats["seconds"] += time.perf_counter() - start
+        print(f"  {os.path.basename(path)} done")
+
+    n = max(len(files), 1)
+    print("\n" + "=" * 50)
+    print(f"PANEL BENCHMARK ({len(files)} samples, {len(experts)} experts)")
+    print("=" * 50)
+    print("| Mode | Prompt tokens | Generated tokens | Total tokens | Latency / sample | Comments |")
+    print("| :--- | :---: | :---: | :---: | :---: | :---: |")
+    for mode, stats in totals.items():
+        total = stats["prompt"] + stats["generated"]
+        print(f"| {mode} | {stats['prompt']} | {stats['generated']} | {total} | "
+              f"{stats['seconds'] / n:.2f}s | {stats['comments']} |")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sequential experts with a single panel pass.")
+    parser.add_argument("--generated-dir", default=GENERATED_DIR, help="Directory containing generated .py samples.")
+    parser.add_argument("--limit", type=int, default=10, help="Number of samples to review.")
+    parser.add_argument("--lora", default=None, help="Path to LoRA adapter folder.")
+    args = parser.parse_args()
+    run_panel_benchmark(args.generated_dir, args.limit, args.lora)
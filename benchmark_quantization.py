@@ -0,0 +1,77 @@
+"""
+Quality/latency trade-off of weight-only quantization for the comment consistency expert.
+
+Reviews the same dataset samples with the backbone in its default dtype and in
+each quantized mode, writes the predictions per mode and scores them with the
+metrics.py F1/FPR evaluation. Retrieval is off so only the model changes.
+
+    python benchmark_quantization.py ../origin_dataset/Python-22k/Python-22k/valid.json \
+        [--limit 100] [--lora ../gemma4b-lora-python] [--modes none int8 int4]
+"""
+import argparse
+import gc
+import json
+import time
+from pathlib import Path
+
+from ast_reviewer.agents.experts import QUANTIZATION_MODES, BaseExpert, CommentConsistencyExpert
+from metrics import compute_metrics, load_predictions
+from run_dataset_reviews import load_dataset, review_sample
+
+OUTPUT_DIR = "runs/quantization"
+
+
+def run_quantization_benchmark(dataset_path: str, modes=("none",) + QUANTIZATION_MODES, limit: int = 100,
+                               lora_path: str = None, output_dir: str = OUTPUT_DIR):
+    samples = list(load_dataset(dataset_path, 0, limit))
+    output_root = Path(output_dir)
+    output_root.mkdir(parents=True, exist_ok=True)
+
+    rows = {}
+    for mode in modes:
+        # Drop the previous backbone before loading the next one
+        BaseExpert._PIPELINE_CACHE.clear()
+        gc.collect()
+
+        start = time.perf_counter()
+        expert = CommentConsistencyExpert(lora_path=lora_path, quantization=None if mode == "none" else mode)
+        load_seconds = time.perf_counter() - start
+
+        path = output_root / f"{mode}.jsonl"
+        start = time.perf_counter()
+        with path.open("w") as f:
+            for sample in samples:
+                f.write(json.dumps(review_sample(sample, None, None, [expert], top_k=0)) + "\n")
+        review_seconds = time.perf_counter() - start
+
+        metrics = compute_metrics(*load_predictions(path, expert.name))
+        rows[mode] = {
+            "weights_gb": expert.pipe.model.get_memory_footprint() / 1024 ** 3,
+            "load_seconds": load_seconds,
+            "seconds_per_sample": review_seconds / max(len(samples), 1),
+            **metrics,
+        }
+        print(f"  {mode}: F1={metrics['f1']:.4f} FPR={metrics['fpr']:.4f} "
+              f"({rows[mode]['seconds_per_sample']:.2f}s/sample)")
+
+    print("\n" + "=" * 50)
+    print(f"QUANTIZATION BENCHMARK ({len(samples)} samples)")
+    print("=" * 50)
+    print("| Mode | Weights | Load | Latency / sample | Precision | Recall | F1 | FPR |")
+    print("| :--- | :---: | :---: | :---: | :---: | :---: | :---: | :---: |")
+    for mode, row in rows.items():
+        print(f"| {mode} | {row['weights_gb']:.2f} GB | {row['load_seconds']:.0f}s | {row['seconds_per_sample']:.2f}s | "
+              f"{row['precision']:.4f} | {row['recall']:.4f} | {row['f1']:.4f} | {row['fpr']:.4f} |")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare F1/FPR and latency across weight quantization modes.")
+    parser.add_argument("dataset", help="Path to the dataset (JSON array or JSON Lines).")
+    parser.add_argument("--modes", nargs="+", choices=("none",) + QUANTIZATION_MODES,
+                        default=["none", *QUANTIZATION_MODES], help="Quantization modes to compare.")
+    parser.add_argument("--limit", type=int, default=100, help="Number of samples to review per mode.")
+    parser.add_argument("--lora", default=None, help="Path to LoRA adapter folder.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Where to write per-mode predictions.")
+    args = parser.parse_args()
+    run_quantization_benchmark(args.dataset, args.modes, args.limit, args.lora, args.output_dir)
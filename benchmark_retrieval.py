@@ -8,6 +8,7 @@ from typing import List, Dict
 sys.path.append(os.getcwd())
 
 from ast_reviewer.retrieval.cast.pipeline import CASTChunker
+from ast_reviewer.retrieval.embeddings import get_embedding_provider
 from ast_reviewer.retrieval.vector_store import VectorStore
 
 # --- 1. Synthetic Data Generation ---
@@ -151,20 +152,24 @@ def naive_chunk_file(file_path, chunk_size=200):
     return chunks
 
 # --- 3. Benchmark Logic ---
-def run_benchmark():
+BENCHMARK_QUERIES = [
+    ("validate user credentials", "authenticate_user"),
+    ("normalize 3D vectors", "normalize_vectors"),
+    ("TCP connection retry logic", "establish_connection"),
+    ("download file with progress", "download_large_dataset"),
+    ("rotate service keys", "rotate_api_keys")
+]
+
+def run_benchmark(embedding_model="all-mpnet-base-v2", embedding_cache_dir="./embedding_cache"):
     filename = generate_synthetic_code()
     
-    queries = [
-        ("validate user credentials", "authenticate_user"),
-        ("normalize 3D vectors", "normalize_vectors"),
-        ("TCP connection retry logic", "establish_connection"),
-        ("download file with progress", "download_large_dataset"),
-        ("rotate service keys", "rotate_api_keys")
-    ]
+    queries = BENCHMARK_QUERIES
     
     # Setup Vector Stores
-    vs_naive = VectorStore(collection_name="benchmark_naive")
-    vs_cast = VectorStore(collection_name="benchmark_cast")
+    vs_naive = VectorStore(collection_name="benchmark_naive", backend="memory",
+                           embedding_cache_dir=embedding_cache_dir, embedding_model=embedding_model)
+    vs_cast = VectorStore(collection_name="benchmark_cast", backend="memory",
+                          embedding_cache_dir=embedding_cache_dir, embedding_model=embedding_model)
     
     # 1. Naive Benchmark
     print("Running Naive Chunker...")
@@ -217,5 +222,71 @@ def run_benchmark():
     if os.path.exists(filename):
         os.remove(filename)
 
+    return {"naive": naive_score, "cast": cast_score}
+
+def run_quantization_benchmark():
+    """Recall@3 and index size of the in-memory store for each vector dtype."""
+    filename = generate_synthetic_code()
+    cast_chunker = CASTChunker()
+    cast_chunker.config.max_chunk_size = 100
+    cast_chunks = cast_chunker.chunk_file(filename)
+
+    print("\n" + "="*50)
+    print("QUANTIZATION BENCHMARK (cAST chunks, Recall@3)")
+    print("="*50)
+    print(f"| dtype | Hit Rate | Index Bytes | Query ms |")
+    print(f"| :--- | :---: | :---: | :---: |")
+    for dtype in ["float32", "float16", "int8"]:
+        vs = VectorStore(collection_name=f"benchmark_{dtype}", backend="memory", vector_dtype=dtype)
+        vs.add_chunks(cast_chunks)
+
+        hits = 0
+        start = time.perf_counter()
+        for q, target in BENCHMARK_QUERIES:
+            results = vs.query(q, n_results=3)
+            if any(target in r['metadata'].get('name', '') or target in r['content'] for r in results):
+                hits += 1
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(BENCHMARK_QUERIES)
+        score = hits / len(BENCHMARK_QUERIES) * 100
+        print(f"| {dtype} | {score:.1f}% | {vs.backend.nbytes} | {elapsed_ms:.2f} |")
+
+    if os.path.exists(filename):
+        os.remove(filename)
+
+EMBEDDING_PROVIDERS = ["mpnet", "onnx:mpnet", "onnx-int8:mpnet", "minilm", "onnx-int8:minilm", "codesearch"]
+
+def run_embedding_benchmark(providers=EMBEDDING_PROVIDERS):
+    """Encoding throughput and cAST Recall@3 (from run_benchmark) for each embedding provider (cache disabled)."""
+    filename = generate_synthetic_code()
+    cast_chunker = CASTChunker()
+    cast_chunker.config.max_chunk_size = 100
+    contents = [c['content'] for c in cast_chunker.chunk_file(filename)]
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    rows = []
+    for spec in providers:
+        embedding_fn = get_embedding_provider(spec)
+        # Warm-up loads (and for ONNX, exports) the model outside the timed region
+        embedding_fn(contents[:1])
+        start = time.perf_counter()
+        embedding_fn(contents)
+        chunks_per_sec = len(contents) / (time.perf_counter() - start)
+
+        scores = run_benchmark(embedding_model=embedding_fn, embedding_cache_dir=None)
+        rows.append((embedding_fn.name, scores["cast"], chunks_per_sec))
+
+    print("\n" + "="*50)
+    print("EMBEDDING BENCHMARK (cAST chunks, Recall@3)")
+    print("="*50)
+    print(f"| Provider | Hit Rate | Chunks/sec |")
+    print(f"| :--- | :---: | :---: |")
+    for name, score, chunks_per_sec in rows:
+        print(f"| {name} | {score:.1f}% | {chunks_per_sec:.1f} |")
+
 if __name__ == "__main__":
     run_benchmark()
+    if "--quantization" in sys.argv:
+        run_quantization_benchmark()
+    if "--embeddings" in sys.argv:
+        run_embedding_benchmark()
@@ -0,0 +1,250 @@
+"""
+Columnar (Parquet) output for run_dataset_reviews.py.
+
+An output path ending in .parquet is a directory of part files, one per batch
+of reviewed samples, each written atomically. Per-expert predictions, formats
+and variants are narrow struct columns, so metrics read a few bytes per sample
+instead of whole JSON records. `model_input` is not stored: it is
+build_review_input(sample) and would be a third copy of the code.
+
+    pyarrow.dataset.dataset("runs/valid.parquet").to_table(columns=["label", "model_output"])
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+BATCH_SIZE = 256
+PART_GLOB = "part-*.parquet"
+# Rebuilt from the sample fields by build_review_input
+DROPPED_FIELDS = ("model_input",)
+# Sample fields first seen after the schema was fixed, or whose values do not
+# fit their column's type, as one JSON object
+EXTRA_FIELDS = "extra_fields"
+
+
+def is_columnar(path: Path) -> bool:
+    return path.suffix == ".parquet"
+
+
+def part_files(path: Path) -> List[Path]:
+    """Part files of a columnar output (a single .parquet file counts as one part)."""
+    if path.is_file():
+        return [path]
+    return sorted(path.glob(PART_GLOB)) if path.is_dir() else []
+
+
+def _expert_types(pa, experts: Iterable[str]) -> Dict:
+    experts = list(experts)
+    return {
+        "model_output": pa.struct([(name, pa.int8()) for name in experts]),
+        "expert_output": pa.struct([(name, pa.list_(pa.string())) for name in experts]),
+        "model_variant": pa.struct([(name, pa.string()) for name in experts]),
+        "output_format": pa.struct([(name, pa.string()) for name in experts]),
+    }
+
+
+def _known_types(pa) -> Dict:
+    """Column types of the fields run_dataset_reviews.py itself adds to every record."""
+    return {
+        "sample_key": pa.string(),
+        "label": pa.int64(),
+        "dataset_index": pa.int64(),
+        "file_path": pa.string(),
+    }
+
+
+def _infer_type(pa, values: List):
+    present = [value for value in values if value is not None]
+    if not present:
+        return pa.string()
+    try:
+        return pa.array(present).type
+    except (TypeError, ValueError, OverflowError):
+        # Mixed types within the batch: the first value decides, the rest go to extra_fields
+        return pa.array(present[:1]).type
+
+
+def _column(pa, values: List, field_type, name: str, extras: List[Dict]):
+    """
+    Converts `values` to an array of `field_type`. Values that do not fit are
+    stored as null and recorded under `name` in their row's `extras` instead.
+    """
+    try:
+        return pa.array(values, type=field_type)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    fitting = []
+    for value, extra in zip(values, extras):
+        try:
+            pa.array([value], type=field_type)
+        except (TypeError, ValueError, OverflowError):
+            extra[name] = value
+            value = None
+        fitting.append(value)
+    return pa.array(fitting, type=field_type)
+
+
+def _read_variant(part: Path) -> Optional[Dict[str, str]]:
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(part).metadata or {}
+    return json.loads(metadata.get(b"model_variant", b"null"))
+
+
+class ParquetReviewOutput:
+    """
+    Writes review records as Parquet parts of `batch_size` rows; the same
+    interface as ReviewOutput. Resume reads only the sample_key column and the
+    per-part model variant, so at most the unflushed batch of an interrupted
+    run is reviewed again.
+    """
+
+    def __init__(self, path: Path, model_variant: Optional[Dict[str, str]] = None, resume: bool = False,
+                 batch_size: int = BATCH_SIZE):
+        import pyarrow.parquet as pq
+
+        if path.is_file():
+            raise ValueError(f"{path} is a single Parquet file; columnar outputs are part directories.")
+        self.path = path
+        self.model_variant = model_variant
+        self.batch_size = batch_size
+        self.keys: Set[str] = set()
+        self._rows: List[Dict] = []
+        self._schema = None
+
+        path.mkdir(parents=True, exist_ok=True)
+        for stale in path.glob(".part-*.tmp"):
+            stale.unlink()
+        parts = part_files(path)
+        if resume:
+            for part in parts:
+                recorded = _read_variant(part)
+                if model_variant is not None and recorded is not None and recorded != model_variant:
+                    raise ValueError(
+                        f"{path} holds reviews from model variant {recorded}, not {model_variant}; "
+                        "use a different --output."
+                    )
+                self.keys.update(pq.read_table(part, columns=["sample_key"]).column(0).to_pylist())
+            if parts:
+                self._schema = pq.read_schema(parts[-1])
+        else:
+            for part in parts:
+                part.unlink()
+            parts = []
+        self._next_part = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+
+    def _build_schema(self, rows: List[Dict]):
+        import pyarrow as pa
+
+        types = {**_known_types(pa), **_expert_types(pa, rows[0].get("model_output", {}))}
+        fields = [pa.field("sample_key", pa.string())]
+        names = {"sample_key", EXTRA_FIELDS}
+        for row in rows:
+            for name in row:
+                if name in names:
+                    continue
+                names.add(name)
+                field_type = types.get(name) or _infer_type(pa, [r.get(name) for r in rows])
+                fields.append(pa.field(name, field_type))
+        fields.append(pa.field(EXTRA_FIELDS, pa.string()))
+        metadata = {"model_variant": json.dumps(self.model_variant)}
+        return pa.schema(fields, metadata=metadata)
+
+    def _table(self, columns: Dict[str, List], num_rows: int, extras: List[Dict]):
+        """Builds a table of `_schema` from per-column values; missing columns are null."""
+        import pyarrow as pa
+
+        arrays = []
+        for field in self._schema:
+            if field.name == EXTRA_FIELDS:
+                continue
+            values = columns.pop(field.name, None) or [None] * num_rows
+            arrays.append(_column(pa, values, field.type, field.name, extras))
+        for name, values in columns.items():
+            for value, extra in zip(values, extras):
+                if value is not None:
+                    extra[name] = value
+        arrays.append(pa.array([json.dumps(extra) if extra else None for extra in extras], type=pa.string()))
+        return pa.Table.from_arrays(arrays, schema=self._schema)
+
+    def write_record(self, record: Dict, key: str) -> None:
+        row = {name: value for name, value in record.items() if name not in DROPPED_FIELDS}
+        row["sample_key"] = key
+        self._rows.append(row)
+        self.keys.add(key)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        if self._schema is None:
+            self._schema = self._build_schema(self._rows)
+        names = {name for row in self._rows for name in row}
+        columns = {name: [row.get(name) for row in self._rows] for name in names}
+        self._write_part(self._table(columns, len(self._rows), [{} for _ in self._rows]))
+        self._rows = []
+
+    def write_table(self, table) -> None:
+        """Appends rows that are already columnar, e.g. the parts of another output."""
+        self.flush()
+        if self._schema is None:
+            self._schema = table.schema.with_metadata({"model_variant": json.dumps(self.model_variant)})
+        if table.schema.remove_metadata() == self._schema.remove_metadata():
+            self._write_part(table.replace_schema_metadata(self._schema.metadata))
+        else:
+            # Shards inferred their schemas from different first batches
+            extras = [{} for _ in range(table.num_rows)]
+            if EXTRA_FIELDS in table.column_names:
+                extras = [json.loads(extra) if extra else {} for extra in table.column(EXTRA_FIELDS).to_pylist()]
+            columns = {name: table.column(name).to_pylist() for name in table.column_names if name != EXTRA_FIELDS}
+            self._write_part(self._table(columns, table.num_rows, extras))
+        self.keys.update(table.column("sample_key").to_pylist())
+
+    def _write_part(self, table) -> None:
+        import pyarrow.parquet as pq
+
+        name = f"part-{self._next_part:05d}.parquet"
+        # Hidden temporary name: readers skip it, and rename makes the part appear whole
+        tmp_path = self.path / f".{name}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, self.path / name)
+        self._next_part += 1
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "ParquetReviewOutput":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def merge_parquet_shards(paths: List[Path], output_path: Path) -> int:
+    """
+    Copies the rows of shard outputs `paths` into `output_path`, keeping one row
+    per sample_key. Rows stay in shard order; sort by dataset_index if needed.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    variant = None
+    for part in (part for path in paths for part in part_files(path)):
+        recorded = _read_variant(part)
+        if variant is None:
+            variant = recorded
+        elif recorded is not None and recorded != variant:
+            raise ValueError(f"Shards of {output_path} mix model variants {variant} and {recorded}")
+
+    seen: Set[str] = set()
+    with ParquetReviewOutput(output_path, variant) as output:
+        for part in (part for path in paths for part in part_files(path)):
+            table = pq.read_table(part)
+            keys = table.column("sample_key").to_pylist()
+            keep = [key not in seen and not seen.add(key) for key in keys]
+            table = table.filter(pa.array(keep))
+            if table.num_rows:
+                output.write_table(table)
+    return len(seen)
@@ -66,7 +66,7 @@ def run_comparison():
         # Use the file directly for chunking
         try:
             chunks = chunker.chunk_file(file_path)
-            vector_store.add_chunks(chunks)
+            vector_store.add_chunks(chunks, file_path=file_path)
         except Exception as e:
             print(f"  Error chunking context: {e}")
             report += f"> Error indexing context: {e}\n\n"
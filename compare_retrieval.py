@@ -72,7 +72,7 @@ def run_comparison():
             
             try:
                 chunks = chunker.chunk_file("temp_context.py")
-                vector_store.add_chunks(chunks)
+                vector_store.add_chunks(chunks, file_path="temp_context.py")
             except Exception as e:
                 print(f"  Error chunking context: {e}")
         
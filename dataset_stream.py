@@ -0,0 +1,108 @@
+"""
+Streaming readers for review datasets.
+
+Datasets are either one JSON array of samples (the Python-22k splits) or JSON
+Lines. Samples are decoded one at a time from a bounded read buffer, so memory
+stays flat however large the file is, and reading stops as soon as
+`start`/`limit` are satisfied.
+"""
+import json
+import re
+from itertools import islice
+from typing import Any, Iterator, Optional, TextIO
+
+CHUNK_SIZE = 1 << 20
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9eE.+-]*")
+
+
+def iter_json_array(f: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yields the elements of the JSON array in `f` one by one, reading `chunk_size` characters at a time."""
+    decoder = json.JSONDecoder()
+    buffer, pos, offset = "", 0, 0
+    eof = False
+    read_size = chunk_size
+
+    def fill() -> bool:
+        # Drops the consumed prefix and appends the next chunk; False at end of file
+        nonlocal buffer, pos, offset, eof
+        chunk = f.read(read_size)
+        if not chunk:
+            eof = True
+            return False
+        offset += pos
+        buffer, pos = buffer[pos:] + chunk, 0
+        return True
+
+    def peek() -> str:
+        # Next non-whitespace character ("" at end of file), leaving pos on it
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return ""
+
+    if peek() != "[":
+        raise ValueError("Dataset must be a JSON array of samples or JSON Lines.")
+    pos += 1
+    if peek() == "]":
+        return
+    while True:
+        if not peek():
+            raise ValueError(f"Malformed dataset at character {offset + pos}: unterminated array")
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                # Most likely an element cut by the end of the buffer
+                if eof or not fill():
+                    raise ValueError(f"Malformed dataset at character {offset + exc.pos}: {exc.msg}") from None
+                # Re-decoding restarts at the element, so grow reads to keep huge elements linear
+                read_size *= 2
+                continue
+            # A number running up to the buffer end (e.g. "12" or "1.5e") may continue in the next chunk
+            if isinstance(value, (int, float)) and not eof and _NUMBER_TAIL.fullmatch(buffer, end) and fill():
+                continue
+            break
+        read_size = chunk_size
+        pos = end
+        yield value
+
+        separator = peek()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Malformed dataset at character {offset + pos}: expected ',' or ']'")
+        pos += 1
+
+
+def iter_json_lines(f: TextIO, start: int = 0, stop: Optional[int] = None) -> Iterator[Any]:
+    """Yields the records of JSON Lines file `f`; lines before `start` are skipped without decoding."""
+    lines = ((number, line) for number, line in enumerate(f, start=1) if line.strip())
+    for number, line in islice(lines, start, stop):
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Malformed dataset at line {number}: {exc.msg}") from None
+
+
+def iter_samples(path: str, start: int = 0, limit: Optional[int] = None) -> Iterator[Any]:
+    """
+    Lazily yields samples `start` .. `start + limit` of the dataset at `path`,
+    a JSON array or JSON Lines file (told apart by the first character).
+    """
+    stop = None if limit is None else start + limit
+    with open(path, "r", encoding="utf8") as f:
+        head = f.read(4096).lstrip()
+        while not head:
+            chunk = f.read(4096)
+            if not chunk:
+                return
+            head = chunk.lstrip()
+        f.seek(0)
+        if head[0] == "[":
+            yield from islice(iter_json_array(f), start, stop)
+        else:
+            yield from iter_json_lines(f, start, stop)
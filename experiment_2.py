@@ -51,7 +51,7 @@ def run_experiment():
         print("  Running Standard Chunker...")
         vector_store.clear()
         chunks = std_chunker.chunk_file(file_path)
-        vector_store.add_chunks(chunks)
+        vector_store.add_chunks(chunks, file_path=file_path)
         
         query = snippet
         retrieved_std = vector_store.query(query, n_results=3)
@@ -74,7 +74,7 @@ def run_experiment():
         vector_store.clear()
         try:
             chunks = cast_chunker.chunk_file(file_path)
-            vector_store.add_chunks(chunks)
+            vector_store.add_chunks(chunks, file_path=file_path)
         except Exception as e:
             print(f"Error cAST chunking: {e}")
             
@@ -3,6 +3,7 @@ import ast
 import glob
 import re
 from ast_reviewer.retrieval.cast.pipeline import CASTChunker
+from ast_reviewer.retrieval.dependency_graph import DependencyGraph
 from ast_reviewer.retrieval.standard_chunker import StandardChunker
 from ast_reviewer.retrieval.vector_store import VectorStore
 
@@ -145,11 +146,13 @@ def run_metrics(
     
     cast_chunker = CASTChunker()
     std_chunker = StandardChunker(chunk_size=600, overlap=50)
-    vector_store = VectorStore()
+    # Rebuilt for every file, so keep it in memory instead of on disk
+    vector_store = VectorStore(backend="memory")
     
     results = {
         "std": {"completeness": [], "recall": []},
-        "cast": {"completeness": [], "recall": []}
+        "cast": {"completeness": [], "recall": []},
+        "graph": {"completeness": [], "recall": []}
     }
     
     for file_path in files:
@@ -164,7 +167,7 @@ def run_metrics(
         # --- Standard ---
         vector_store.clear()
         chunks = std_chunker.chunk_file(file_path)
-        vector_store.add_chunks(chunks)
+        vector_store.add_chunks(chunks, file_path=file_path)
         retrieved_std = vector_store.query(snippet, n_results=top_k)
         
         # Completeness
@@ -180,14 +183,12 @@ def run_metrics(
         vector_store.clear()
         try:
             chunks = cast_chunker.chunk_file(file_path)
-            vector_store.add_chunks(chunks)
+            vector_store.add_chunks(chunks, file_path=file_path)
             
-            # Query Expansion: Append identifiers to help dense retrieval find definitions
-            expanded_query = snippet + "\n\nKeywords: " + " ".join(identifiers)
+            # Hybrid retrieval: identifiers go to the BM25 index, the snippet to the dense side
             if not quiet and "sample_10.py" in file_path:
                 print(f"DEBUG: Identifiers: {identifiers}")
-                print(f"DEBUG: Expanded Query: {expanded_query[:100]}...")
-            retrieved_cast = vector_store.query(expanded_query, n_results=top_k)
+            retrieved_cast = vector_store.hybrid_query(snippet, n_results=top_k, keywords=identifiers)
             
             # Completeness
             comp_score = sum(1 for c in retrieved_cast if is_syntactically_complete(c['content'])) / len(retrieved_cast) if retrieved_cast else 0
@@ -201,6 +202,18 @@ def run_metrics(
         except Exception as e:
             print(f"Skipping cAST for {file_path} due to error: {e}")
 
+        # --- Dependency graph (no embeddings) ---
+        graph = DependencyGraph()
+        graph.add_file(file_path)
+        retrieved_graph = graph.query(snippet, n_results=top_k, file_path=file_path)
+
+        comp_score = sum(1 for c in retrieved_graph if is_syntactically_complete(c['content'])) / len(retrieved_graph) if retrieved_graph else 0
+        results["graph"]["completeness"].append(comp_score)
+
+        rec_score = calculate_recall(retrieved_graph, definitions)
+        if rec_score is not None:
+            results["graph"]["recall"].append(rec_score)
+
     # Aggregate
     if results["std"]["completeness"]:
         avg_std_comp = sum(results["std"]["completeness"]) / len(results["std"]["completeness"]) * 100
@@ -217,6 +230,14 @@ def run_metrics(
     if results["cast"]["recall"]:
         avg_cast_rec = sum(results["cast"]["recall"]) / len(results["cast"]["recall"]) * 100
     else: avg_cast_rec = 0
+
+    if results["graph"]["completeness"]:
+        avg_graph_comp = sum(results["graph"]["completeness"]) / len(results["graph"]["completeness"]) * 100
+    else: avg_graph_comp = 0
+
+    if results["graph"]["recall"]:
+        avg_graph_rec = sum(results["graph"]["recall"]) / len(results["graph"]["recall"]) * 100
+    else: avg_graph_rec = 0
     
     report = f"""
 # Experiment 2 Quantitative Results (Refined)
@@ -225,11 +246,13 @@ def run_metrics(
 (Percentage of retrieved chunks that are valid, parseable code blocks)
 - Standard RAG: {avg_std_comp:.2f}%
 - cAST RAG:     {avg_cast_comp:.2f}%
+- Graph:        {avg_graph_comp:.2f}%
 
 ## Definition Recall@{top_k}
 (Percentage of identifiers in the snippet whose definitions were successfully retrieved)
 - Standard RAG: {avg_std_rec:.2f}%
 - cAST RAG:     {avg_cast_rec:.2f}%
+- Graph:        {avg_graph_rec:.2f}%
 """
     if not quiet:
         print(report)
@@ -243,6 +266,7 @@ def run_metrics(
         "averages": {
             "std": {"completeness": avg_std_comp, "recall": avg_std_rec},
             "cast": {"completeness": avg_cast_comp, "recall": avg_cast_rec},
+            "graph": {"completeness": avg_graph_comp, "recall": avg_graph_rec},
         },
         "top_k": top_k,
         "output_file": output_file,
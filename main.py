@@ -6,9 +6,11 @@ from typing import List, Dict
 # Add current directory to path so we can import modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from ast_reviewer.agents.experts import BugExpert, SecurityExpert, StyleExpert
+from ast_reviewer.agents.experts import BugExpert, PanelExpert, SecurityExpert, StyleExpert, review_with_shared_prefix
 from ast_reviewer.retrieval.cast.pipeline import CASTChunker
 from ast_reviewer.retrieval.vector_store import VectorStore
+from ast_reviewer.retrieval.dependency_graph import DependencyGraph
+from ast_reviewer.pipeline.reviewer import RETRIEVAL_MODES
 from experiment_2_metrics import (
     METRICS_OUTPUT_FILE as DEFAULT_EVAL_OUTPUT_FILE,
     GENERATED_DIR as DEFAULT_EVAL_GENERATED_DIR,
@@ -22,8 +24,18 @@ def main():
     parser.add_argument("target", nargs="?", help="File or directory to review")
     parser.add_argument("--context", default=".", help="Directory to use for context retrieval (default: current dir)")
     parser.add_argument("--no-retrieval", action="store_true", help="Disable context retrieval")
+    parser.add_argument("--retrieval-mode", choices=RETRIEVAL_MODES, default="dense", help="Context retrieval strategy: dense vectors, BM25+dense fusion, or call-graph definitions (no embeddings)")
     parser.add_argument("--clear-db", action="store_true", help="Clear the vector database before indexing")
-    parser.add_argument("--lora", type=str, default=None, help="Path to LoRA adapter folder. If None, use base Gemma model.")
+    parser.add_argument("--lora", type=str, default=None, help="Path to a LoRA adapter folder or a merged checkpoint (LoRA/merge_lora.py). If None, use base Gemma model.")
+    parser.add_argument("--backend", default="hf", help="Where experts generate: hf (in-process), openai[:URL] (OpenAI-compatible server) or ollama[:URL].")
+    parser.add_argument("--backend-model", default=None, help="Model name on the inference server (default: google/gemma-3-4b-it for openai, gemma3:4b for ollama).")
+    parser.add_argument("--quantization", choices=["int8", "int4"], default=None, help="Load the expert model with int8/int4 weight-only quantization (for CPU workers).")
+    parser.add_argument("--structured", action="store_true", help="Answer with grammar-constrained JSON records {line, severity, message} instead of free text.")
+    parser.add_argument("--no-issues-probe", action="store_true", help="Skip generation when a one-pass probe shows the answer is 'No issues found.'.")
+    parser.add_argument("--draft-model", default=None, help="Small model with the expert's tokenizer for speculative decoding (e.g. google/gemma-3-270m-it).")
+    parser.add_argument("--prompt-lookup-tokens", type=int, default=None, help="Speculative decoding by copying up to N tokens from n-gram matches in the prompt.")
+    parser.add_argument("--panel", action="store_true", help="Run all experts in a single generation per file instead of one each.")
+    parser.add_argument("--shared-prefix", action="store_true", help="Prefill each file's code and context once and fork it for every expert.")
     parser.add_argument("--evaluation", action="store_true", help="Run evaluation metrics instead of reviewing code")
     parser.add_argument("--evaluation-generated-dir", default=DEFAULT_EVAL_GENERATED_DIR, help="Directory containing generated .py samples for evaluation")
     parser.add_argument("--evaluation-snippet-size", type=int, default=DEFAULT_EVAL_SNIPPET_SIZE, help="Snippet size (number of lines) used during evaluation")
@@ -52,7 +64,17 @@ def main():
 
     # 1. Setup Retrieval
     vector_store = None
-    if not args.no_retrieval:
+    graph = None
+    if not args.no_retrieval and args.retrieval_mode == "graph":
+        graph_root = args.context if args.context != "." else target_path
+        print(f"Building dependency graph (Context: {graph_root})...")
+        graph = DependencyGraph()
+        if os.path.isfile(graph_root):
+            graph.add_file(graph_root)
+        else:
+            graph.add_directory(graph_root)
+        print(f"  Indexed {len(graph.definitions)} definitions")
+    elif not args.no_retrieval:
         print(f"Initializing Retrieval Pipeline (Context: {args.context})...")
         vector_store = VectorStore()
         
@@ -88,13 +110,24 @@ def main():
                          full_path = os.path.join(root, file)
                          try:
                              chunks = chunker.chunk_file(full_path)
-                             vector_store.add_chunks(chunks)
+                             vector_store.add_chunks(chunks, file_path=full_path)
                              print(f"  Indexed {file} ({len(chunks)} chunks)")
                          except Exception as e:
                              print(f"  Failed to index {file}: {e}")
 
     # 2. Run Review
-    experts = [BugExpert(lora_path=args.lora), SecurityExpert(lora_path=args.lora), StyleExpert(lora_path=args.lora)]
+    expert_options = {
+        "lora_path": args.lora,
+        "quantization": args.quantization,
+        "backend": args.backend,
+        "backend_model": args.backend_model,
+        "structured": args.structured,
+        "no_issues_probe": args.no_issues_probe,
+        "draft_model": args.draft_model,
+        "prompt_lookup_tokens": args.prompt_lookup_tokens,
+    }
+    experts = [BugExpert(**expert_options), SecurityExpert(**expert_options), StyleExpert(**expert_options)]
+    panel = PanelExpert(experts, **expert_options) if args.panel else None
     
     files_to_review = []
     if os.path.isfile(target_path):
@@ -114,16 +147,35 @@ def main():
             
         # Retrieve context
         retrieved_context = []
-        if vector_store:
+        if graph:
+            retrieved_context = graph.query(code_content, file_path=file_path)
+            if retrieved_context:
+                print(f"  [Context] Retrieved {len(retrieved_context)} related definitions.")
+        elif vector_store:
             # Query using the code content
             # Truncate query to avoid token limits in embedding model if necessary
-            retrieved_context = vector_store.query(code_content[:1000])
+            if args.retrieval_mode == "hybrid":
+                retrieved_context = vector_store.hybrid_query_unique(code_content[:1000])
+            else:
+                retrieved_context = vector_store.query_unique(code_content[:1000])
             if retrieved_context:
                 print(f"  [Context] Retrieved {len(retrieved_context)} related chunks.")
         
+        comments_by_expert = None
+        if panel:
+            print(f"  Running {panel.name} ({', '.join(e.name for e in experts)})...")
+            comments_by_expert = panel.review_panel(code_content, retrieved_context, [e.name for e in experts])
+        elif args.shared_prefix:
+            print(f"  Running {', '.join(e.name for e in experts)} on a shared prefix...")
+            comments_by_expert = review_with_shared_prefix(experts, code_content, retrieved_context)
+
         for expert in experts:
-            print(f"  Running {expert.name}...")
-            comments = expert.review(code_content, retrieved_context)
+            if comments_by_expert is not None:
+                print(f"  {expert.name}:")
+                comments = comments_by_expert[expert.name]
+            else:
+                print(f"  Running {expert.name}...")
+                comments = expert.review(code_content, retrieved_context)
             if comments:
                 for comment in comments:
                     print(f"    - {comment}")
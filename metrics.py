@@ -2,23 +2,65 @@
 """
 Compute F1 score and False Positive Rate from review predictions.
 
+Every expert of every run is loaded in one pass per file and scored with
+NumPy: confusion matrices for all (run, expert) pairs come from a single
+bincount, bootstrap confidence intervals from multinomial resampling of the
+confusion counts, and threshold sweeps from sorted confidence scores.
+
 Usage:
     python metrics.py runs/valid_predictions.jsonl --expert CommentConsistencyExpert
+    python metrics.py runs/valid_predictions.parquet --expert CommentConsistencyExpert
+    python metrics.py runs/*.jsonl runs/*.parquet --bootstrap 1000 --sweep
 """
 
 import argparse
 import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
 from pathlib import Path
-from typing import List, Sequence
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 
 def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Compute F1/FPR from JSONL predictions.")
-    parser.add_argument("jsonl_path", help="Path to JSONL with predictions (output of run_dataset_reviews.py).")
+    parser = argparse.ArgumentParser(description="Compute F1/FPR from JSONL or Parquet predictions.")
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="JSONL or .parquet predictions (output of run_dataset_reviews.py); several runs are compared.",
+    )
     parser.add_argument(
         "--expert",
-        default="CommentConsistencyExpert",
-        help="Name of the expert whose predictions should be evaluated.",
+        nargs="+",
+        default=None,
+        help="Names of the experts whose predictions should be evaluated (default: all).",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        help="Bootstrap resamples for confidence intervals (e.g. 1000; default: none).",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of the bootstrap intervals (default: 0.95).",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="Also report metrics when flagging only samples with confidence score >= each threshold.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Processes for loading several runs (default: one per CPU, at most one per run).",
     )
     return parser.parse_args()
 
@@ -35,14 +77,53 @@ AFFIRMATIVE_PHRASES = [
     "still accurate",
 ]
 
+# One alternation for all phrases, matched against lowercased text
+AFFIRMATIVE_REGEX = "|".join(re.escape(phrase) for phrase in AFFIRMATIVE_PHRASES)
+AFFIRMATIVE_PATTERN = re.compile(AFFIRMATIVE_REGEX)
+
+# Structured answers are stored as "- Line N [severity]: message" (BaseExpert.format_record)
+SEVERITY_RANKS = {"low": 1, "medium": 2, "high": 3}
+SEVERITY_PATTERN = re.compile(r"^- Line [^\[\n]*\[(low|medium|high)\]:")
+
+# Confusion matrix cells, indexed by 2 * truth + prediction
+CELLS = ("TN", "FP", "FN", "TP")
+
 
 def contains_affirmative(text: str) -> bool:
-    lower = text.lower()
-    return any(phrase in lower for phrase in AFFIRMATIVE_PHRASES)
+    return AFFIRMATIVE_PATTERN.search(text.lower()) is not None
 
 
-def load_predictions(path: Path, expert: str):
-    y_true, y_pred = [], []
+@dataclass
+class ExpertPredictions:
+    """
+    Labels and final predictions of one expert in one run, plus a confidence
+    score per sample: 0 when the prediction is 0, otherwise the highest
+    severity (1-3) among structured records, or 1 for free-text answers.
+    """
+
+    run: str
+    expert: str
+    y_true: np.ndarray
+    y_pred: np.ndarray
+    score: np.ndarray
+
+
+def final_prediction(prediction: int, comments: Sequence[str], structured: bool) -> Tuple[int, int]:
+    """(prediction, confidence score) of one answer after the affirmative-phrase override."""
+    if prediction != 1:
+        return prediction, 0
+    # Structured (JSON) answers list only real issues; free text may flag an issue
+    # and then say the comment is fine, which the phrase check undoes.
+    if structured:
+        ranks = [SEVERITY_RANKS[m.group(1)] for m in map(SEVERITY_PATTERN.match, comments) if m]
+        return 1, max(ranks, default=1)
+    if comments and any(contains_affirmative(comment) for comment in comments):
+        return 0, 0
+    return 1, 1
+
+
+def _jsonl_run(path: Path, experts: Optional[Sequence[str]]) -> Dict[str, Tuple[List[int], List[int], List[int]]]:
+    columns: Dict[str, Tuple[List[int], List[int], List[int]]] = {}
     with path.open("r") as f:
         for line_num, line in enumerate(f, start=1):
             line = line.strip()
@@ -51,75 +132,227 @@ def load_predictions(path: Path, expert: str):
             record = json.loads(line)
             label = record.get("label")
             outputs = record.get("model_output", {})
-            pred = outputs.get(expert)
-            expert_comments = record.get("expert_output", {}).get(expert, [])
-            if label is None or pred is None:
+            names = experts if experts is not None else list(outputs)
+            if label is None or any(outputs.get(name) is None for name in names):
                 print(f"[warn] Missing label/prediction on line {line_num}, skipping.")
-                continue
-            prediction = int(pred)
-            comments: Sequence[str] = []
-            if isinstance(expert_comments, list):
-                comments = [c for c in expert_comments if isinstance(c, str)]
-            elif isinstance(expert_comments, str):
-                comments = [expert_comments]
+                if label is None:
+                    continue
+            for name in names:
+                pred = outputs.get(name)
+                if pred is None:
+                    continue
+                expert_comments = record.get("expert_output", {}).get(name, [])
+                comments: Sequence[str] = []
+                if isinstance(expert_comments, list):
+                    comments = [c for c in expert_comments if isinstance(c, str)]
+                elif isinstance(expert_comments, str):
+                    comments = [expert_comments]
+                structured = record.get("output_format", {}).get(name) == "json"
+                prediction, score = final_prediction(int(pred), comments, structured)
+                y_true, y_pred, scores = columns.setdefault(name, ([], [], []))
+                y_true.append(int(label))
+                y_pred.append(prediction)
+                scores.append(score)
+    return columns
 
-            if prediction == 1 and comments:
-                if any(contains_affirmative(comment) for comment in comments):
-                    prediction = 0
 
-            y_true.append(int(label))
-            y_pred.append(prediction)
-    return y_true, y_pred
+def _parquet_run(path: Path, experts: Optional[Sequence[str]]) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
 
+    dataset = ds.dataset(str(path), format="parquet")
+    names = experts if experts is not None else [field.name for field in dataset.schema.field("model_output").type]
+    projection = {"label": ds.field("label")}
+    for i, name in enumerate(names):
+        projection.update({
+            f"prediction{i}": ds.field("model_output", name),
+            f"comments{i}": ds.field("expert_output", name),
+            f"format{i}": ds.field("output_format", name),
+        })
+    table = dataset.to_table(columns=projection, filter=ds.field("label").is_valid()).combine_chunks()
+    if not table.num_rows:
+        return {name: ([], [], []) for name in names}
+    y_true = table.column("label").to_numpy(zero_copy_only=False).astype(np.int64)
 
-def compute_metrics(y_true, y_pred):
-    tp = fp = tn = fn = 0
-    for truth, pred in zip(y_true, y_pred):
-        if truth == 1 and pred == 1:
-            tp += 1
-        elif truth == 0 and pred == 1:
-            fp += 1
-        elif truth == 0 and pred == 0:
-            tn += 1
-        elif truth == 1 and pred == 0:
-            fn += 1
-
-    precision = tp / (tp + fp) if (tp + fp) else 0.0
-    recall = tp / (tp + fn) if (tp + fn) else 0.0
-    f1 = 2 * precision * recall / (precision + recall) if (precision + recall) else 0.0
-    fpr = fp / (fp + tn) if (fp + tn) else 0.0
+    columns = {}
+    for i, name in enumerate(names):
+        prediction = table.column(f"prediction{i}")
+        present = pc.is_valid(prediction).to_numpy(zero_copy_only=False)
+        y_pred = pc.fill_null(prediction, 0).to_numpy(zero_copy_only=False).astype(np.int64)
+        structured = pc.fill_null(pc.equal(table.column(f"format{i}"), "json"), False).to_numpy(zero_copy_only=False)
+        flagged = y_pred == 1
+
+        # Every comment line at once: affirmative phrases and severity tags, mapped back to their rows
+        comments = table.column(f"comments{i}").chunk(0)
+        lines = pc.list_flatten(comments)
+        owners = pc.list_parent_indices(comments).to_numpy(zero_copy_only=False)
+        affirmative = pc.match_substring_regex(pc.utf8_lower(lines), AFFIRMATIVE_REGEX).to_numpy(zero_copy_only=False)
+        cleared = np.bincount(owners[affirmative], minlength=len(y_pred)) > 0
+        severity = np.zeros(len(y_pred), dtype=np.int64)
+        for tag, rank in SEVERITY_RANKS.items():
+            tagged = pc.match_substring_regex(lines, rf"^- Line [^\[\n]*\[{tag}\]:").to_numpy(zero_copy_only=False)
+            np.maximum.at(severity, owners[tagged], rank)
+
+        y_pred = np.where(flagged & ~structured & cleared, 0, y_pred)
+        score = np.where(y_pred == 1, np.where(structured, np.maximum(severity, 1), 1), 0)
+        columns[name] = (y_true[present], y_pred[present], score[present])
+    return columns
 
+
+def load_run(path: Path, experts: Optional[Sequence[str]] = None) -> Dict[str, ExpertPredictions]:
+    """Predictions of `experts` (default: all found) in one JSONL or Parquet run, read in one pass."""
+    path = Path(path)
+    reader = _parquet_run if path.suffix == ".parquet" else _jsonl_run
+    return {
+        name: ExpertPredictions(str(path), name, *(np.asarray(column, dtype=np.int64) for column in columns))
+        for name, columns in reader(path, experts).items()
+    }
+
+
+def load_runs(paths: Sequence[Path], experts: Optional[Sequence[str]] = None,
+              jobs: Optional[int] = None) -> List[ExpertPredictions]:
+    """All (run, expert) predictions of `paths`, loading runs in parallel processes."""
+    jobs = min(jobs or os.cpu_count() or 1, len(paths))
+    if jobs <= 1:
+        runs = [load_run(path, experts) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            runs = list(pool.map(load_run, paths, repeat(experts)))
+    return [predictions for run in runs for predictions in run.values()]
+
+
+def load_predictions(path: Path, expert: str):
+    predictions = load_run(path, [expert]).get(expert)
+    if predictions is None:
+        return [], []
+    return predictions.y_true.tolist(), predictions.y_pred.tolist()
+
+
+def confusion_matrices(y_true: Sequence[np.ndarray], y_pred: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    (k, 4) TN/FP/FN/TP counts for k prediction vectors, which may differ in
+    length, from one bincount. Labels or predictions other than 0/1 are ignored.
+    """
+    lengths = [len(truth) for truth in y_true]
+    truth = np.concatenate([np.asarray(t, dtype=np.int64) for t in y_true]) if lengths else np.zeros(0, np.int64)
+    pred = np.concatenate([np.asarray(p, dtype=np.int64) for p in y_pred]) if lengths else np.zeros(0, np.int64)
+    group = np.repeat(np.arange(len(lengths)), lengths)
+    valid = ((truth == 0) | (truth == 1)) & ((pred == 0) | (pred == 1))
+    cells = group[valid] * 4 + truth[valid] * 2 + pred[valid]
+    return np.bincount(cells, minlength=4 * len(lengths)).reshape(len(lengths), 4)
+
+
+def rates(counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """Precision, recall, F1 and FPR for confusion counts of any leading shape (..., 4)."""
+    counts = np.asarray(counts, dtype=np.float64)
+    tn, fp, fn, tp = np.moveaxis(counts, -1, 0)
+
+    def ratio(numerator, denominator):
+        return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+    precision = ratio(tp, tp + fp)
+    recall = ratio(tp, tp + fn)
     return {
-        "TP": tp,
-        "FP": fp,
-        "TN": tn,
-        "FN": fn,
         "precision": precision,
         "recall": recall,
-        "f1": f1,
-        "fpr": fpr,
+        "f1": ratio(2 * precision * recall, precision + recall),
+        "fpr": ratio(fp, fp + tn),
     }
 
 
+def compute_metrics(y_true, y_pred):
+    counts = confusion_matrices([y_true], [y_pred])[0]
+    tn, fp, fn, tp = (int(count) for count in counts)
+    metrics = {"TP": tp, "FP": fp, "TN": tn, "FN": fn}
+    metrics.update({name: float(value) for name, value in rates(counts).items()})
+    return metrics
+
+
+def bootstrap_intervals(counts: np.ndarray, resamples: int = 1000, confidence: float = 0.95,
+                        seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    (k, 2) percentile intervals of each rate for k confusion matrices. The
+    metrics depend on a resample only through its confusion counts, so drawing
+    those counts from a multinomial is exact and costs O(resamples) per matrix
+    instead of O(resamples * samples).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    totals = counts.sum(axis=1)
+    probabilities = np.divide(counts, totals[:, None], out=np.full(counts.shape, 0.25), where=totals[:, None] > 0)
+    rng = np.random.default_rng(seed)
+    resampled = rng.multinomial(totals, probabilities, size=(resamples, len(counts)))
+    tail = (1 - confidence) / 2 * 100
+    return {name: np.percentile(values, [tail, 100 - tail], axis=0).T for name, values in rates(resampled).items()}
+
+
+def threshold_sweep(y_true: np.ndarray, score: np.ndarray,
+                    thresholds: Optional[Sequence[float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Confusion counts (t, 4) when only samples with `score >= threshold` are
+    flagged, for each threshold (default: every positive score in the run).
+    """
+    y_true, score = np.asarray(y_true), np.asarray(score, dtype=np.float64)
+    valid = (y_true == 0) | (y_true == 1)
+    y_true, score = y_true[valid], score[valid]
+    if thresholds is None:
+        thresholds = np.unique(score[score > 0])
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    positives = np.sort(score[y_true == 1])
+    negatives = np.sort(score[y_true == 0])
+    tp = len(positives) - np.searchsorted(positives, thresholds, side="left")
+    fp = len(negatives) - np.searchsorted(negatives, thresholds, side="left")
+    counts = np.stack([len(negatives) - fp, fp, len(positives) - tp, tp], axis=1)
+    return thresholds, counts
+
+
+def _format_rate(value: float, interval: Optional[np.ndarray]) -> str:
+    if interval is None:
+        return f"{value:.4f}"
+    return f"{value:.4f} [{interval[0]:.4f}, {interval[1]:.4f}]"
+
+
 def main():
     args = parse_args()
-    jsonl_path = Path(args.jsonl_path)
-    if not jsonl_path.exists():
-        raise FileNotFoundError(f"{jsonl_path} does not exist.")
+    paths = [Path(path) for path in args.paths]
+    for path in paths:
+        if not path.exists():
+            raise FileNotFoundError(f"{path} does not exist.")
 
-    y_true, y_pred = load_predictions(jsonl_path, args.expert)
-    if not y_true:
+    predictions = [p for p in load_runs(paths, args.expert, args.jobs) if len(p.y_true)]
+    if not predictions:
         print("No valid predictions found.")
         return
 
-    metrics = compute_metrics(y_true, y_pred)
-    print(f"Evaluated {len(y_true)} samples using expert '{args.expert}'.")
-    print(f"TP={metrics['TP']} FP={metrics['FP']} TN={metrics['TN']} FN={metrics['FN']}")
-    print(f"Precision: {metrics['precision']:.4f}")
-    print(f"Recall:    {metrics['recall']:.4f}")
-    print(f"F1 Score:  {metrics['f1']:.4f}")
-    print(f"FPR:       {metrics['fpr']:.4f}")
+    counts = confusion_matrices([p.y_true for p in predictions], [p.y_pred for p in predictions])
+    values = rates(counts)
+    intervals = bootstrap_intervals(counts, args.bootstrap, args.confidence) if args.bootstrap else None
+
+    if len(predictions) == 1:
+        p = predictions[0]
+        tn, fp, fn, tp = counts[0]
+        print(f"Evaluated {len(p.y_true)} samples using expert '{p.expert}'.")
+        print(f"TP={tp} FP={fp} TN={tn} FN={fn}")
+        for label, name in (("Precision: ", "precision"), ("Recall:    ", "recall"),
+                            ("F1 Score:  ", "f1"), ("FPR:       ", "fpr")):
+            print(label + _format_rate(values[name][0], intervals[name][0] if intervals else None))
+    else:
+        print("| Run | Expert | Samples | Precision | Recall | F1 | FPR |")
+        print("| :--- | :--- | :---: | :---: | :---: | :---: | :---: |")
+        for i, p in enumerate(predictions):
+            cells = [_format_rate(values[name][i], intervals[name][i] if intervals else None)
+                     for name in ("precision", "recall", "f1", "fpr")]
+            print(f"| {p.run} | {p.expert} | {len(p.y_true)} | " + " | ".join(cells) + " |")
+
+    if args.sweep:
+        print("\n| Run | Expert | Score >= | Flagged | Precision | Recall | F1 | FPR |")
+        print("| :--- | :--- | :---: | :---: | :---: | :---: | :---: | :---: |")
+        for p in predictions:
+            thresholds, sweep = threshold_sweep(p.y_true, p.score)
+            swept = rates(sweep)
+            for j, threshold in enumerate(thresholds):
+                print(f"| {p.run} | {p.expert} | {threshold:g} | {sweep[j, 1] + sweep[j, 3]} | "
+                      + " | ".join(f"{swept[name][j]:.4f}" for name in ("precision", "recall", "f1", "fpr")) + " |")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
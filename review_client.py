@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Client for review_server.py. Sends a file, diff or snippet and prints the report.
+
+Example:
+    python review_client.py path/to/file.py
+    git diff | python review_client.py --diff - --experts BugExpert
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ast_reviewer.pipeline.server import ReviewClient
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Send a review job to a running AST-Reviewer server.")
+    parser.add_argument("target", nargs="?", help="Python file to review.")
+    parser.add_argument("--diff", default=None, help="Review a diff from this file ('-' for stdin).")
+    parser.add_argument("--snippet", default=None, help="Review Python source from this file ('-' for stdin).")
+    parser.add_argument("--experts", nargs="+", default=None, help="Experts to run (skips the router).")
+    parser.add_argument("--host", default="127.0.0.1", help="Server host.")
+    parser.add_argument("--port", type=int, default=8765, help="Server port.")
+    parser.add_argument("--socket", default=None, help="Server Unix socket path.")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds to wait for the review.")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON result.")
+    parser.add_argument("--health", action="store_true", help="Only check that the server is up.")
+    return parser.parse_args()
+
+
+def read_input(path: str) -> str:
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, "r") as f:
+        return f.read()
+
+
+def main() -> int:
+    args = parse_args()
+    client = ReviewClient(host=args.host, port=args.port, socket_path=args.socket, timeout=args.timeout)
+
+    try:
+        if args.health:
+            print(json.dumps(client.health()))
+            return 0
+        if args.diff:
+            result = client.review("diff", content=read_input(args.diff), experts=args.experts, name=args.diff)
+        elif args.snippet:
+            result = client.review("snippet", content=read_input(args.snippet), experts=args.experts, name=args.snippet)
+        elif args.target:
+            # Send the content so the server does not need to see the client's filesystem
+            result = client.review("file", content=read_input(args.target), path=args.target, experts=args.experts)
+        else:
+            print("Error: give a target file, --diff or --snippet.", file=sys.stderr)
+            return 2
+    except (OSError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(result, indent=2) if args.json else result["report"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Resident review server: loads the experts and retrieval models once and
+serves review jobs over a local HTTP port or Unix socket.
+
+Example:
+    python review_server.py --socket /tmp/ast_reviewer.sock --lora ../gemma4b-lora-python
+    python review_client.py path/to/file.py --socket /tmp/ast_reviewer.sock
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args() -> argparse.Namespace:
+    from ast_reviewer.pipeline.reviewer import RETRIEVAL_MODES
+
+    parser = argparse.ArgumentParser(description="Run the AST-Reviewer review daemon.")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind when not using a Unix socket.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind when not using a Unix socket.")
+    parser.add_argument("--socket", default=None, help="Serve on this Unix socket path instead of TCP.")
+    parser.add_argument("--retrieval-mode", choices=RETRIEVAL_MODES, default="dense", help="Context retrieval strategy: dense vectors, BM25+dense fusion, or call-graph definitions (no embeddings).")
+    parser.add_argument("--lora", type=str, default=None, help="Path to a LoRA adapter folder or a merged checkpoint (LoRA/merge_lora.py). If None, use base Gemma model.")
+    parser.add_argument("--backend", default="hf", help="Where experts generate: hf (in-process), openai[:URL] (OpenAI-compatible server) or ollama[:URL].")
+    parser.add_argument("--backend-model", default=None, help="Model name on the inference server (default: google/gemma-3-4b-it for openai, gemma3:4b for ollama).")
+    parser.add_argument("--quantization", choices=["int8", "int4"], default=None, help="Load the expert model with int8/int4 weight-only quantization (for CPU workers).")
+    parser.add_argument("--continuous-batching", action="store_true", help="Share one continuous-batching decode loop across all experts and jobs.")
+    parser.add_argument("--structured", action="store_true", help="Answer with grammar-constrained JSON records {line, severity, message} instead of free text.")
+    parser.add_argument("--no-issues-probe", action="store_true", help="Skip generation when a one-pass probe shows the answer is 'No issues found.'.")
+    parser.add_argument("--panel", action="store_true", help="Review each chunk for all routed experts in one generation.")
+    parser.add_argument("--shared-prefix", action="store_true", help="Prefill each chunk's code and context once for all experts routed to it.")
+    parser.add_argument("--file-root", default=None, help="Let 'file' jobs without content read files under this directory (paths are relative to it). By default clients must send the content.")
+    parser.add_argument("--max-batch-size", type=int, default=8, help="Maximum number of jobs reviewed together.")
+    parser.add_argument("--batch-timeout-ms", type=float, default=50, help="How long to wait for more jobs before running a batch.")
+    parser.add_argument("--max-queue", type=int, default=64, help="Jobs allowed to wait; further requests get HTTP 503.")
+    parser.add_argument("--request-timeout", type=float, default=None, help="Seconds a request waits for its result.")
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+
+    from ast_reviewer.pipeline.reviewer import ReviewPipeline
+    from ast_reviewer.pipeline.server import ReviewServer, make_http_server
+
+    print("Loading review pipeline...")
+    pipeline = ReviewPipeline(
+        retrieval_mode=args.retrieval_mode,
+        lora_path=args.lora,
+        quantization=args.quantization,
+        backend=args.backend,
+        backend_model=args.backend_model,
+        structured=args.structured,
+        continuous_batching=args.continuous_batching,
+        no_issues_probe=args.no_issues_probe,
+        panel=args.panel,
+        shared_prefix=args.shared_prefix,
+    )
+    pipeline.warm_up()
+
+    review_server = ReviewServer(
+        pipeline,
+        max_batch_size=args.max_batch_size,
+        batch_timeout=args.batch_timeout_ms / 1000,
+        max_queue_size=args.max_queue,
+        file_root=args.file_root,
+    )
+    httpd = make_http_server(
+        review_server,
+        host=args.host,
+        port=args.port,
+        socket_path=args.socket,
+        request_timeout=args.request_timeout,
+        verbose=args.verbose,
+    )
+    review_server.start()
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"Review server ready on {where}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        review_server.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,24 +10,40 @@ Example:
         --resume \
         --lora ../gemma4b-lora-python \
         --no-retrieval
+
+Add `--workers 8` to review with 8 processes (one model replica each) and
+merge their shards into --output, or run shards by hand (e.g. on several
+machines) with `--shard 0/8` ... `--shard 7/8` and combine them with `--merge`.
+
+Samples are reviewed grouped by repository snapshot and file (within
+`--plan-window` samples), so each file is indexed once while at most
+`--max-stores` vector stores stay alive; `--merge` puts records back in
+dataset order.
 """
 
 import argparse
 import json
+import multiprocessing
+import os
 import sys
+import zlib
+from collections import OrderedDict
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from ast_reviewer.agents.experts import CommentConsistencyExpert
 from ast_reviewer.retrieval.cast.pipeline import CASTChunker
 from ast_reviewer.retrieval.vector_store import VectorStore
+from columnar_output import ParquetReviewOutput, is_columnar, merge_parquet_shards
+from dataset_stream import iter_samples
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Batch review dataset samples.")
     parser.add_argument(
         "dataset",
-        help="Path to the dataset JSON file (list of samples).",
+        help="Path to the dataset: a JSON array of samples or JSON Lines.",
     )
     parser.add_argument(
         "--repo-cache",
@@ -37,7 +53,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--output",
         default="dataset_reviews.jsonl",
-        help="Path to output JSONL file with added expert/model outputs.",
+        help="Path to output JSONL file with added expert/model outputs (or a .parquet directory for columnar output).",
     )
     parser.add_argument(
         "--resume",
@@ -67,15 +83,94 @@ def parse_args() -> argparse.Namespace:
         default=3,
         help="Number of context chunks to retrieve per sample (default: 3).",
     )
+    parser.add_argument(
+        "--plan-window",
+        type=int,
+        default=1000,
+        help="Samples read ahead and grouped by repository snapshot and file before reviewing (default: 1000).",
+    )
+    parser.add_argument(
+        "--max-stores",
+        type=int,
+        default=16,
+        help="Vector stores kept alive at once; least recently used ones are released (default: 16).",
+    )
     parser.add_argument(
         "--lora",
         type=str,
         default=None,
-        help="Optional path to LoRA adapters for experts.",
+        help="Optional path to LoRA adapters (or a merged checkpoint) for experts.",
+    )
+    parser.add_argument(
+        "--backend",
+        default="hf",
+        help="Where experts generate: hf (in-process), openai[:URL] or ollama[:URL].",
+    )
+    parser.add_argument(
+        "--backend-model",
+        default=None,
+        help="Model name on the inference server.",
+    )
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="Have experts answer with JSON records instead of free text.",
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=["int8", "int4"],
+        default=None,
+        help="Load the expert model with int8/int4 weight-only quantization.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help="Review only shard I of N (0-based, e.g. 2/8) into its own <output>.shard-I-of-N file.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Review with this many worker processes (one shard and model replica each), then merge.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="torch threads per process (default with --workers: CPU cores / workers).",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Only merge existing shard files into --output.",
     )
     return parser.parse_args()
 
 
+def parse_shard(value: str) -> Tuple[int, int]:
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected I/N, got {value!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be in [0, {count}), got {index}")
+    return index, count
+
+
+def shard_of(key: str, count: int) -> int:
+    """Shard that owns a sample. Depends only on its key, so every sample has exactly one owner."""
+    return zlib.crc32(key.encode("utf8")) % count
+
+
+def shard_path(output_path: Path, index: int, count: int) -> Path:
+    return output_path.with_name(f"{output_path.stem}.shard-{index:03d}-of-{count:03d}{output_path.suffix}")
+
+
+def shard_paths(output_path: Path) -> List[Path]:
+    return sorted(output_path.parent.glob(f"{output_path.stem}.shard-*-of-*{output_path.suffix}"))
+
+
 def repo_slug(repo_url: str) -> str:
     slug = repo_url.split("github.com/")[-1].rstrip("/")
     if slug.endswith(".git"):
@@ -88,22 +183,25 @@ def sanitize(name: str) -> str:
 
 
 def index_file(file_path: Path, collection_name: str, chunker: CASTChunker) -> VectorStore:
-    store = VectorStore(collection_name=collection_name)
+    # Per-file stores are rebuilt from scratch anyway, so skip Chroma's disk persistence
+    store = VectorStore(collection_name=collection_name, backend="memory")
     store.clear()
     try:
         chunks = chunker.chunk_file(str(file_path))
-        store.add_chunks(chunks)
+        store.add_chunks(chunks, file_path=str(file_path))
     except Exception as exc:
         print(f"[warn] Failed to chunk {file_path}: {exc}", file=sys.stderr)
     return store
 
 
 def get_vector_store(
-    cache: Dict[str, VectorStore],
+    cache: "OrderedDict[str, VectorStore]",
     target_file: Path,
     use_retrieval: bool,
     chunker: CASTChunker,
+    max_stores: int = 16,
 ) -> Optional[VectorStore]:
+    """Store for `target_file` from `cache`, an LRU of at most `max_stores` live stores."""
     if not use_retrieval:
         return None
     if not target_file or not target_file.exists():
@@ -111,22 +209,42 @@ def get_vector_store(
 
     key = str(target_file.resolve())
     if key in cache:
+        cache.move_to_end(key)
         return cache[key]
 
     collection_name = f"file_{sanitize(key)}"
     print(f"[index] Building vector store for {target_file}")
     cache[key] = index_file(target_file, collection_name=collection_name, chunker=chunker)
+    while len(cache) > max_stores:
+        cache.popitem(last=False)
     return cache[key]
 
 
-def load_dataset(path: str, start: int, limit: Optional[int]) -> List[Dict]:
-    data = json.load(open(path, "r"))
-    if not isinstance(data, list):
-        raise ValueError("Dataset must be a list of samples.")
-    sliced = data[start:]
-    if limit is not None:
-        sliced = sliced[:limit]
-    return sliced
+def plan_reviews(samples: Iterable[Tuple[int, Dict]], window: int) -> Iterator[Tuple[int, Dict]]:
+    """
+    Reorders (dataset index, sample) pairs so samples of the same repository
+    snapshot (repo_url, commit), and within it the same file, are reviewed back
+    to back and share one vector store. Groups are formed over `window` samples
+    at a time, in order of first appearance, so memory stays bounded on
+    streamed datasets.
+    """
+    samples = iter(samples)
+    while True:
+        batch = list(islice(samples, window))
+        if not batch:
+            return
+        groups: Dict[Tuple[str, str], Dict[str, List[Tuple[int, Dict]]]] = {}
+        for idx, sample in batch:
+            snapshot = (sample.get("repo_url") or "", sample.get("commit") or "")
+            groups.setdefault(snapshot, {}).setdefault(sample.get("path") or "", []).append((idx, sample))
+        for files in groups.values():
+            for items in files.values():
+                yield from items
+
+
+def load_dataset(path: str, start: int, limit: Optional[int]) -> Iterator[Dict]:
+    """Streams samples `start` .. `start + limit` of a JSON array or JSON Lines dataset."""
+    return iter_samples(path, start, limit)
 
 
 def sample_key(sample: Dict) -> str:
@@ -140,23 +258,142 @@ def sample_key(sample: Dict) -> str:
     ])
 
 
-def load_processed_keys(output_path: Path) -> Set[str]:
-    processed: Set[str] = set()
-    if not output_path.exists():
-        return processed
-    with output_path.open("r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                record = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            key = sample_key(record)
-            if key:
-                processed.add(key)
-    return processed
+def key_index_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".keys")
+
+
+class ReviewOutput:
+    """
+    Output JSONL plus a sidecar key index (<output>.keys) so --resume never
+    re-reads the records themselves. The index is a header line holding the
+    model variant, then one [sample_key, end offset] line per record, appended
+    after the record is flushed. On resume the indexed prefix is trusted once
+    its last entry checks out against the output, only records written after
+    it are parsed, and a partial line left by a crash is cut off. Outputs
+    without a usable index are scanned once and indexed.
+
+    Raises ValueError if the file holds reviews from a different model variant
+    (adapter, merged or not, quantization), so resumed runs never mix two
+    models' predictions in one file.
+    """
+
+    def __init__(self, path: Path, model_variant: Optional[Dict[str, str]] = None, resume: bool = False):
+        self.path = path
+        self.index_path = key_index_path(path)
+        self.model_variant = model_variant
+        self.keys: Set[str] = set()
+        if resume and path.exists():
+            entries, clean = self._recover()
+            self._out = path.open("ab")
+        else:
+            entries, clean = [], False
+            self._out = path.open("wb")
+        if not clean:
+            # Rewritten whole (O(keys)) so a half-written index line never lingers
+            tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+            with tmp_path.open("w") as f:
+                f.write(json.dumps({"model_variant": model_variant}) + "\n")
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
+            os.replace(tmp_path, self.index_path)
+        self._index = self.index_path.open("a")
+
+    def _read_index(self) -> Tuple[Optional[Dict[str, str]], List[Tuple[str, int]], bool]:
+        """Header variant, entries and whether the index ends cleanly (no half-written last line)."""
+        if not self.index_path.exists():
+            return None, [], False
+        lines = self.index_path.read_text().split("\n")
+        if len(lines) < 2:
+            return None, [], False
+        variant = json.loads(lines[0])["model_variant"]
+        # One decode call for all entries; a torn last line (no trailing newline) is dropped
+        entries = [tuple(entry) for entry in json.loads("[" + ",".join(lines[1:-1]) + "]")]
+        return variant, entries, lines[-1] == ""
+
+    def _index_matches(self, entries: List[Tuple[str, int]], size: int) -> bool:
+        # The last indexed record must sit exactly where the index says
+        if not entries:
+            return True
+        key, end = entries[-1]
+        start = entries[-2][1] if len(entries) > 1 else 0
+        if end > size:
+            return False
+        with self.path.open("rb") as f:
+            f.seek(start)
+            line = f.read(end - start)
+        try:
+            return line.endswith(b"\n") and sample_key(json.loads(line)) == key
+        except json.JSONDecodeError:
+            return False
+
+    def _check_variant(self, recorded: Optional[Dict[str, str]]) -> None:
+        if self.model_variant is not None and recorded is not None and recorded != self.model_variant:
+            raise ValueError(
+                f"{self.path} holds reviews from model variant {recorded}, not {self.model_variant}; "
+                "use a different --output."
+            )
+
+    def _recover(self) -> Tuple[List[Tuple[str, int]], bool]:
+        """
+        Loads the index, indexes records past its end and truncates a partial
+        last line. Returns the entries and whether the index on disk already holds them all.
+        """
+        size = self.path.stat().st_size
+        try:
+            variant, entries, clean = self._read_index()
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            variant, entries, clean = None, [], False
+        if not self._index_matches(entries, size):
+            print(f"[warn] Key index {self.index_path} is stale; rebuilding it from {self.path}", file=sys.stderr)
+            variant, entries, clean = None, [], False
+        self._check_variant(variant)
+        clean = clean and variant == self.model_variant
+
+        end = entries[-1][1] if entries else 0
+        with self.path.open("rb") as f:
+            f.seek(end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                line_end = end + len(line)
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"[warn] Skipping unreadable line ending at byte {line_end} in {self.path}",
+                              file=sys.stderr)
+                        end = line_end
+                        continue
+                    self._check_variant(record.get("model_variant"))
+                    entries.append((sample_key(record), line_end))
+                    clean = False
+                end = line_end
+        if end < size:
+            # Partial record from an interrupted write; that sample is reviewed again
+            print(f"[warn] Truncating partial last line of {self.path}", file=sys.stderr)
+            with self.path.open("r+b") as f:
+                f.truncate(end)
+        self.keys.update(key for key, _ in entries if key)
+        return entries, clean
+
+    def write_record(self, record: Dict, key: str) -> None:
+        self.write(json.dumps(record), key)
+
+    def write(self, line: str, key: str) -> None:
+        self._out.write((line + "\n").encode("utf8"))
+        self._out.flush()
+        self._index.write(json.dumps([key, self._out.tell()]) + "\n")
+        self._index.flush()
+        self.keys.add(key)
+
+    def close(self) -> None:
+        self._out.close()
+        self._index.close()
+
+    def __enter__(self) -> "ReviewOutput":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
 
 def build_review_input(sample: Dict) -> str:
@@ -183,7 +420,7 @@ def review_sample(
 
     retrieved = []
     if store:
-        retrieved = store.query(code_content[:1000], n_results=top_k)
+        retrieved = store.query_unique(code_content[:1000], n_results=top_k)
 
     expert_output: Dict[str, List[str]] = {}
     model_output: Dict[str, int] = {}
@@ -196,39 +433,53 @@ def review_sample(
     result["file_path"] = str(target_path) if target_path else None
     result["expert_output"] = expert_output
     result["model_output"] = model_output
+    result["model_variant"] = {expert.name: expert.variant["id"] for expert in experts}
+    result["output_format"] = {expert.name: "json" if expert.structured else "text" for expert in experts}
     result["model_input"] = code_content
     return result
 
 
-def main() -> None:
-    args = parse_args()
+def review_dataset(args: argparse.Namespace) -> int:
+    """Reviews the dataset (or the samples of `args.shard`) into the output file; returns the number reviewed."""
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
     repo_cache_root = Path(args.repo_cache).resolve()
     if not repo_cache_root.exists():
         raise FileNotFoundError(f"Repo cache root not found: {repo_cache_root}")
 
     dataset = load_dataset(args.dataset, args.start, args.limit)
-    print(f"Loaded {len(dataset)} samples to review.")
 
     chunker = CASTChunker()
     experts = [
-        CommentConsistencyExpert(lora_path=args.lora),
+        CommentConsistencyExpert(
+            lora_path=args.lora,
+            quantization=args.quantization,
+            backend=args.backend,
+            backend_model=args.backend_model,
+            structured=args.structured,
+        ),
     ]
-    store_cache: Dict[str, VectorStore] = {}
+    store_cache: "OrderedDict[str, VectorStore]" = OrderedDict()
 
     output_path = Path(args.output)
+    if args.shard is not None:
+        output_path = shard_path(output_path, *args.shard)
     if not output_path.parent.exists():
         output_path.parent.mkdir(parents=True, exist_ok=True)
-    if args.resume:
-        processed_keys = load_processed_keys(output_path)
-        write_mode = "a"
-        if processed_keys:
-            print(f"Resuming from {output_path}, found {len(processed_keys)} processed samples.")
-    else:
-        processed_keys = set()
-        write_mode = "w"
     processed = 0
-    with open(output_path, write_mode) as fout:
-        for idx, sample in enumerate(dataset, start=args.start):
+    model_variant = {e.name: e.variant["id"] for e in experts}
+    output_class = ParquetReviewOutput if is_columnar(output_path) else ReviewOutput
+    with output_class(output_path, model_variant, resume=args.resume) as output:
+        if output.keys:
+            print(f"Resuming from {output_path}, found {len(output.keys)} processed samples.")
+        samples: Iterable[Tuple[int, Dict]] = enumerate(dataset, start=args.start)
+        if args.shard is not None:
+            index, count = args.shard
+            samples = ((idx, sample) for idx, sample in samples if shard_of(sample_key(sample), count) == index)
+        for idx, sample in plan_reviews(samples, args.plan_window):
+            key = sample_key(sample)
             repo_url = sample.get("repo_url")
             commit = sample.get("commit")
             if not repo_url or not commit:
@@ -245,8 +496,7 @@ def main() -> None:
             if not target_rel:
                 print(f"[skip] sample {idx} missing file path.", file=sys.stderr)
                 continue
-            key = sample_key(sample)
-            if key in processed_keys:
+            if key in output.keys:
                 print(f"[skip] sample {idx} already processed ({key}).")
                 continue
 
@@ -256,18 +506,114 @@ def main() -> None:
                 continue
 
             print(f"[{processed+1}] Reviewing {slug}@{commit} :: {target_rel}")
-            store = get_vector_store(store_cache, target_path, not args.no_retrieval, chunker)
+            store = get_vector_store(store_cache, target_path, not args.no_retrieval, chunker, args.max_stores)
             try:
                 record = review_sample(sample, target_path, store, experts, args.top_k)
             except Exception as exc:
                 print(f"[error] sample {idx} failed: {exc}", file=sys.stderr)
                 continue
 
-            fout.write(json.dumps(record) + "\n")
-            processed_keys.add(key)
+            # Records are written in review (grouped) order; lets --merge restore dataset order
+            record["dataset_index"] = idx
+            output.write_record(record, key)
             processed += 1
 
-    print(f"Completed {processed} samples. Results written to {args.output}")
+    print(f"Completed {processed} samples. Results written to {output_path}")
+    return processed
+
+
+def _shard_records(path: Path) -> Iterator[Tuple[int, int, Dict]]:
+    """(start offset, end offset, record) of each readable line of a shard file."""
+    start = 0
+    with path.open("rb") as f:
+        for line_num, line in enumerate(f, start=1):
+            end = start + len(line)
+            if line.strip():
+                try:
+                    yield start, end, json.loads(line)
+                except json.JSONDecodeError:
+                    # A worker killed mid-write leaves a partial last line; that sample is redone on resume
+                    print(f"[warn] Skipping unreadable line {line_num} in {path}", file=sys.stderr)
+            start = end
+
+
+def merge_shards(output_path: Path) -> int:
+    """
+    Writes the records of all shard files of `output_path` into it, in dataset
+    order (shard order for Parquet), keeping one record per sample_key.
+    Returns the number of records written.
+    """
+    paths = shard_paths(output_path)
+    if not paths:
+        raise FileNotFoundError(f"No shard files for {output_path}")
+    if is_columnar(output_path):
+        merged = merge_parquet_shards(paths, output_path)
+        print(f"Merged {merged} samples from {len(paths)} shards into {output_path}")
+        return merged
+    # Shards are grouped by repository, not in dataset order, so sort (index, location) pairs
+    # and copy the lines by offset instead of holding the records
+    locations: List[Tuple[int, int, int, int, str]] = []
+    variant = None
+    for number, path in enumerate(paths):
+        for start, end, record in _shard_records(path):
+            recorded = record.get("model_variant")
+            if variant is None:
+                variant = recorded
+            elif recorded is not None and recorded != variant:
+                raise ValueError(f"Shards of {output_path} mix model variants {variant} and {recorded}")
+            locations.append((record.get("dataset_index", -1), number, start, end, sample_key(record)))
+    locations.sort()
+
+    seen: Set[str] = set()
+    shards = [path.open("rb") for path in paths]
+    try:
+        with ReviewOutput(output_path, variant) as output:
+            for _, number, start, end, key in locations:
+                if key in seen:
+                    continue
+                shards[number].seek(start)
+                output.write(shards[number].read(end - start).decode("utf8").strip(), key)
+                seen.add(key)
+    finally:
+        for shard in shards:
+            shard.close()
+    print(f"Merged {len(seen)} samples from {len(paths)} shards into {output_path}")
+    return len(seen)
+
+
+def run_workers(args: argparse.Namespace) -> None:
+    """Reviews shard i of N in worker process i, each with its own model replica, then merges."""
+    count = args.workers
+    threads = args.threads or max(1, (os.cpu_count() or 1) // count)
+    # spawn, not fork: each worker loads its own model instead of inheriting a half-initialized torch
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for index in range(count):
+        worker_args = argparse.Namespace(**{**vars(args), "shard": (index, count), "workers": 1, "threads": threads})
+        worker = context.Process(target=review_dataset, args=(worker_args,), name=f"review-shard-{index}")
+        worker.start()
+        workers.append(worker)
+    for worker in workers:
+        worker.join()
+
+    output_path = Path(args.output)
+    if shard_paths(output_path):
+        merge_shards(output_path)
+    failed = [worker.name for worker in workers if worker.exitcode != 0]
+    if failed:
+        raise SystemExit(f"Workers failed: {', '.join(failed)}; rerun with --resume to finish their shards.")
+
+
+def main() -> None:
+    args = parse_args()
+    if args.merge:
+        merge_shards(Path(args.output))
+    elif args.workers > 1:
+        if args.shard is not None:
+            raise SystemExit("--workers picks shards itself; drop --shard.")
+        run_workers(args)
+    else:
+        review_dataset(args)
 
 
 if __name__ == "__main__":
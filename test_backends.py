@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ast_reviewer.agents.backends import REVIEW_RECORDS_SCHEMA, OpenAIBackend, get_backend
+from ast_reviewer.agents.experts import NO_ISSUES, BaseExpert, BugExpert
+from ast_reviewer.agents.variants import BASE_MODEL_ID
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers /v1/completions and /api/generate by echoing the prompt's last line."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests.append((self.path, payload))
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+        text = " reply to " + payload["prompt"].splitlines()[-1]
+        if self.path == "/v1/completions":
+            body = {"choices": [{"index": 0, "text": text, "finish_reason": "stop"}]}
+        elif self.path == "/api/generate":
+            body = {"model": payload["model"], "response": text, "done": True}
+        else:
+            body = {"error": "not found"}
+        data = json.dumps(body).encode("utf8")
+        self.send_response(200 if "error" not in body else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        # Simulates a server whose keep-alive timeout expires right after the response
+        self.close_connection = self.server.drop_idle
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = []
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.delay = 0.0
+    server.drop_idle = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_url(server, path=""):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_openai_completion_request(stub):
+    backend = OpenAIBackend(stub_url(stub, "/v1"), model="served-gemma")
+    assert backend.generate("Review:\ncode", max_new_tokens=32, stop=["No issues found."]) == "reply to code"
+    path, payload = stub.requests[0]
+    assert path == "/v1/completions"
+    assert payload == {"model": "served-gemma", "prompt": "Review:\ncode", "max_tokens": 32,
+                       "temperature": 0, "stop": ["No issues found."]}
+    backend.close()
+
+
+def test_ollama_generate_request(stub):
+    backend = get_backend(f"ollama:{stub_url(stub)}")
+    assert backend.generate("Review:\ncode", max_new_tokens=16) == "reply to code"
+    path, payload = stub.requests[0]
+    assert path == "/api/generate"
+    assert payload["model"] == "gemma3:4b"
+    assert payload["raw"] is True and payload["stream"] is False
+    assert payload["options"] == {"temperature": 0, "num_predict": 16}
+    backend.close()
+
+
+def test_structured_requests_send_schema(stub):
+    openai = OpenAIBackend(stub_url(stub, "/v1"))
+    ollama = get_backend(f"ollama:{stub_url(stub)}")
+    openai.generate("Issues:", structured=True)
+    ollama.generate("Issues:", structured=True)
+    (_, openai_payload), (_, ollama_payload) = stub.requests
+    assert openai_payload["response_format"]["json_schema"]["schema"] == REVIEW_RECORDS_SCHEMA
+    assert ollama_payload["format"] == REVIEW_RECORDS_SCHEMA
+    openai.close()
+    ollama.close()
+
+
+def test_concurrent_requests_reuse_pooled_connections(stub):
+    stub.delay = 0.05
+    backend = OpenAIBackend(stub_url(stub, "/v1"), max_connections=4)
+    prompts = [f"prompt {i}" for i in range(12)]
+
+    assert backend.generate_many(prompts) == [f"reply to prompt {i}" for i in range(12)]
+    assert stub.max_in_flight > 1
+    assert stub.connections <= 4
+
+    # Keep-alive: a second round runs on the same connections
+    opened = stub.connections
+    backend.generate_many(prompts)
+    assert stub.connections == opened
+    assert backend.pool.opened == opened
+    backend.close()
+
+
+def test_reconnects_after_server_drops_idle_connection(stub):
+    stub.drop_idle = True
+    backend = OpenAIBackend(stub_url(stub, "/v1"), max_connections=1)
+    assert backend.generate("first") == "reply to first"
+    time.sleep(0.05)
+    assert backend.generate("second") == "reply to second"
+    assert backend.pool.opened == 2
+    assert [payload["prompt"] for _, payload in stub.requests] == ["first", "second"]
+    backend.close()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_backend("triton:http://127.0.0.1:8000")
+
+
+def test_expert_reviews_through_remote_backend(stub, monkeypatch):
+    from benchmark_decoding import char_tokenizer
+
+    # Only the tokenizer is loaded locally; use a small one instead of downloading Gemma's
+    monkeypatch.setitem(BaseExpert._TOKENIZER_CACHE, BASE_MODEL_ID, char_tokenizer())
+    expert = BugExpert(backend=f"openai:{stub_url(stub, '/v1')}")
+    assert expert.pipe is None
+    assert expert.variant["id"] == f"openai:{BASE_MODEL_ID}"
+
+    assert expert.review_batch([("x = 1", []), ("y = 2", [])]) == [["reply to Issues:"], ["reply to Issues:"]]
+    assert all(payload["stop"] == [NO_ISSUES] for _, payload in stub.requests)
+
+    with pytest.raises(ValueError):
+        BugExpert(lora_path="adapter", backend=f"openai:{stub_url(stub, '/v1')}")
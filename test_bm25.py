@@ -0,0 +1,57 @@
+import math
+
+import pytest
+
+from ast_reviewer.retrieval.bm25 import BM25Index, reciprocal_rank_fusion, tokenize_code
+
+DOCS = {
+    "auth": "def authenticate_user(name, password):\n    return check_password(name, password)",
+    "vec": "def normalize_vectors(vectors):\n    return [v / norm(v) for v in vectors]",
+    "net": "class ConnectionPool:\n    def establish_connection(self, host):\n        retry(host)",
+}
+
+
+def test_tokenize_code_splits_identifiers():
+    assert tokenize_code("def normalizeVectors(self, raw_data): return raw_data") == [
+        "normalizevectors", "normalize", "vectors", "raw_data", "raw", "data", "raw_data", "raw", "data",
+    ]
+
+
+def test_bm25_scores_match_the_formula():
+    index = BM25Index(k1=1.5, b=0.75)
+    for doc_id, content in DOCS.items():
+        index.add(doc_id, content)
+
+    hits = index.search("password", n_results=3)
+    assert [doc_id for doc_id, _ in hits] == ["auth"]
+
+    lengths = {doc_id: len(tokenize_code(content)) for doc_id, content in DOCS.items()}
+    avg_len = sum(lengths.values()) / len(lengths)
+    idf = math.log(1 + (3 - 1 + 0.5) / (1 + 0.5))
+    tf = tokenize_code(DOCS["auth"]).count("password")
+    expected = idf * tf * 2.5 / (tf + 1.5 * (0.25 + 0.75 * lengths["auth"] / avg_len))
+    assert hits[0][1] == pytest.approx(expected)
+
+    # Whole identifiers and their parts both match; `terms` replaces the query text
+    assert index.search("normalize_vectors")[0][0] == "vec"
+    assert index.search("unrelated", terms=["ConnectionPool"])[0][0] == "net"
+    assert index.search("nothing matches") == []
+
+
+def test_bm25_remove_and_replace():
+    index = BM25Index()
+    for doc_id, content in DOCS.items():
+        index.add(doc_id, content)
+    index.remove("auth")
+    assert len(index) == 2 and index.search("password") == []
+    index.add("vec", "def retry(host): pass")
+    assert index.search("normalize") == [] and {doc_id for doc_id, _ in index.search("retry")} == {"vec", "net"}
+    assert "normalize" not in index.postings
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+    assert dict(fused)["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert dict(fused)["c"] == pytest.approx(1 / 63)
+    assert reciprocal_rank_fusion([]) == []
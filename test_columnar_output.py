@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from columnar_output import ParquetReviewOutput, part_files
+from metrics import load_predictions, load_run
+from run_dataset_reviews import ReviewOutput, merge_shards, shard_path
+
+EXPERT = "CommentConsistencyExpert"
+VARIANT = {EXPERT: "gemma-3-4b-it"}
+
+
+def record(i, output_format="text"):
+    comments = [[], ["The comment is still accurate."], ["- Line 2 [medium]: stale comment", "- Line 5 [low]: typo"]][i % 3]
+    return {
+        "id": f"s{i}", "label": i % 2, "old_code_raw": "x = 1\n" * 50, "new_code_raw": "x = 2\n" * 50,
+        "expert_output": {EXPERT: comments}, "model_output": {EXPERT: 1 if comments else 0},
+        "model_variant": VARIANT, "output_format": {EXPERT: output_format},
+        "model_input": "x = 1\n" * 100, "dataset_index": i,
+    }
+
+
+def write(output, ids, **kwargs):
+    for i in ids:
+        output.write_record(record(i, **kwargs), f"s{i}")
+
+
+@pytest.mark.parametrize("output_format", ["text", "json"])
+def test_metrics_match_jsonl(tmp_path, output_format):
+    with ReviewOutput(tmp_path / "out.jsonl", VARIANT) as output:
+        write(output, range(20), output_format=output_format)
+    with ParquetReviewOutput(tmp_path / "out.parquet", VARIANT, batch_size=6) as output:
+        write(output, range(20), output_format=output_format)
+
+    assert len(part_files(tmp_path / "out.parquet")) == 4
+    assert load_predictions(tmp_path / "out.parquet", EXPERT) == load_predictions(tmp_path / "out.jsonl", EXPERT)
+    columnar, rows = load_run(tmp_path / "out.parquet")[EXPERT], load_run(tmp_path / "out.jsonl")[EXPERT]
+    assert columnar.score.tolist() == rows.score.tolist()
+    assert set(columnar.score.tolist()) == ({0, 1, 2} if output_format == "json" else {0, 1})
+
+
+def test_resume_and_variant_check(tmp_path):
+    path = tmp_path / "out.parquet"
+    output = ParquetReviewOutput(path, VARIANT, batch_size=4)
+    write(output, range(6))
+    # Interrupted before the second batch was flushed
+    del output
+
+    with ParquetReviewOutput(path, VARIANT, resume=True, batch_size=4) as output:
+        assert output.keys == {f"s{i}" for i in range(4)}
+        write(output, range(4, 8))
+    assert ParquetReviewOutput(path, VARIANT, resume=True).keys == {f"s{i}" for i in range(8)}
+
+    with pytest.raises(ValueError):
+        ParquetReviewOutput(path, {EXPERT: "gemma-3-4b-it@int4"}, resume=True)
+
+
+def test_merge_parquet_shards(tmp_path):
+    import pyarrow.parquet as pq
+
+    output_path = tmp_path / "out.parquet"
+    for index, ids in enumerate([(0, 2, 4), (1, 3, 4)]):
+        with ParquetReviewOutput(shard_path(output_path, index, 2), VARIANT) as shard:
+            write(shard, ids)
+
+    assert merge_shards(output_path) == 5
+    table = pq.read_table(output_path)
+    assert sorted(table.column("sample_key").to_pylist()) == [f"s{i}" for i in range(5)]
+    assert "model_input" not in table.column_names
+    assert json.loads(table.schema.metadata[b"model_variant"]) == VARIANT
+
+
+def test_values_that_do_not_fit_go_to_extra_fields(tmp_path):
+    import pyarrow.parquet as pq
+
+    output_path = tmp_path / "out.parquet"
+    # Shard 0 fixes `stars` as null (string) and `pr` as int; shard 1 sees them the other way round
+    fields = [{"stars": None, "pr": 7}, {"stars": 12, "pr": "#8"}, {"stars": 3, "pr": 9}]
+    for index, (first, later) in enumerate([(0, (1, 2)), (1, (2, 0))]):
+        with ParquetReviewOutput(shard_path(output_path, index, 2), VARIANT, batch_size=1) as shard:
+            for i in (first,) + later:
+                shard.write_record({**record(3 * index + i), **fields[i]}, f"s{3 * index + i}")
+
+    assert merge_shards(output_path) == 6
+    rows = {row["sample_key"]: row for row in pq.read_table(output_path).to_pylist()}
+    for key, row in rows.items():
+        extra = json.loads(row["extra_fields"] or "{}")
+        i = int(key[1:]) % 3
+        for name in ("stars", "pr"):
+            stored = row[name] if name not in extra else extra[name]
+            assert stored == fields[i][name]
+    assert len(load_predictions(output_path, EXPERT)[0]) == 6
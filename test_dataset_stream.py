@@ -0,0 +1,68 @@
+import io
+import json
+
+import pytest
+
+from dataset_stream import iter_json_array, iter_samples
+
+SAMPLES = [
+    {"id": i, "path": f"pkg/mod_{i}.py", "old_code_raw": "def f():\n    return {'a': [1, \"]\"]}\n" * (i + 1),
+     "score": 12345 + i, "note": "naïve — 注释"}
+    for i in range(25)
+]
+
+
+@pytest.fixture(params=["array", "jsonl"])
+def dataset(request, tmp_path):
+    path = tmp_path / f"data.{'json' if request.param == 'array' else 'jsonl'}"
+    if request.param == "array":
+        path.write_text(json.dumps(SAMPLES, indent=2, ensure_ascii=False), encoding="utf8")
+    else:
+        path.write_text("".join(json.dumps(s, ensure_ascii=False) + "\n\n" for s in SAMPLES), encoding="utf8")
+    return path
+
+
+def test_reads_all_samples(dataset):
+    assert list(iter_samples(str(dataset))) == SAMPLES
+
+
+def test_start_and_limit(dataset):
+    assert list(iter_samples(str(dataset), start=3, limit=4)) == SAMPLES[3:7]
+    assert list(iter_samples(str(dataset), start=20, limit=100)) == SAMPLES[20:]
+    assert list(iter_samples(str(dataset), start=30)) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_elements_split_across_chunks(chunk_size):
+    values = [*SAMPLES[:5], 1234567, -0.5e10, "a, ]string", [], {}, None, True]
+    text = json.dumps(values, ensure_ascii=False)
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == values
+
+
+def test_stops_reading_after_limit():
+    reads = []
+
+    class Tracking(io.StringIO):
+        def read(self, size=-1):
+            reads.append(size)
+            return super().read(size)
+
+    text = json.dumps(SAMPLES)
+    stream = Tracking(text)
+    items = iter_json_array(stream, chunk_size=256)
+    assert [next(items) for _ in range(2)] == SAMPLES[:2]
+    assert stream.tell() < len(text) / 4
+
+
+def test_empty_and_malformed(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(" [ ] ")
+    assert list(iter_samples(str(path))) == []
+
+    path.write_text('[{"id": 1}, {"id": 2')
+    with pytest.raises(ValueError):
+        list(iter_samples(str(path)))
+
+    path.write_text('[{"id": 1} {"id": 2}]')
+    with pytest.raises(ValueError):
+        list(iter_samples(str(path)))
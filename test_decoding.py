@@ -0,0 +1,249 @@
+import json
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from ast_reviewer.agents import experts
+from ast_reviewer.agents.backends import PipelineBackend, cut_at_stop
+from ast_reviewer.agents.decoding import (
+    DONE,
+    OPEN_EXITS,
+    RECORD_EXITS,
+    SEVERITY_EXITS,
+    JsonArrayStoppingCriteria,
+    SentinelStoppingCriteria,
+    generate_shared_prefix,
+    greedy_starts_with,
+    json_records_state,
+    review_json_constraints,
+)
+from ast_reviewer.agents.experts import BaseExpert, BugExpert, StyleExpert, review_with_shared_prefix
+from benchmark_decoding import char_tokenizer, tiny_causal_lm
+
+PROMPTS = ["def f(x):", "return a + b", "x = 1\n", "    for i in range(len(items)):"]
+
+RECORD = '[{"line": 12, "severity": "high", "message": "Off by one"}'
+
+
+@pytest.mark.parametrize("text, state", [
+    ("", (None, OPEN_EXITS)),
+    ("[", (None, ['{"line": ', "]"])),
+    ("[]", (DONE, [])),
+    ('[{"line": ', ("line", [])),
+    ('[{"line": 12', ("digits", SEVERITY_EXITS)),
+    ('[{"line": 0', (None, SEVERITY_EXITS)),
+    ('[{"line": 123456', (None, SEVERITY_EXITS)),
+    ('[{"line": 12, "sev', (None, [exit[len(', "sev'):] for exit in SEVERITY_EXITS])),
+    ('[{"line": 12, "severity": "high", "message": "Off', ("string", RECORD_EXITS)),
+    (RECORD[:-1], (None, [exit[1:] for exit in RECORD_EXITS])),
+    (RECORD + ", " + RECORD[1:-2], ("string", RECORD_EXITS)),
+    (RECORD + "]", (DONE, [])),
+])
+def test_json_records_state(text, state):
+    assert json_records_state(text) == state
+
+
+@pytest.mark.parametrize("text", ["{", "[x", '[{"line": x', '[{"line": 12, "severity": "urgent"'])
+def test_json_records_state_rejects_other_text(text):
+    with pytest.raises(ValueError):
+        json_records_state(text)
+
+
+def test_constrained_generation_stays_in_the_grammar():
+    tokenizer = char_tokenizer()
+    model = tiny_causal_lm(tokenizer, hidden_size=64, layers=2).eval()
+    input_ids = tokenizer(["Review this code:", "x = 1"], return_tensors="pt", padding=True)["input_ids"]
+    with torch.no_grad():
+        output = model.generate(input_ids, max_new_tokens=80, do_sample=False, pad_token_id=tokenizer.pad_token_id,
+                                **review_json_constraints(tokenizer))
+
+    for row in output[:, input_ids.shape[1]:]:
+        text = tokenizer.decode(row, skip_special_tokens=True)
+        assert text.startswith("[")
+        for end in range(len(text) + 1):
+            json_records_state(text[:end])
+        records = BaseExpert.parse_records(text)
+        assert all(record["severity"] in ("low", "medium", "high") for record in records)
+
+
+def test_parse_records_recovers_truncated_answers():
+    second = {"line": 20, "severity": "low", "message": 'Say "items", not "item"'}
+    complete = RECORD + ", " + json.dumps(second) + "]"
+    assert BaseExpert.parse_records(complete)[1] == second
+    # Cut inside and right after the second record: only complete records are kept
+    assert BaseExpert.parse_records(complete[:-20]) == [json.loads(RECORD + "]")[0]]
+    assert BaseExpert.parse_records(complete[:-1]) == json.loads(complete)
+    # An escaped quote (remote backends) inside a cut-off message does not end it
+    cut = RECORD + ', {"line": 3, "severity": "low", "message": "rename \\"}'
+    assert BaseExpert.parse_records(cut) == [json.loads(RECORD + "]")[0]]
+
+    assert BaseExpert.parse_records("[]") == []
+    assert BaseExpert.parse_records("No issues found.") == [{"line": None, "severity": "low", "message": "No issues found."}]
+    assert BaseExpert.parse_records('[{"line": 1, "sev') == [{"line": None, "severity": "low", "message": '[{"line": 1, "sev'}]
+
+
+@pytest.fixture(scope="module")
+def tiny():
+    tokenizer = char_tokenizer()
+    return tiny_causal_lm(tokenizer, hidden_size=64, layers=2).eval(), tokenizer
+
+
+def greedy(model, tokenizer, prompt, max_new_tokens=12):
+    input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+    with torch.no_grad():
+        output = model.generate(input_ids, max_new_tokens=max_new_tokens, do_sample=False,
+                                pad_token_id=tokenizer.pad_token_id)
+    return tokenizer.decode(output[0, input_ids.shape[1]:], skip_special_tokens=True)
+
+
+def other_char(char):
+    return "q" if char != "q" else "z"
+
+
+def test_sentinel_stop_with_multi_token_steps():
+    tokenizer = char_tokenizer()
+    sentinel = "No issues found."
+    prompt = tokenizer("Review the code.\n")["input_ids"]
+    answer = tokenizer(sentinel + " Done here")["input_ids"]
+    # Assisted decoding: the first check already sees the whole sentinel, the next one four more tokens
+    steps = [torch.tensor([prompt + answer[:len(sentinel) + 1]]), torch.tensor([prompt + answer[:len(sentinel) + 5]])]
+
+    guessed = SentinelStoppingCriteria(tokenizer, sentinel)
+    assert [bool(guessed(ids, None)[0]) for ids in steps] == [False, False]
+    known = SentinelStoppingCriteria(tokenizer, sentinel, prompt_length=len(prompt))
+    assert [bool(known(ids, None)[0]) for ids in steps] == [True, True]
+
+
+class RecordingPipe:
+    """Stands in for a text-generation pipeline and records the generate options."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.model = type("Model", (), {"name_or_path": "recording"})()
+        self.options = None
+
+    def __call__(self, prompts, **options):
+        self.options = options
+        if isinstance(prompts, str):
+            return [{"generated_text": prompts + " answer"}]
+        return [[{"generated_text": prompt + " answer"}] for prompt in prompts]
+
+
+def test_pipeline_backend_passes_the_prompt_length():
+    tokenizer = char_tokenizer()
+    pipe = RecordingPipe(tokenizer)
+    backend = PipelineBackend(pipe)
+    assert backend.generate_many(["short", "a longer prompt"], 8, stop=["No issues found."]) == ["answer", "answer"]
+    (criteria,) = pipe.options["stopping_criteria"]
+    assert isinstance(criteria, SentinelStoppingCriteria) and criteria.prompt_length == len("a longer prompt")
+
+    backend.generate("short", 8, structured=True)
+    (criteria,) = pipe.options["stopping_criteria"]
+    assert isinstance(criteria, JsonArrayStoppingCriteria) and criteria.prompt_length == len("short")
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_probe_agrees_with_greedy_decoding(tiny, prompt):
+    model, tokenizer = tiny
+    answer = greedy(model, tokenizer, prompt, max_new_tokens=8)
+    sentinels = [
+        answer[:6],                                  # first token, then teacher-forced tokens
+        answer[:1],                                  # first token only
+        answer[:3] + other_char(answer[3]),          # diverges after the first token
+        other_char(answer[0]) + answer[1:6],         # wrong first token
+    ]
+    for sentinel in sentinels:
+        expected = any(answer.startswith(prefix + sentinel) for prefix in ("", " ", "\n"))
+        assert greedy_starts_with(model, tokenizer, prompt, sentinel) == expected
+    assert greedy_starts_with(model, tokenizer, prompt, answer[:6])
+
+
+@pytest.mark.parametrize("options", [{}, {"prompt_lookup_num_tokens": 3}])
+def test_generation_stops_after_the_sentinel(tiny, options):
+    from transformers import pipeline
+
+    model, tokenizer = tiny
+    backend = PipelineBackend(pipeline("text-generation", model=model, tokenizer=tokenizer))
+    for prompt in PROMPTS:
+        answer = greedy(model, tokenizer, prompt, max_new_tokens=24)
+        sentinel = answer[4:9]
+        output = backend.generate(prompt, 24, stop=[sentinel], **options)
+        # Cut before the sentinel, also when prompt lookup appended a block of draft tokens past it
+        assert output == answer[:answer.index(sentinel)].strip()
+
+
+def test_cut_at_stop():
+    assert cut_at_stop("- x is unused\nNo issues found.", ["No issues found."]) == "- x is unused\n"
+    assert cut_at_stop("a STOP b END c", ["END", "STOP"]) == "a "
+    assert cut_at_stop("no stop here", ["END", ""]) == "no stop here"
+    assert cut_at_stop("no stop here", None) == "no stop here"
+
+
+def test_no_issues_probe_skips_generation(tiny, monkeypatch):
+    from transformers import pipeline
+
+    model, tokenizer = tiny
+    monkeypatch.setitem(BaseExpert._PIPELINE_CACHE, "__base__", pipeline("text-generation", model=model, tokenizer=tokenizer))
+    monkeypatch.setattr(experts, "MAX_NEW_TOKENS", 12)
+    expert = BugExpert(no_issues_probe=True)
+    prompt = PROMPTS[0]
+    answer = greedy(model, tokenizer, prompt)
+
+    # A model whose greedy answer starts with the sentinel is not run to completion
+    monkeypatch.setattr(experts, "NO_ISSUES", answer[:6])
+    calls = []
+    generate = expert.backend.generate
+    monkeypatch.setattr(expert.backend, "generate", lambda *args, **kwargs: calls.append(args) or generate(*args, **kwargs))
+    assert expert.generate(prompt) == answer[:6] and calls == []
+
+    monkeypatch.setattr(experts, "NO_ISSUES", other_char(answer[0]) + answer[1:6])
+    assert expert.generate(prompt) == answer.strip() and len(calls) == 1
+
+
+def test_shared_prefix_matches_separate_greedy_runs(tiny):
+    model, tokenizer = tiny
+    prefix = "def total(items):\n    return sum("
+    # Suffixes of different lengths are padded between prefix and suffix
+    suffixes = ["x", "item.price for item in items", " i ", "\n# Reviewer: check the loop bounds\n"]
+    answers = generate_shared_prefix(model, tokenizer, prefix, suffixes, max_new_tokens=10)
+    assert answers == [greedy(model, tokenizer, prefix + suffix, max_new_tokens=10).strip() for suffix in suffixes]
+    assert generate_shared_prefix(model, tokenizer, prefix, suffixes[1:2], max_new_tokens=10) == answers[1:2]
+
+
+def test_review_with_shared_prefix(tiny, monkeypatch):
+    from transformers import pipeline
+
+    model, tokenizer = tiny
+    monkeypatch.setitem(BaseExpert._PIPELINE_CACHE, "__base__", pipeline("text-generation", model=model, tokenizer=tokenizer))
+    monkeypatch.setattr(experts, "MAX_NEW_TOKENS", 10)
+    team = [BugExpert(), StyleExpert()]
+    code = "def add(a, b):\n    return a - b\n"
+
+    shared = review_with_shared_prefix(team, code, [])
+    separate = {expert.name: expert.review(code, []) for expert in team}
+    assert shared == separate
+    assert not any("Error" in comment for comments in shared.values() for comment in comments)
+
+
+class FallbackExpert:
+    """An expert that cannot fork a KV cache (e.g. on a remote backend)."""
+
+    pipe = None
+    engine = None
+    structured = False
+    speculative = False
+
+    def __init__(self, name):
+        self.name = name
+
+    def review(self, diff, context):
+        return [f"{self.name} reviewed {diff}"]
+
+
+def test_review_with_shared_prefix_falls_back_to_separate_reviews():
+    team = [FallbackExpert("BugExpert"), FallbackExpert("StyleExpert")]
+    assert review_with_shared_prefix(team, "x = 1", []) == {
+        "BugExpert": ["BugExpert reviewed x = 1"], "StyleExpert": ["StyleExpert reviewed x = 1"],
+    }
+    assert review_with_shared_prefix(team[:1], "y", []) == {"BugExpert": ["BugExpert reviewed y"]}
@@ -0,0 +1,118 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from ast_reviewer.retrieval.cast.pipeline import CASTChunker
+from ast_reviewer.retrieval.context_packer import ContextPacker
+from ast_reviewer.retrieval.dedup import ContextDeduplicator, base_name, span_overlap
+from ast_reviewer.retrieval.embeddings import EmbeddingProvider
+from ast_reviewer.retrieval.vector_store import VectorStore
+
+ORDERS = """def load_orders(path):
+    with open(path) as f:
+        rows = [line.split(",") for line in f]
+    orders = []
+    for row in rows:
+        orders.append({"id": row[0], "price": float(row[1]), "quantity": int(row[2])})
+    return orders
+
+
+def order_total(orders):
+    total = 0
+    for order in orders:
+        total += order["price"] * order["quantity"]
+    if total > 100:
+        total = total * 0.9
+    return round(total, 2)
+"""
+
+
+class HashEmbedder(EmbeddingProvider):
+    name = "hash"
+
+    def __call__(self, texts):
+        return np.stack([np.random.default_rng(zlib.crc32(t.encode())).random(8, dtype=np.float32) for t in texts])
+
+
+def chunk(name, start, end, content, file=None):
+    metadata = {"name": name, "type": "function", "start_line": start, "end_line": end}
+    if file is not None:
+        metadata["file"] = file
+    return {"content": content, "metadata": metadata}
+
+
+def test_span_overlap_needs_a_known_file():
+    a = {"start_line": 1, "end_line": 10, "file": "a.py"}
+    assert span_overlap(a, dict(a)) == 1.0
+    assert span_overlap(a, {**a, "file": "b.py"}) == 0.0
+    assert span_overlap({**a, "file": None}, {**a, "file": None}) == 0.0
+    assert span_overlap({"start_line": 1, "end_line": 10}, {"start_line": 3, "end_line": 4}) == 0.0
+
+
+def test_deduplicator_keeps_same_lines_of_unknown_files():
+    first = chunk("load", 1, 4, "def load(path):\n    with open(path) as f:\n        return f.read()\n")
+    second = chunk("save", 1, 4, "def save(path, data):\n    import json\n    json.dump(data, open(path, 'w'))\n")
+    assert ContextDeduplicator().deduplicate([first, second]) == [first, second]
+
+    part = chunk("load_part1", 2, 3, "with open(path) as f:\n    return f.read()", file="io.py")
+    whole = chunk("load", 1, 4, first["content"], file="io.py")
+    assert ContextDeduplicator().deduplicate([whole, part]) == [whole]
+
+
+def test_packer_only_drops_contained_spans_of_the_same_file():
+    packer = ContextPacker(lambda text: len(text.split()), token_budget=1000)
+    outer = chunk("Store", 1, 20, "class Store:\n    pass\n")
+    inner = chunk("helper", 5, 8, "def helper():\n    return 1\n")
+    assert packer.pack([outer, inner]) == [outer, inner]
+
+    outer["metadata"]["file"] = inner["metadata"]["file"] = "store.py"
+    assert packer.pack([outer, inner]) == [outer]
+
+
+def chunk_orders(max_chunk_size):
+    chunker = CASTChunker()
+    chunker.config.max_chunk_size = max_chunk_size
+    return chunker.chunk_code(ORDERS)
+
+
+def test_store_results_drop_split_variants():
+    store = VectorStore(backend="memory", embedding_cache_dir=None, embedding_model=HashEmbedder())
+    # The same file indexed at two chunk sizes: whole parts and their split sub-parts
+    for size in (60, 100):
+        store.add_chunks(chunk_orders(size), file_path="orders.py")
+    results = store.query("order total", n_results=100)
+    assert all(result["metadata"]["file"] == "orders.py" for result in results)
+
+    kept = store.deduplicator.deduplicate(results)
+    assert len(kept) < len(results)
+    for i, a in enumerate(kept):
+        for b in kept[i + 1:]:
+            assert span_overlap(a["metadata"], b["metadata"]) == 0.0
+
+    # The chunk under review (raw chunker output) excludes itself and its split parts
+    reviewed = next(chunk for chunk in chunk_orders(100) if chunk["name"] == "order_total_part2")
+    unique = store.query_unique("order total", n_results=100, exclude=dict(reviewed, file="orders.py"))
+    assert not [r for r in unique if base_name(r["metadata"]["name"]) == "order_total" and r["metadata"]["start_line"] >= 12]
+
+
+@pytest.mark.parametrize("mode", ["dense", "hybrid"])
+def test_pipeline_context_excludes_the_reviewed_chunk(mode, monkeypatch):
+    from benchmark_decoding import char_tokenizer
+
+    from ast_reviewer.agents.experts import BaseExpert
+    from ast_reviewer.agents.variants import BASE_MODEL_ID
+    from ast_reviewer.pipeline.reviewer import ReviewPipeline
+
+    monkeypatch.setitem(BaseExpert._TOKENIZER_CACHE, BASE_MODEL_ID, char_tokenizer())
+    pipeline = ReviewPipeline(retrieval_mode=mode, backend="openai:http://127.0.0.1:9/v1")
+    pipeline.vector_store = VectorStore(backend="memory", embedding_cache_dir=None, embedding_model=HashEmbedder())
+
+    chunks = chunk_orders(60)
+    tasks = pipeline.plan(chunks, "orders.py", experts=["BugExpert"])
+    assert len(tasks) == len(chunks)
+    for task in tasks:
+        assert task["context"]
+        for context in task["context"]:
+            assert context["metadata"]["file"] == "orders.py"
+            assert span_overlap(context["metadata"], dict(task["chunk"], file="orders.py")) == 0.0
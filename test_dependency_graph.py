@@ -0,0 +1,84 @@
+import textwrap
+
+import pytest
+
+from ast_reviewer.retrieval.dependency_graph import DependencyGraph
+
+FILES = {
+    "pkg/utils.py": """
+        import functools
+
+        def load(path):
+            return parse(open(path).read())
+
+        def parse(text):
+            return text.split()
+
+        class Store:
+            @functools.lru_cache
+            def save(self, items):
+                return len(items)
+    """,
+    "pkg/other.py": """
+        def load(path):
+            return None
+
+        def helper(data):
+            return data
+    """,
+    "pkg/app.py": """
+        from pkg.utils import load, Store
+
+        def helper(data):
+            return Store().save(data)
+
+        def main():
+            data = load("input.txt")
+            return helper(data)
+    """,
+}
+
+
+@pytest.fixture
+def graph(tmp_path):
+    for name, code in FILES.items():
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(textwrap.dedent(code))
+    graph = DependencyGraph()
+    graph.add_directory(str(tmp_path))
+    return graph, tmp_path
+
+
+def test_definitions_and_imports(graph):
+    graph, root = graph
+    names = {(d.qualified_name, d.file_path.replace(str(root) + "/", "")) for d in graph.definitions}
+    assert ("Store.save", "pkg/utils.py") in names and ("load", "pkg/other.py") in names
+    load = next(d for d in graph.definitions if d.name == "load" and d.file_path.endswith("utils.py"))
+    # Callees count twice; the definition's own name is not a reference
+    assert load.references["parse"] == 2 and "load" not in load.references
+    save = next(d for d in graph.definitions if d.name == "save")
+    assert save.content.lstrip().startswith("@functools.lru_cache")
+    assert graph.imports[str(root / "pkg/app.py")] == {"load": "pkg.utils.load", "Store": "pkg.utils.Store"}
+
+
+def test_resolve_prefers_same_file_then_imports(graph):
+    graph, root = graph
+    app = str(root / "pkg/app.py")
+    files = lambda name: [graph.definitions[i].file_path for i in graph.resolve(name, from_file=app)]
+    assert files("load") == [str(root / "pkg/utils.py"), str(root / "pkg/other.py")]
+    assert files("helper") == [app, str(root / "pkg/other.py")]
+    assert graph.resolve("missing", from_file=app) == []
+
+
+def test_query_walks_callees_by_depth(graph):
+    graph, root = graph
+    main = textwrap.dedent(FILES["pkg/app.py"]).split("def main")[1]
+    results = graph.query("def main" + main, n_results=8, file_path=str(root / "pkg/app.py"))
+    found = [(r["metadata"]["name"], r["metadata"]["depth"], r["metadata"]["file"].rsplit("/", 1)[-1]) for r in results]
+    # Direct callees first, each name's candidates in resolution order, then their callees
+    assert found[:4] == [("load", 1, "utils.py"), ("load", 1, "other.py"), ("helper", 1, "app.py"), ("helper", 1, "other.py")]
+    assert sorted(found[4:]) == [("Store", 2, "utils.py"), ("Store.save", 2, "utils.py"), ("parse", 2, "utils.py")]
+    # The reviewed definition itself is not context
+    assert "main" not in [name for name, _, _ in found]
+    assert len(graph.query("def main" + main, n_results=2)) == 2
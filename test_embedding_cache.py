@@ -0,0 +1,66 @@
+import multiprocessing
+import zlib
+
+import numpy as np
+
+from ast_reviewer.retrieval.embedding_cache import CachedEmbedder, EmbeddingCache
+
+DIM = 8
+
+
+def fake_embed(texts):
+    return np.stack([np.random.default_rng(zlib.crc32(t.encode())).random(DIM, dtype=np.float32) for t in texts])
+
+
+def check(cache, texts):
+    vectors = cache.get_many(texts)
+    assert all(v is not None for v in vectors)
+    np.testing.assert_array_equal(np.stack(vectors), fake_embed(texts))
+
+
+def test_instances_sharing_a_directory(tmp_path):
+    a = EmbeddingCache(str(tmp_path), "fake-model")
+    b = EmbeddingCache(str(tmp_path), "fake-model")
+    a.put_many(["x"], fake_embed(["x"]))
+    b.put_many(["y"], fake_embed(["y"]))
+    a.put_many(["z", "y"], fake_embed(["z", "y"]))
+    b.put_many(["w"], fake_embed(["w"]))
+
+    check(a, ["x", "y", "z"])
+    check(b, ["x", "y", "z", "w"])
+    fresh = EmbeddingCache(str(tmp_path), "fake-model")
+    assert len(fresh) == 4
+    check(fresh, ["x", "y", "z", "w"])
+
+
+def test_cached_embedder_only_encodes_misses(tmp_path):
+    calls = []
+    embedder = CachedEmbedder(lambda texts: calls.append(list(texts)) or fake_embed(texts),
+                              EmbeddingCache(str(tmp_path), "fake-model"))
+    embedder(["a", "b"])
+    out = embedder(["b", "c", "a"])
+    assert calls == [["a", "b"], ["c"]]
+    np.testing.assert_array_equal(np.stack(out), fake_embed(["b", "c", "a"]))
+
+
+def _append(cache_dir, worker):
+    cache = EmbeddingCache(cache_dir, "fake-model")
+    for batch in range(20):
+        texts = [f"{worker}-{batch}-{i}" for i in range(3)] + [f"shared-{batch}"]
+        cache.put_many(texts, fake_embed(texts))
+
+
+def test_concurrent_processes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append, args=(str(tmp_path), w)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), "fake-model")
+    texts = [f"{w}-{b}-{i}" for w in range(4) for b in range(20) for i in range(3)]
+    texts += [f"shared-{b}" for b in range(20)]
+    assert len(cache) == len(texts)
+    check(cache, texts)
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from ast_reviewer.agents.engine import ContinuousBatchingEngine
+from benchmark_decoding import char_tokenizer, tiny_causal_lm
+
+PROMPTS = ["def f(x):", "return a + b", "x", "    for i in range(len(items)):"]
+MAX_NEW_TOKENS = 12
+
+
+@pytest.fixture(scope="module")
+def model_and_tokenizer():
+    tokenizer = char_tokenizer()
+    return tiny_causal_lm(tokenizer, hidden_size=64, layers=2).eval(), tokenizer
+
+
+@pytest.fixture
+def engine(model_and_tokenizer):
+    engine = ContinuousBatchingEngine(*model_and_tokenizer, max_new_tokens=MAX_NEW_TOKENS)
+    yield engine
+    engine.stop()
+
+
+def greedy(model, tokenizer, prompt):
+    input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+    with torch.no_grad():
+        output = model.generate(input_ids, max_new_tokens=MAX_NEW_TOKENS, do_sample=False)
+    return tokenizer.decode(output[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
+
+
+def test_matches_greedy_generate(engine, model_and_tokenizer):
+    expected = [greedy(*model_and_tokenizer, prompt) for prompt in PROMPTS]
+    assert engine.generate(PROMPTS) == expected
+
+    # Requests submitted from several threads join the same decode loop
+    with ThreadPoolExecutor(len(PROMPTS)) as pool:
+        assert list(pool.map(lambda prompt: engine.submit(prompt).result(timeout=60), PROMPTS)) == expected
+
+
+def test_stop_and_restart(engine):
+    first = engine.generate(PROMPTS[:1])
+    engine.stop()
+    assert not engine.running
+    assert engine.generate(PROMPTS[:1]) == first
+    assert engine.running
+
+
+@pytest.mark.parametrize("options", [{"no_issues_probe": True}, {"structured": True}])
+def test_engine_rejects_options_it_cannot_apply(options):
+    from ast_reviewer.agents.experts import BugExpert
+
+    with pytest.raises(ValueError, match="continuous_batching"):
+        BugExpert(continuous_batching=True, **options)
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+
+from metrics import (
+    bootstrap_intervals,
+    compute_metrics,
+    confusion_matrices,
+    contains_affirmative,
+    load_run,
+    rates,
+    threshold_sweep,
+)
+
+EXPERT = "CommentConsistencyExpert"
+
+
+def reference_counts(y_true, y_pred):
+    pairs = list(zip(y_true, y_pred))
+    return [pairs.count((0, 0)), pairs.count((0, 1)), pairs.count((1, 0)), pairs.count((1, 1))]
+
+
+def test_confusion_matrices_for_uneven_runs():
+    rng = np.random.default_rng(1)
+    runs = [(rng.integers(0, 2, n), rng.integers(0, 2, n)) for n in (0, 5, 200, 31)]
+    counts = confusion_matrices([t for t, _ in runs], [p for _, p in runs])
+    assert counts.tolist() == [reference_counts(t.tolist(), p.tolist()) for t, p in runs]
+
+
+def test_compute_metrics():
+    metrics = compute_metrics([1, 1, 0, 0, 1, 2], [1, 0, 1, 0, 1, 1])
+    assert (metrics["TP"], metrics["FP"], metrics["TN"], metrics["FN"]) == (2, 1, 1, 1)
+    assert metrics["precision"] == pytest.approx(2 / 3)
+    assert metrics["recall"] == pytest.approx(2 / 3)
+    assert metrics["fpr"] == pytest.approx(0.5)
+    assert compute_metrics([], [])["f1"] == 0.0
+
+
+def test_bootstrap_intervals_cover_the_estimate():
+    counts = np.array([[400, 100, 50, 450], [0, 0, 0, 0]])
+    intervals = bootstrap_intervals(counts, resamples=500, seed=3)
+    f1 = rates(counts)["f1"]
+    low, high = intervals["f1"][0]
+    assert low < f1[0] < high and high - low < 0.1
+    assert intervals["f1"][1].tolist() == [0.0, 0.0]
+
+
+def test_threshold_sweep_matches_brute_force():
+    rng = np.random.default_rng(2)
+    y_true = rng.integers(0, 2, 300)
+    score = rng.integers(0, 4, 300)
+    thresholds, counts = threshold_sweep(y_true, score)
+    assert thresholds.tolist() == [1, 2, 3]
+    for threshold, row in zip(thresholds, counts):
+        assert row.tolist() == reference_counts(y_true.tolist(), (score >= threshold).astype(int).tolist())
+
+
+def test_affirmative_phrases():
+    assert contains_affirmative("Overall, the existing comment is STILL ACCURATE.")
+    assert not contains_affirmative("- Line 3: comment describes the old return value")
+
+
+def test_load_run_scores_every_expert(tmp_path):
+    path = tmp_path / "run.jsonl"
+    records = [
+        {"label": 1, "model_output": {EXPERT: 1, "Panel": 1},
+         "expert_output": {EXPERT: ["- Line 2 [low]: a", "- Line 9 [high]: b"], "Panel": ["Still accurate."]},
+         "output_format": {EXPERT: "json", "Panel": "text"}},
+        {"label": 0, "model_output": {EXPERT: 0, "Panel": 1},
+         "expert_output": {EXPERT: [], "Panel": ["- stale comment"]}, "output_format": {EXPERT: "json"}},
+        {"model_output": {EXPERT: 1}},
+    ]
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+
+    run = load_run(path)
+    assert run[EXPERT].y_pred.tolist() == [1, 0] and run[EXPERT].score.tolist() == [3, 0]
+    assert run["Panel"].y_pred.tolist() == [0, 1] and run["Panel"].score.tolist() == [0, 1]
+    assert list(load_run(path, ["Panel"])) == ["Panel"]
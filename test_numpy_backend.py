@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from ast_reviewer.retrieval.backends import NumpyBackend
+
+DIM = 32
+K = 10
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.RandomState(0)
+    centers = rng.normal(size=(20, DIM)) * 4
+    vectors = (centers[rng.randint(20, size=2000)] + rng.normal(size=(2000, DIM))).astype(np.float32)
+    queries = vectors[rng.choice(2000, 20, replace=False)] + rng.normal(scale=0.3, size=(20, DIM)).astype(np.float32)
+    return vectors, queries
+
+
+def ids_of(n):
+    return [f"v{i}" for i in range(n)]
+
+
+def build(vectors, **kwargs):
+    backend = NumpyBackend(**kwargs)
+    n = len(vectors)
+    # Two adds, so search covers vectors added in separate batches
+    for part in (slice(0, n // 2), slice(n // 2, n)):
+        rows = range(n)[part]
+        backend.add(ids_of(n)[part], vectors[part], [f"doc {i}" for i in rows], [{"row": i} for i in rows])
+    return backend
+
+
+def exact(vectors, query, k=K):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return [f"v{i}" for i in np.argsort(distances)[:k]]
+
+
+def recall(backend, vectors, queries):
+    hits = [len(set(backend.query(q, K)[0]) & set(exact(vectors, q))) for q in queries]
+    return sum(hits) / (K * len(queries))
+
+
+def rerank_fn(vectors):
+    return lambda ids: vectors[[int(i[1:]) for i in ids]]
+
+
+def test_flat_search_is_exact(data):
+    vectors, queries = data
+    backend = build(vectors, index="flat")
+    for q in queries:
+        ids, distances = backend.query(q, K)
+        assert ids == exact(vectors, q)
+        np.testing.assert_allclose(distances, ((vectors[[int(i[1:]) for i in ids]] - q) ** 2).sum(axis=1), rtol=1e-4)
+    assert backend.query(queries[0], 5000)[0] == exact(vectors, queries[0], 2000)
+
+
+def test_ivf_recall(data):
+    vectors, queries = data
+    assert recall(build(vectors, index="ivf", nlist=20, nprobe=4), vectors, queries) >= 0.95
+    # "auto" switches to IVF at the threshold
+    auto = build(vectors, index="auto", ivf_threshold=1000, nlist=20, nprobe=20)
+    assert recall(auto, vectors, queries) == 1.0 and auto._centroids is not None
+
+
+def test_ivfpq_recall_with_reranking(data):
+    vectors, queries = data
+    backend = build(vectors, index="ivfpq", nlist=20, nprobe=4, pq_m=8, rerank_fn=rerank_fn(vectors))
+    assert recall(backend, vectors, queries) >= 0.9
+    # PQ distances alone only approximate the ranking
+    assert recall(build(vectors, index="ivfpq", nlist=20, nprobe=4, pq_m=8), vectors, queries) < 0.9
+    assert backend._vectors is None and backend._codes.shape == (2000, 8)
+    with pytest.raises(ValueError):
+        NumpyBackend(index="hnsw")
+
+
+def test_save_and_load(data, tmp_path):
+    vectors, queries = data
+    backend = build(vectors, index="flat")
+    backend.save(str(tmp_path / "index"))
+    loaded = NumpyBackend.load(str(tmp_path / "index"), index="flat")
+    assert loaded.get_all() == backend.get_all()
+    for q in queries[:5]:
+        assert loaded.query(q, K) == backend.query(q, K)
+
+    ivfpq = build(vectors, index="ivfpq", nlist=20, pq_m=8)
+    ivfpq.query(queries[0], K)
+    with pytest.raises(ValueError):
+        ivfpq.save(str(tmp_path / "pq"))
+
+
+@pytest.mark.parametrize("dtype, ratio", [("float16", 2), ("int8", 3)])
+def test_quantized_storage(data, tmp_path, dtype, ratio):
+    vectors, queries = data
+    flat = build(vectors, index="flat")
+    quantized = build(vectors, index="flat", dtype=dtype)
+    assert flat.nbytes / quantized.nbytes >= ratio * 0.8
+    assert quantized._vectors.dtype == np.dtype(dtype)
+    assert recall(quantized, vectors, queries) >= 0.9
+
+    # Re-ranking the shortlist with float vectors restores the exact order and distances
+    reranked = build(vectors, index="flat", dtype=dtype, rerank_fn=rerank_fn(vectors))
+    for q in queries:
+        (ids, distances), (exact_ids, exact_distances) = reranked.query(q, K), flat.query(q, K)
+        assert ids == exact_ids and distances == pytest.approx(exact_distances, rel=1e-4)
+
+    quantized.save(str(tmp_path / dtype))
+    loaded = NumpyBackend.load(str(tmp_path / dtype), index="flat")
+    assert loaded.dtype == dtype and loaded._vectors.dtype == np.dtype(dtype)
+    assert loaded.query(queries[0], K) == quantized.query(queries[0], K)
+
+    ivf = build(vectors, index="ivf", nlist=20, nprobe=4, dtype=dtype, rerank_fn=rerank_fn(vectors))
+    assert recall(ivf, vectors, queries) >= 0.95
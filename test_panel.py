@@ -0,0 +1,62 @@
+import pytest
+
+from ast_reviewer.agents.experts import BaseExpert, BugExpert, PanelExpert, StyleExpert
+from ast_reviewer.agents.variants import BASE_MODEL_ID
+
+NAMES = ["BugExpert", "StyleExpert"]
+
+
+@pytest.fixture
+def panel(monkeypatch):
+    from benchmark_decoding import char_tokenizer
+
+    # A remote backend needs only the tokenizer; answers are set per test
+    monkeypatch.setitem(BaseExpert._TOKENIZER_CACHE, BASE_MODEL_ID, char_tokenizer())
+    backend = "openai:http://127.0.0.1:9/v1"
+    panel = PanelExpert([BugExpert(backend=backend), StyleExpert(backend=backend)], backend=backend)
+    panel.reviewed = []
+    for expert in panel.experts.values():
+        def review_batch(items, name=expert.name):
+            panel.reviewed.append((name, [diff for diff, _ in items]))
+            return [[f"{name} on {diff}"] for diff, _ in items]
+
+        monkeypatch.setattr(expert, "review_batch", review_batch)
+    return panel
+
+
+def answer(panel, monkeypatch, *responses):
+    monkeypatch.setattr(panel, "generate_many", lambda prompts: list(responses)[:len(prompts)])
+
+
+@pytest.mark.parametrize("bug, style", [
+    ("### BugExpert", "### StyleExpert"),
+    ("## BugExpert:", "## StyleExpert:"),
+    ("**BugExpert**", "**StyleExpert:**"),
+    ("### **BugExpert**", "### **StyleExpert**"),
+])
+def test_parse_sections_headers(panel, bug, style):
+    response = f"{bug}\n- Off by one in the loop\n\n{style}\nNo issues found.\n"
+    assert panel.parse_sections(response, NAMES) == {"BugExpert": ["- Off by one in the loop"], "StyleExpert": []}
+
+
+def test_unknown_headers_stay_in_the_current_section(panel):
+    response = "### BugExpert\n- Wrong result\n### Summary\n- Divides by zero\n"
+    assert panel.parse_sections(response, NAMES) == {"BugExpert": ["- Wrong result", "- Divides by zero"]}
+    assert panel.parse_sections("### Summary\n- Divides by zero\n", NAMES) == {}
+
+
+def test_missing_sections_are_reviewed_separately(panel, monkeypatch):
+    answer(panel, monkeypatch, "### StyleExpert\nNo issues found.\n", "Looks fine to me.")
+    results = panel.review_panel_batch([("x = 1", [], NAMES), ("y = 2", [], NAMES)])
+    assert results == [
+        {"StyleExpert": [], "BugExpert": ["BugExpert on x = 1"]},
+        {"BugExpert": ["BugExpert on y = 2"], "StyleExpert": ["StyleExpert on y = 2"]},
+    ]
+    # One batched fallback per expert, not per item
+    assert panel.reviewed == [("BugExpert", ["x = 1", "y = 2"]), ("StyleExpert", ["y = 2"])]
+
+
+def test_complete_answers_need_no_fallback(panel, monkeypatch):
+    answer(panel, monkeypatch, "**BugExpert**\n- Returns None\n**StyleExpert**\nNo issues found.\n")
+    assert panel.review_panel("x = 1", [], NAMES) == {"BugExpert": ["- Returns None"], "StyleExpert": []}
+    assert panel.reviewed == []
@@ -0,0 +1,67 @@
+import pytest
+
+from ast_reviewer.agents.experts import QUANTIZATION_MODES, BugExpert, quantization_config
+from ast_reviewer.agents.variants import model_variant
+
+
+@pytest.mark.parametrize("mode", ["fp8", "int2", ""])
+def test_unsupported_modes_are_rejected(mode):
+    with pytest.raises(ValueError, match="expected one of int8, int4"):
+        quantization_config(mode)
+
+
+def test_expert_rejects_unsupported_mode_before_loading():
+    # Raised by the constructor itself, so no model is downloaded
+    with pytest.raises(ValueError, match="Unknown quantization 'fp8'"):
+        BugExpert(quantization="fp8")
+
+
+def test_int8_is_torchao_weight_only():
+    pytest.importorskip("torchao")
+    from torchao.quantization import Int8WeightOnlyConfig
+    from transformers import TorchAoConfig
+
+    config = quantization_config("int8")
+    assert isinstance(config, TorchAoConfig)
+    assert isinstance(config.quant_type, Int8WeightOnlyConfig)
+
+
+def test_int4_is_bitsandbytes_nf4():
+    torch = pytest.importorskip("torch")
+    from transformers import BitsAndBytesConfig
+
+    config = quantization_config("int4")
+    assert isinstance(config, BitsAndBytesConfig)
+    assert config.load_in_4bit and not config.load_in_8bit
+    assert config.bnb_4bit_quant_type == "nf4"
+    assert config.bnb_4bit_compute_dtype == torch.bfloat16
+
+
+def test_int8_checkpoint_loads_on_cpu(tmp_path):
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("torchao")
+    from transformers import AutoModelForCausalLM
+
+    from benchmark_decoding import char_tokenizer, tiny_causal_lm
+
+    tokenizer = char_tokenizer()
+    model = tiny_causal_lm(tokenizer, hidden_size=64, layers=2).eval()
+    model.save_pretrained(tmp_path)
+    quantized = AutoModelForCausalLM.from_pretrained(
+        tmp_path, quantization_config=quantization_config("int8"), dtype=torch.float32
+    ).eval()
+
+    # Linear weights are replaced by torchao tensors holding int8 data
+    assert quantized.model.layers[0].mlp.down_proj.weight.qdata.dtype == torch.int8
+    input_ids = tokenizer("def f(x):", return_tensors="pt")["input_ids"]
+    with torch.no_grad():
+        expected, actual = model(input_ids).logits, quantized(input_ids).logits
+    assert torch.allclose(actual, expected, atol=0.05)
+
+
+@pytest.mark.parametrize("mode", QUANTIZATION_MODES)
+def test_quantization_is_part_of_the_variant(mode):
+    variant = model_variant(quantization=mode)
+    assert variant["quantization"] == mode
+    assert variant["id"] == f"gemma-3-4b-it@{mode}"
+    assert model_variant()["id"] == "gemma-3-4b-it"
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from run_dataset_reviews import ReviewOutput, key_index_path, merge_shards, plan_reviews, shard_path
+
+VARIANT = {"CommentConsistencyExpert": "gemma-3-4b-it"}
+
+
+def record(i, variant=VARIANT):
+    return {"id": f"s{i}", "model_input": "x" * 500, "expert_output": {"e": ["ok"]}, "model_variant": variant}
+
+
+def write_records(path, ids, resume=False, variant=VARIANT):
+    with ReviewOutput(path, variant, resume=resume) as output:
+        for i in ids:
+            output.write(json.dumps(record(i, variant)), f"s{i}")
+    return output
+
+
+def output_ids(path):
+    return [json.loads(line)["id"] for line in path.read_text().splitlines()]
+
+
+def test_resume_reads_keys_from_index(tmp_path, monkeypatch):
+    path = tmp_path / "out.jsonl"
+    write_records(path, range(5))
+
+    # Resume parses only the last record, to check the index against the output
+    original_loads = json.loads
+    parsed = []
+    monkeypatch.setattr(json, "loads", lambda s, *a, **kw: parsed.append(s) or original_loads(s, *a, **kw))
+    with ReviewOutput(path, VARIANT, resume=True) as output:
+        assert output.keys == {f"s{i}" for i in range(5)}
+    assert [s for s in parsed if isinstance(s, bytes) and b"model_input" in s] == [(json.dumps(record(4)) + "\n").encode()]
+
+
+def test_partial_last_line_is_truncated(tmp_path):
+    path = tmp_path / "out.jsonl"
+    write_records(path, range(3))
+    with path.open("a") as f:
+        f.write(json.dumps(record(3))[:40])
+
+    output = write_records(path, [3, 4], resume=True)
+    assert output_ids(path) == ["s0", "s1", "s2", "s3", "s4"]
+    assert ReviewOutput(path, VARIANT, resume=True).keys == {f"s{i}" for i in range(5)}
+
+
+def test_records_missing_from_index_are_recovered(tmp_path):
+    path = tmp_path / "out.jsonl"
+    write_records(path, range(3))
+    # Crash between writing a record and its index entry, plus a torn index line
+    with path.open("a") as f:
+        f.write(json.dumps(record(3)) + "\n")
+    with key_index_path(path).open("a") as f:
+        f.write('["s3", 12')
+
+    assert ReviewOutput(path, VARIANT, resume=True).keys == {f"s{i}" for i in range(4)}
+    assert ReviewOutput(path, VARIANT, resume=True).keys == {f"s{i}" for i in range(4)}
+
+
+def test_missing_or_stale_index_is_rebuilt(tmp_path):
+    path = tmp_path / "out.jsonl"
+    write_records(path, range(4))
+    key_index_path(path).unlink()
+    assert ReviewOutput(path, VARIANT, resume=True).keys == {f"s{i}" for i in range(4)}
+
+    # Output rewritten by hand after indexing
+    path.write_text("".join(json.dumps(record(i)) + "\n" for i in (7, 8)))
+    assert ReviewOutput(path, VARIANT, resume=True).keys == {"s7", "s8"}
+
+
+def test_resume_rejects_other_model_variant(tmp_path):
+    path = tmp_path / "out.jsonl"
+    write_records(path, range(2))
+    with pytest.raises(ValueError):
+        ReviewOutput(path, {"CommentConsistencyExpert": "gemma-3-4b-it@int8"}, resume=True)
+
+    key_index_path(path).unlink()
+    with pytest.raises(ValueError):
+        ReviewOutput(path, {"CommentConsistencyExpert": "gemma-3-4b-it@int8"}, resume=True)
+
+
+def test_plan_groups_samples_by_snapshot_and_file():
+    samples = [
+        {"repo_url": "a", "commit": "1", "path": "x.py"},
+        {"repo_url": "b", "commit": "1", "path": "y.py"},
+        {"repo_url": "a", "commit": "1", "path": "z.py"},
+        {"repo_url": "a", "commit": "1", "path": "x.py"},
+        {"repo_url": "b", "commit": "1", "path": "y.py"},
+        {"repo_url": "a", "commit": "2", "path": "x.py"},
+    ]
+    order = [idx for idx, _ in plan_reviews(enumerate(samples), window=100)]
+    assert order == [0, 3, 2, 1, 4, 5]
+    # Groups never span windows
+    assert [idx for idx, _ in plan_reviews(enumerate(samples), window=3)] == [0, 2, 1, 3, 4, 5]
+
+
+def test_merge_restores_dataset_order(tmp_path):
+    output = tmp_path / "out.jsonl"
+    for index, ids in enumerate([(4, 0, 2), (3, 1, 5, 2)]):
+        with ReviewOutput(shard_path(output, index, 2), VARIANT) as shard:
+            for i in ids:
+                shard.write(json.dumps({**record(i), "dataset_index": i}), f"s{i}")
+
+    assert merge_shards(output) == 6
+    assert output_ids(output) == [f"s{i}" for i in range(6)]
+    assert ReviewOutput(output, VARIANT, resume=True).keys == {f"s{i}" for i in range(6)}
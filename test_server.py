@@ -0,0 +1,125 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ast_reviewer.agents.experts import BaseExpert
+from ast_reviewer.agents.variants import BASE_MODEL_ID
+from ast_reviewer.pipeline.reviewer import ReviewPipeline
+from ast_reviewer.pipeline.server import ReviewClient, ReviewServer, make_http_server, normalize_job
+
+
+class StubExpert:
+    """Comments on the last line of each chunk; blocks until released."""
+
+    engine = None
+
+    def __init__(self):
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def review_batch(self, items):
+        self.entered.set()
+        self.release.wait(timeout=30)
+        self.batches.append(len(items))
+        return [[f"- reviewed {code.strip().splitlines()[-1].strip()}"] for code, _ in items]
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    from benchmark_decoding import char_tokenizer
+
+    # Remote backend and graph retrieval: building the pipeline loads no model
+    monkeypatch.setitem(BaseExpert._TOKENIZER_CACHE, BASE_MODEL_ID, char_tokenizer())
+    pipeline = ReviewPipeline(retrieval_mode="graph", backend="openai:http://127.0.0.1:9/v1")
+    expert = StubExpert()
+    pipeline.experts = {"BugExpert": expert}
+
+    review_server = ReviewServer(pipeline, max_batch_size=8, batch_timeout=0.01)
+    socket_path = str(tmp_path / "review.sock")
+    httpd = make_http_server(review_server, socket_path=socket_path)
+    review_server.start()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield review_server, expert, socket_path
+    httpd.shutdown()
+    httpd.server_close()
+    review_server.stop()
+
+
+def test_concurrent_jobs_are_batched(served):
+    review_server, expert, socket_path = served
+    client = ReviewClient(socket_path=socket_path, timeout=30)
+
+    def review(i):
+        return client.review("snippet", content=f"def f{i}():\n    return {i}\n", experts=["BugExpert"], name=f"job{i}")
+
+    with ThreadPoolExecutor(6) as pool:
+        first = pool.submit(review, 0)
+        # While the worker is busy with job 0, the other five queue up for the next batch
+        assert expert.entered.wait(timeout=30)
+        rest = [pool.submit(review, i) for i in range(1, 6)]
+        while review_server.jobs.qsize() < 5:
+            time.sleep(0.01)
+        expert.release.set()
+        results = [first.result(timeout=30)] + [future.result(timeout=30) for future in rest]
+
+    assert expert.batches == [1, 5]
+    assert [result["batch_size"] for result in results] == [1, 5, 5, 5, 5, 5]
+    for i, result in enumerate(results):
+        assert result["name"] == f"job{i}"
+        assert [c["message"] for c in result["comments"]] == [f"- reviewed return {i}"]
+        assert f"[BugExpert] job{i}:" in result["report"]
+    assert client.health()["batches"] == 2
+
+
+
+def test_bad_jobs_are_rejected(served):
+    _, expert, socket_path = served
+    expert.release.set()
+    client = ReviewClient(socket_path=socket_path, timeout=30)
+    with pytest.raises(RuntimeError, match="400"):
+        client.review("patch", content="x = 1")
+    with pytest.raises(RuntimeError, match="400"):
+        client.review("file", path="/nonexistent/file.py")
+
+
+def test_file_jobs_stay_inside_the_file_root(tmp_path):
+    root = tmp_path / "repo"
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "mod.py").write_text("x = 1\n")
+    (tmp_path / "secret.py").write_text("TOKEN = 'abc'\n")
+    (root / "link.py").symlink_to(tmp_path / "secret.py")
+
+    assert normalize_job({"kind": "file", "path": "pkg/mod.py"}, str(root))["content"] == "x = 1\n"
+    assert normalize_job({"kind": "file", "path": str(root / "pkg" / "mod.py")}, str(root))["content"] == "x = 1\n"
+    for path in ["../secret.py", str(tmp_path / "secret.py"), "link.py", "/etc/passwd"]:
+        with pytest.raises(ValueError, match="outside the server's file root"):
+            normalize_job({"kind": "file", "path": path}, str(root))
+    with pytest.raises(ValueError, match="File not found"):
+        normalize_job({"kind": "file", "path": "pkg/missing.py"}, str(root))
+
+    # Without a root the server reads nothing; content sent by the client is always accepted
+    with pytest.raises(ValueError, match="this server reads no files"):
+        normalize_job({"kind": "file", "path": str(root / "pkg" / "mod.py")})
+    assert normalize_job({"kind": "file", "path": "/etc/passwd", "content": "y = 2\n"})["content"] == "y = 2\n"
+
+
+def test_review_client_cli(served, tmp_path, monkeypatch, capsys):
+    import review_client
+
+    _, expert, socket_path = served
+    expert.release.set()
+    snippet = tmp_path / "snippet.py"
+    snippet.write_text("def add(a, b):\n    return a + b\n")
+    monkeypatch.setattr(sys, "argv", ["review_client.py", str(snippet), "--socket", socket_path, "--experts", "BugExpert"])
+    assert review_client.main() == 0
+    assert "- reviewed return a + b" in capsys.readouterr().out
+
+
+def test_unknown_retrieval_mode():
+    with pytest.raises(ValueError, match="expected one of dense, hybrid, graph"):
+        ReviewPipeline(retrieval_mode="sparse")
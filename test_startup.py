@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that cost seconds to import and must only load when a model/DB is actually used
+HEAVY_MODULES = ["torch", "transformers", "peft", "chromadb", "langchain_ollama", "sentence_transformers"]
+# Total import time allowed for `main.py --help` (the heavy stack alone is several seconds)
+STARTUP_BUDGET_SECONDS = 1.5
+
+
+def import_times(*args):
+    """Runs main.py under `-X importtime` and returns {module: cumulative microseconds}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(ROOT, "main.py"), *args],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+    # Nested imports are indented further; only top-level entries count towards the total
+    top_level = min(indent for indent, _, _ in entries)
+    times = {}
+    for indent, name, cumulative in entries:
+        times[name] = cumulative if indent == top_level else times.get(name, 0)
+    return times
+
+
+def test_help_does_not_import_heavy_dependencies():
+    times = import_times("--help")
+    loaded = [m for m in HEAVY_MODULES if m in times]
+    assert not loaded, f"main.py --help imported {loaded}"
+
+
+def test_help_startup_budget():
+    times = import_times("--help")
+    total = sum(times.values()) / 1e6
+    assert total < STARTUP_BUDGET_SECONDS, f"main.py --help spent {total:.2f}s importing"
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from ast_reviewer.agents.variants import (
+    BASE_MODEL_ID,
+    MERGED_METADATA_FILE,
+    adapter_fingerprint,
+    is_merged_checkpoint,
+    model_variant,
+    served_variant,
+)
+
+
+def write_adapter(path, weights: bytes):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "adapter_model.safetensors").write_bytes(weights)
+    adapter_fingerprint.cache_clear()
+    return str(path)
+
+
+def test_base_model_variant():
+    assert model_variant() == {
+        "base_model": BASE_MODEL_ID, "adapter_sha256": None, "merged": False, "quantization": None,
+        "id": "gemma-3-4b-it",
+    }
+    assert not is_merged_checkpoint(None)
+
+
+def test_adapter_variant_follows_its_weights(tmp_path):
+    adapter = write_adapter(tmp_path / "adapter", b"first run")
+    variant = model_variant(adapter)
+    assert variant["merged"] is False
+    assert variant["id"] == f"gemma-3-4b-it+lora-{variant['adapter_sha256'][:12]}"
+
+    # Retraining into the same folder is a new variant
+    write_adapter(tmp_path / "adapter", b"second run")
+    assert model_variant(adapter)["adapter_sha256"] != variant["adapter_sha256"]
+
+
+def test_missing_adapter_weights(tmp_path):
+    with pytest.raises(FileNotFoundError, match="No adapter weights"):
+        model_variant(str(tmp_path))
+
+
+def test_merged_checkpoint_keeps_the_adapter_fingerprint(tmp_path):
+    adapter = write_adapter(tmp_path / "adapter", b"weights")
+    merged = tmp_path / "merged"
+    merged.mkdir()
+    (merged / MERGED_METADATA_FILE).write_text(json.dumps(
+        {"base_model": BASE_MODEL_ID, "adapter_sha256": adapter_fingerprint(adapter)}
+    ))
+
+    assert is_merged_checkpoint(str(merged)) and not is_merged_checkpoint(adapter)
+    unmerged, variant = model_variant(adapter), model_variant(str(merged), quantization="int8")
+    assert variant["adapter_sha256"] == unmerged["adapter_sha256"]
+    assert variant["merged"] is True
+    assert variant["id"] == unmerged["id"] + "-merged@int8"
+
+
+def test_served_variant():
+    variant = served_variant("openai", "gemma-3-4b-it")
+    assert variant["id"] == "openai:gemma-3-4b-it"
+    assert variant["adapter_sha256"] is None
+
+
+def test_merge_adapter_matches_the_peft_model(tmp_path):
+    torch = pytest.importorskip("torch")
+    peft = pytest.importorskip("peft")
+    from transformers import AutoModelForCausalLM
+
+    from benchmark_decoding import char_tokenizer, tiny_causal_lm
+    from LoRA.merge_lora import merge_adapter
+
+    tokenizer = char_tokenizer()
+    base = tiny_causal_lm(tokenizer, hidden_size=64, layers=2)
+    base.save_pretrained(tmp_path / "base")
+    tokenizer.save_pretrained(tmp_path / "base")
+    config = peft.LoraConfig(r=4, lora_alpha=8, target_modules=["q_proj", "v_proj"], init_lora_weights=False)
+    adapted = peft.get_peft_model(base, config).eval()
+    adapted.save_pretrained(tmp_path / "adapter")
+    adapter_fingerprint.cache_clear()
+
+    metadata = merge_adapter(str(tmp_path / "adapter"), str(tmp_path / "merged"),
+                             base_model_id=str(tmp_path / "base"), dtype="float32")
+    assert metadata["lora_rank"] == 4 and metadata["target_modules"] == ["q_proj", "v_proj"]
+    variant = model_variant(str(tmp_path / "merged"))
+    assert variant["merged"] and variant["adapter_sha256"] == model_variant(str(tmp_path / "adapter"))["adapter_sha256"]
+
+    merged = AutoModelForCausalLM.from_pretrained(tmp_path / "merged").eval()
+    input_ids = tokenizer("def f(x):", return_tensors="pt")["input_ids"]
+    with torch.no_grad():
+        assert torch.allclose(merged(input_ids).logits, adapted(input_ids).logits, atol=1e-5)